@@ -0,0 +1,255 @@
+"""asyncio version of engine.main.
+
+Key presses, hook changes, the end of a scene's audio and scene timeouts
+are all awaitables on one event loop, so a hang-up is handled the moment
+it happens, even in the middle of a timeout or an error pause, and the
+loop sleeps completely while nothing is going on.
+
+Input events come from each session's Keypad listeners: GPIO edge
+callbacks on the phone, or the keyboard input thread on a PC. Without GPIO
+any key lifts the phone and 'h' hangs it up. main_async(sessions=...)
+serves several handsets (see session.py) from one event loop.
+
+    python async_engine.py
+"""
+import asyncio
+import time
+
+import keypad
+import engine
+from engine import payphone
+from session import default_session, all_idle
+import phone_log
+import metrics
+
+log = phone_log.get_logger("async_engine")
+
+AUDIO_END_CHECK = 0.05  # Seconds between busy checks once a sound should have ended
+
+
+class HungUp(Exception):
+    """Raised out of any wait when the handset goes back on the hook."""
+
+
+class PhoneEvents:
+    """Feeds key presses and hook changes from the input threads into the event loop."""
+
+    def __init__(self, loop, keys=None):
+        self.loop = loop
+        self.keys = keys if keys is not None else keypad.default_keypad  # The session's Keypad
+        self.queue = asyncio.Queue()
+        self.lifted = self.keys.is_phone_lifted()
+        self.keys.add_input_listener(self._on_input)
+
+    def _on_input(self, kind, value):
+        # Runs on an input thread
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, (kind, value))
+
+    def close(self):
+        self.keys.remove_input_listener(self._on_input)
+
+    def _set_lifted(self, lifted):
+        self.lifted = lifted
+        self.keys.phone_on_hook = not lifted
+
+    async def _next_event(self, deadline=None):
+        """Return the next (kind, value) event, or None once the loop time deadline passes."""
+        if deadline is None:
+            return await self.queue.get()
+        remaining = deadline - self.loop.time()
+        if remaining <= 0:
+            return None
+        try:
+            return await asyncio.wait_for(self.queue.get(), remaining)
+        except asyncio.TimeoutError:
+            return None
+
+    async def wait_for_lift(self):
+        while not self.lifted:
+            event = await self._next_event()
+            if event[0] == "hook" or (self.keys is keypad.default_keypad and not keypad.GPIO_AVAILABLE):
+                # Without GPIO any key counts as lifting the handset
+                self._set_lifted(event[1] if event[0] == "hook" else True)
+        # Anything typed while the handset was down is not part of this call
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        log.info("Phone lifted off the hook")
+
+    async def next_key(self, timeout=None):
+        """Return the next key, or None if timeout seconds pass first. Raises HungUp."""
+        deadline = self.loop.time() + timeout if timeout is not None else None
+        while True:
+            event = await self._next_event(deadline)
+            if event is None:
+                return None
+            kind, value = event
+            if kind == "hook":
+                if not value:
+                    self._set_lifted(False)
+                    raise HungUp()
+                continue
+            if value in ("h", "H"):
+                self._set_lifted(False)
+                raise HungUp()
+            return value
+
+    async def pause(self, seconds):
+        """Sleep for seconds, ignoring key presses but not hang-ups."""
+        deadline = self.loop.time() + seconds
+        while self.loop.time() < deadline:
+            key = await self.next_key(deadline - self.loop.time())
+            if key is None:
+                return
+            log.debug("Ignoring keypress during pause: %s", key)
+
+    async def next_choice(self):
+        """Return the next choice, collecting star codes like Keypad.wait_for_keypress."""
+        while True:
+            timeout = keypad.CODE_TIMEOUT if self.keys.code_entry_mode else None
+            key = await self.next_key(timeout)
+            if key is None:
+                choice = self.keys.code_entry_timed_out()
+            else:
+                choice = self.keys.process_code_key(key)
+            if choice is not None:
+                return choice
+
+
+async def wait_for_audio(events, scene_audio):
+    """Wait for the current scene audio to finish, sleeping until its expected end."""
+    while True:
+        remaining = scene_audio.remaining_time()
+        if remaining > 0:
+            await events.pause(remaining)
+        elif scene_audio.is_playing():
+            await events.pause(AUDIO_END_CHECK)
+        else:
+            return
+
+
+async def timed_input(events, scene, scene_audio):
+    """Async counterpart of engine.handle_timed_input."""
+    if scene.timeout_after_audio:
+        await wait_for_audio(events, scene_audio)
+    await events.pause(scene.timeout_seconds)
+    return "timeout"
+
+
+async def play_call(events, session, scenes, lifted_at=None):
+    """Run one call on session from the intro until the handset goes down (HungUp).
+
+    lifted_at is the time.perf_counter() of the pickup, for the pickup latency metric.
+    """
+    scene_audio = session.scene_audio
+    inventory = session.inventory  # Player inventory
+    replaying = False  # The scene is played again after '#', not revisited
+
+    while True:
+        scene = scenes.get(session.current_scene)
+        if not scene:
+            log.error("Scene '%s' not found! Resetting to intro.", session.current_scene)
+            session.current_scene = "hub"
+            continue
+
+        # Check if we can enter the scene based on required items
+        if not all(item in inventory for item in scene.items_required):
+            missing_items = [item for item in scene.items_required if item not in inventory]
+            print(f"You can't go there yet. You need: {', '.join(missing_items)}")
+            session.chosen_at = None  # The pause is not transition latency
+            await events.pause(2)  # Give player time to read the message
+            session.current_scene = session.previous_scene if session.previous_scene else "hub"
+            continue
+
+        scene_audio.play_scene_audio(session.current_scene)
+        session.record("replay" if replaying else "scene", scene=session.current_scene)
+        replaying = False
+        if lifted_at is not None:
+            metrics.PICKUP_TO_INTRO.observe(metrics.elapsed_since(lifted_at))
+            lifted_at = None
+        elif session.chosen_at is not None:
+            metrics.TRANSITION_TO_AUDIO.observe(metrics.elapsed_since(session.chosen_at))
+        session.chosen_at = None
+        scene_audio.prefetch_scenes(scene.successors())
+        scene.display(inventory)
+        session.keypad.set_code_trie(scene.code_trie)
+
+        if scene.uses_timeout(inventory):
+            choice = await timed_input(events, scene, scene_audio)
+        else:
+            choice = await events.next_choice()
+
+        # Handle special command for replaying scene audio
+        if choice == "#":
+            print("\nReplaying scene audio...")
+            scene_audio.stop_audio()
+            replaying = True
+            continue
+
+        session.previous_scene = session.current_scene
+
+        # Grant any items from the current scene BEFORE checking next scene
+        granted = scene.grant_items(inventory)
+        if granted:
+            session.record("items", items=granted)
+
+        session.chosen_at = time.perf_counter()
+        next_scene, message = scene.get_next_scene(choice, inventory)
+        if next_scene:
+            if next_scene != session.current_scene:
+                scene_audio.stop_audio()
+            session.current_scene = next_scene
+            metrics.TRANSITIONS.inc()
+        elif message:
+            print(message)
+            session.chosen_at = None
+            await events.pause(1.5)  # Give player time to read
+        else:
+            print("Invalid choice. Try again.")
+            session.chosen_at = None
+            await events.pause(1)
+
+
+async def serve_session(session, scenes, story_watcher=None):
+    """Answer calls on session forever."""
+    loop = asyncio.get_running_loop()
+    events = PhoneEvents(loop, session.keypad)
+    try:
+        while True:
+            await events.wait_for_lift()
+            lifted_at = time.perf_counter()
+            metrics.CALLS.inc()
+            await loop.run_in_executor(None, session.begin_call)
+            try:
+                await play_call(events, session, scenes, lifted_at)
+            except HungUp:
+                log.info("Phone hung up. Game reset.")
+            await loop.run_in_executor(None, session.end_call)
+            # Swap in any story edits made during the call, once no other session is mid-call
+            # (the watcher rechecks the story graph around whatever it swaps in)
+            if story_watcher and all_idle():
+                story_watcher.apply_pending()
+            log.info("Game reset. Waiting for phone to be lifted...")
+    finally:
+        events.close()
+
+
+async def main_async(scene_audio=None, sessions=None):
+    """Serve the wired handset, or every session in sessions concurrently (see session.py)."""
+    scenes, scene_audio, story_watcher = engine.setup_game(scene_audio)
+    if sessions is None:
+        sessions = [default_session(scene_audio, payphone)]
+    keypad.start_input()
+    await asyncio.gather(*(serve_session(session, scenes, story_watcher) for session in sessions))
+
+
+def main(scene_audio=None):
+    asyncio.run(main_async(scene_audio))
+
+
+if __name__ == "__main__":
+    phone_log.install_dump_signal()  # kill -USR1 <pid> prints the recent log events
+    try:
+        main()
+    except BaseException:
+        phone_log.dump()  # Keep the lead-up to a crash or Ctrl-C
+        raise
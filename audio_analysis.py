@@ -0,0 +1,206 @@
+"""Silence and loudness analysis of the scene audio, stored in a sidecar index.
+
+    python audio_analysis.py
+
+decodes every file in scene_audio/ (through audio_pcm, so it is quick
+after `python audio_pcm.py`) and measures, with vectorized NumPy over the
+samples:
+
+    start, end   the first and last audible frame, found per 10 ms block
+                 against SILENCE_DBFS, padded by PAD_SECONDS so attacks
+                 and tails are not clipped
+    loudness     RMS level of the audible blocks in dBFS
+    peak         largest sample as a fraction of full scale
+    gain         linear gain that brings loudness to TARGET_DBFS, limited
+                 to MAX_GAIN_DB and to what the peak leaves room for
+
+The results go to audio_analysis.json with each file's size and mtime.
+SceneAudio looks a scene up with levels() and applies the trim and gain
+once when the sound is loaded, so nothing is analysed on the way to a play.
+
+Streamed scenes cannot be treated that way: the music stream's volume
+only turns a file down. So for each stream-sized scene that needs a boost
+the build also writes its audible part at its gain to STREAM_DIR, and the
+entry's "stream" names that copy. Streams that only need turning down play
+the source (or its PCM copy) from "start" at "gain" as their volume.
+"""
+import json
+import os
+import threading
+
+import numpy as np
+import pygame
+
+INDEX_PATH = "audio_analysis.json"
+AUDIO_DIR = "scene_audio"
+STREAM_DIR = os.path.join("audio_pcm", "levelled")  # Boosted copies of streamed scenes
+
+SILENCE_DBFS = -50.0  # Blocks whose peak stays below this count as silence
+BLOCK_SECONDS = 0.01
+PAD_SECONDS = 0.05  # Kept on each side of the audible part
+TARGET_DBFS = -20.0  # RMS level every scene is brought to
+MAX_GAIN_DB = 12.0
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def _dbfs(level):
+    return float(20 * np.log10(level)) if level > 0 else float("-inf")
+
+
+def analyze(samples, frequency):
+    """Measure an array of samples shaped (frames, channels) or (frames,). Returns an index entry."""
+    if samples.ndim == 1:
+        samples = samples[:, np.newaxis]
+    frames = len(samples)
+    full_scale = float(np.iinfo(samples.dtype).max) if samples.dtype.kind in "iu" else 1.0
+
+    block = max(1, int(frequency * BLOCK_SECONDS))
+    blocks = -(-frames // block)
+    padded = np.zeros((blocks * block, samples.shape[1]), dtype=np.float32)
+    padded[:frames] = samples
+    padded /= full_scale
+    padded = padded.reshape(blocks, -1)
+
+    block_peaks = np.abs(padded).max(axis=1)
+    audible = np.flatnonzero(block_peaks >= 10 ** (SILENCE_DBFS / 20))
+    if len(audible) == 0:
+        return {"start": 0, "end": frames, "loudness": None, "peak": 0.0, "gain": 1.0}
+
+    pad = int(frequency * PAD_SECONDS)
+    start = max(0, int(audible[0]) * block - pad)
+    end = min(frames, (int(audible[-1]) + 1) * block + pad)
+
+    loud = padded[audible]
+    loudness = _dbfs(np.sqrt(np.mean(np.square(loud, dtype=np.float64))))
+    peak = float(block_peaks[audible].max())
+    gain_db = min(TARGET_DBFS - loudness, MAX_GAIN_DB, -_dbfs(peak))
+    return {
+        "start": start,
+        "end": end,
+        "loudness": round(loudness, 2),
+        "peak": round(peak, 4),
+        "gain": round(10 ** (gain_db / 20), 4),
+    }
+
+
+def analyze_file(path):
+    """Decode path in the mixer's format and analyze it."""
+    from audio_pcm import load_sound
+    sound = load_sound(path)
+    return analyze(pygame.sndarray.samples(sound), pygame.mixer.get_init()[0])
+
+
+def write_stream_copy(path, entry, stream_dir=STREAM_DIR):
+    """Write the audible part of path at its analysed gain as a WAV to stream. Returns the copy's path."""
+    from audio_pcm import load_sound, write_wav
+    sound = apply_gain(load_sound(path, entry["start"], entry["end"]), entry["gain"])
+    os.makedirs(stream_dir, exist_ok=True)
+    target = os.path.join(stream_dir, os.path.splitext(os.path.basename(path))[0] + ".wav")
+    write_wav(target, sound.get_raw(), pygame.mixer.get_init())
+    return target
+
+
+def build(audio_dir=AUDIO_DIR, stream_dir=STREAM_DIR):
+    """Analyze every scene file, write boosted copies of the streamed ones and write the index."""
+    from audio_pcm import iter_sources
+    from audio_service import get_audio_service
+    from scene_audio import is_stream_sized
+    if not get_audio_service().available:
+        raise SystemExit("The mixer could not be initialized, so the sample format is unknown")
+
+    entries = {}
+    for path in iter_sources((audio_dir,)):
+        try:
+            stat = os.stat(path)
+            entry = analyze_file(path)
+            if entry["gain"] > 1.0 and is_stream_sized(path):
+                entry["stream"] = write_stream_copy(path, entry, stream_dir)
+        except Exception as e:
+            print(f"Error analyzing {path}: {e}")
+            continue
+        entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        entries[path] = entry
+
+    wanted = {os.path.basename(entry["stream"]) for entry in entries.values() if "stream" in entry}
+    if os.path.isdir(stream_dir):
+        for name in os.listdir(stream_dir):
+            if name.endswith(".wav") and name not in wanted:
+                os.remove(os.path.join(stream_dir, name))
+
+    index = {"format": list(pygame.mixer.get_init()), "target_dbfs": TARGET_DBFS, "files": entries}
+    tmp_path = INDEX_PATH + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(index, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, INDEX_PATH)
+
+    frequency = pygame.mixer.get_init()[0]
+    lead = sum(entry["start"] for entry in entries.values()) / frequency
+    print(f"{len(entries)} files analyzed, {lead:.1f}s of leading silence in total, "
+          f"{len(wanted)} streamed scenes boosted into {stream_dir}")
+    return index
+
+
+def _load_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            try:
+                with open(INDEX_PATH) as f:
+                    _index = json.load(f)
+            except (OSError, ValueError):
+                _index = {"format": None, "files": {}}
+        return _index
+
+
+def reload_index():
+    """Forget the cached index, e.g. after a rebuild while running."""
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def levels(path):
+    """Return the up-to-date index entry for path in the current mixer format, or None."""
+    mixer_format = pygame.mixer.get_init()
+    if not mixer_format:
+        return None
+    index = _load_index()
+    if index["format"] != list(mixer_format):
+        return None  # Frame offsets are only valid at the sample rate they were measured at
+    entry = index["files"].get(os.path.normpath(path))
+    if entry is None:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    if stat.st_size != entry["size"] or stat.st_mtime_ns != entry["mtime_ns"]:
+        return None  # Edited since the last analysis
+    return entry
+
+
+def apply_gain(sound, gain):
+    """Set sound's level to gain once: as its volume when quieter, scaling the samples when louder."""
+    if gain <= 1.0:
+        sound.set_volume(gain)
+        return sound
+    samples = pygame.sndarray.samples(sound)
+    full_scale = np.iinfo(samples.dtype) if samples.dtype.kind in "iu" else None
+    scaled = samples * np.float32(gain)
+    if full_scale is not None:
+        np.clip(scaled, full_scale.min, full_scale.max, out=scaled)
+    samples[...] = scaled
+    return sound
+
+
+if __name__ == "__main__":
+    import argparse
+
+    # Analysis needs the mixer's format, not a sound card
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    parser = argparse.ArgumentParser(description="Measure silence and loudness of the scene audio")
+    parser.add_argument("dir", nargs="?", default=AUDIO_DIR)
+    args = parser.parse_args()
+    build(args.dir)
@@ -0,0 +1,145 @@
+"""Cheap facts about audio files, read without decoding them.
+
+audio_duration() handles the two formats found under scene_audio (some
+".mp3" files there are really WAV):
+
+    WAV   the fmt chunk's byte rate and the data chunk's size
+    MP3   the first MPEG audio frame header (after any ID3v2 tag), with the
+          Xing/Info frame count when the file has one (VBR), or the file
+          size and bitrate otherwise (CBR)
+
+That is a few hundred bytes of I/O, against a full decode for
+Sound.get_length().
+"""
+import os
+import struct
+
+# Bitrates in kbit/s by [MPEG-1?][layer][index]
+_BITRATES = {
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+# Sample rates by version bits (3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5)
+_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+HEADER_SCAN_BYTES = 64 * 1024  # How far into the file to look for the first frame
+
+
+def _skip_id3v2(data):
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        return 10 + size
+    return 0
+
+
+def _parse_frame_header(header):
+    """Return (mpeg1, layer, bitrate bit/s, sample rate, mono) for a 4-byte header, or None."""
+    b1, b2, b3 = header[1], header[2], header[3]
+    version_bits = (b1 >> 3) & 3
+    layer_bits = (b1 >> 1) & 3
+    bitrate_index = b2 >> 4
+    rate_index = (b2 >> 2) & 3
+    if version_bits == 1 or layer_bits == 0 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    mpeg1 = version_bits == 3
+    layer = 4 - layer_bits
+    bitrate = _BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version_bits][rate_index]
+    mono = (b3 >> 6) == 3
+    return mpeg1, layer, bitrate, sample_rate, mono
+
+
+def audio_format(path):
+    """Return "wav" or "mp3" from a file's first bytes (whatever its extension says), or None."""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(12)
+    except OSError:
+        return None
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return "wav"
+    if head[:3] == b"ID3" or (len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        return "mp3"
+    return None
+
+
+def wav_duration(path):
+    """Duration of a RIFF/WAVE file in seconds, or None if it is not one."""
+    try:
+        with open(path, "rb") as f:
+            riff = f.read(12)
+            if riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+                return None
+            byte_rate = None
+            while True:
+                chunk = f.read(8)
+                if len(chunk) < 8:
+                    return None
+                chunk_id, chunk_size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+                if chunk_id == b"fmt ":
+                    fmt = f.read(chunk_size)
+                    byte_rate = struct.unpack("<I", fmt[8:12])[0]
+                    chunk_size = 0
+                elif chunk_id == b"data":
+                    if not byte_rate:
+                        return None
+                    # Clamp to the file in case the header claims more than was written
+                    data_size = min(chunk_size, os.path.getsize(path) - f.tell())
+                    return data_size / byte_rate
+                f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+    except (OSError, struct.error):
+        return None
+
+
+def audio_duration(path):
+    """Estimated duration of a WAV or MP3 file in seconds, or None if it cannot be told cheaply."""
+    duration = wav_duration(path)
+    if duration is None:
+        duration = mp3_duration(path)
+    return duration
+
+
+def mp3_duration(path):
+    """Estimated duration of an MP3 file in seconds, or None if no frame header is found."""
+    try:
+        file_size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            data = f.read(HEADER_SCAN_BYTES)
+            offset = _skip_id3v2(data)
+            if offset + 4 > len(data):
+                f.seek(offset)
+                data = f.read(HEADER_SCAN_BYTES)
+                base = offset
+            else:
+                base = 0
+    except OSError:
+        return None
+
+    position = offset - base
+    while position + 4 <= len(data):
+        if data[position] == 0xFF and data[position + 1] & 0xE0 == 0xE0:
+            info = _parse_frame_header(data[position:position + 4])
+            if info:
+                break
+        position += 1
+    else:
+        return None
+
+    mpeg1, layer, bitrate, sample_rate, mono = info
+    samples_per_frame = 384 if layer == 1 else (1152 if mpeg1 or layer == 2 else 576)
+
+    # VBR files carry the frame count in a Xing/Info header inside the first frame
+    side_info = (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+    xing = position + 4 + side_info
+    if data[xing:xing + 4] in (b"Xing", b"Info") and len(data) >= xing + 12:
+        (flags,) = struct.unpack(">I", data[xing + 4:xing + 8])
+        if flags & 1:
+            (frames,) = struct.unpack(">I", data[xing + 8:xing + 12])
+            return frames * samples_per_frame / sample_rate
+
+    audio_bytes = file_size - (base + position)
+    return audio_bytes * 8 / bitrate
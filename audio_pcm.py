@@ -0,0 +1,225 @@
+"""Pre-transcoded PCM copies of the scene and key audio.
+
+    python audio_pcm.py
+
+decodes every file in scene_audio/ and sounds/ once into exactly the
+mixer's sample format (audio_service: 44.1 kHz, 16-bit, stereo) and
+stores it under audio_pcm/ as <sha1 of the source>-<format>.wav, a
+canonical 44-byte WAV header followed by raw PCM. Files are keyed by
+content, so identical sources share one copy and an edited source gets a
+new one; the manifest maps each source path (with its size and mtime) to
+its hash so the runtime never has to hash anything.
+
+At runtime load_sound() memory-maps the PCM and hands it to the mixer as
+a buffer: no decode, just one copy into the mixer's chunk, after which the
+mapping is closed and the pages stay shared in the page cache. Streamed
+scenes play the PCM file through the music stream instead of decoding the
+MP3. Anything without an up-to-date PCM copy falls back to decoding the
+source, so a stale or missing build never breaks playback.
+
+ffmpeg is used for transcoding when it is installed, pygame's decoder
+otherwise.
+"""
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import struct
+import subprocess
+import threading
+
+import pygame
+
+PCM_DIR = "audio_pcm"
+MANIFEST_PATH = os.path.join(PCM_DIR, "manifest.json")
+SOURCE_DIRS = ("scene_audio", "sounds")
+SOURCE_SUFFIXES = (".mp3", ".wav", ".ogg")
+WAV_HEADER_SIZE = 44
+
+_manifest = None
+_manifest_lock = threading.Lock()
+
+
+def _format_tag(mixer_format):
+    frequency, size, channels = mixer_format
+    return f"{frequency}-{abs(size)}-{channels}"
+
+
+def _wav_header(data_size, frequency, sample_bytes, channels):
+    block_align = sample_bytes * channels
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_size, b"WAVE",
+        b"fmt ", 16, 1, channels, frequency, frequency * block_align, block_align, sample_bytes * 8,
+        b"data", data_size,
+    )
+
+
+def write_wav(target, pcm, mixer_format):
+    """Write raw PCM in mixer_format to target as a canonical WAV, replacing it atomically."""
+    frequency, size, channels = mixer_format
+    tmp_path = target + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_wav_header(len(pcm), frequency, abs(size) // 8, channels))
+        f.write(pcm)
+    os.replace(tmp_path, target)
+
+
+def file_sha1(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def pcm_path(sha1, mixer_format):
+    return os.path.join(PCM_DIR, f"{sha1}-{_format_tag(mixer_format)}.wav")
+
+
+def _decode_pcm(source, mixer_format):
+    """Return the raw PCM of source in mixer_format."""
+    frequency, size, channels = mixer_format
+    if shutil.which("ffmpeg"):
+        sample_format = {8: "u8", 16: "s16le", 32: "s32le"}[abs(size)]
+        result = subprocess.run(
+            ["ffmpeg", "-v", "error", "-i", source, "-f", sample_format,
+             "-ac", str(channels), "-ar", str(frequency), "-"],
+            check=True, capture_output=True
+        )
+        return result.stdout
+    # pygame decodes straight into the format the mixer was opened with
+    return pygame.mixer.Sound(source).get_raw()
+
+
+def transcode(source, mixer_format):
+    """Write the PCM copy of source if it is missing. Returns its manifest entry."""
+    stat = os.stat(source)
+    sha1 = file_sha1(source)
+    target = pcm_path(sha1, mixer_format)
+    if not os.path.exists(target):
+        write_wav(target, _decode_pcm(source, mixer_format), mixer_format)
+        print(f"Transcoded {source} -> {target}")
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha1": sha1}
+
+
+def iter_sources(source_dirs=SOURCE_DIRS):
+    for source_dir in source_dirs:
+        if not os.path.isdir(source_dir):
+            continue
+        for name in sorted(os.listdir(source_dir)):
+            if name.lower().endswith(SOURCE_SUFFIXES):
+                yield os.path.join(source_dir, name)
+
+
+def build(source_dirs=SOURCE_DIRS):
+    """Transcode every source, write the manifest and delete PCM files nothing refers to."""
+    from audio_service import get_audio_service
+    if not get_audio_service().available:
+        raise SystemExit("The mixer could not be initialized, so the target format is unknown")
+    mixer_format = pygame.mixer.get_init()
+    os.makedirs(PCM_DIR, exist_ok=True)
+
+    entries = {}
+    for source in iter_sources(source_dirs):
+        try:
+            entries[source] = transcode(source, mixer_format)
+        except Exception as e:
+            print(f"Error transcoding {source}: {e}")
+
+    manifest = {"format": list(mixer_format), "sources": entries}
+    tmp_path = MANIFEST_PATH + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+    wanted = {os.path.basename(pcm_path(entry["sha1"], mixer_format)) for entry in entries.values()}
+    for name in os.listdir(PCM_DIR):
+        if name.endswith(".wav") and name not in wanted:
+            os.remove(os.path.join(PCM_DIR, name))
+    print(f"{len(entries)} sources, {len(wanted)} PCM files in {PCM_DIR}")
+    return manifest
+
+
+def _load_manifest():
+    global _manifest
+    with _manifest_lock:
+        if _manifest is None:
+            try:
+                with open(MANIFEST_PATH) as f:
+                    _manifest = json.load(f)
+            except (OSError, ValueError):
+                _manifest = {"format": None, "sources": {}}
+        return _manifest
+
+
+def reload_manifest():
+    """Forget the cached manifest, e.g. after a rebuild while running."""
+    global _manifest
+    with _manifest_lock:
+        _manifest = None
+
+
+def find_pcm(source):
+    """Return the up-to-date PCM copy of source for the current mixer format, or None."""
+    mixer_format = pygame.mixer.get_init()
+    if not mixer_format:
+        return None
+    manifest = _load_manifest()
+    if manifest["format"] != list(mixer_format):
+        return None
+    entry = manifest["sources"].get(os.path.normpath(source))
+    if entry is None:
+        return None
+    try:
+        stat = os.stat(source)
+    except OSError:
+        return None
+    if stat.st_size != entry["size"] or stat.st_mtime_ns != entry["mtime_ns"]:
+        return None  # Edited since the last build
+    path = pcm_path(entry["sha1"], mixer_format)
+    return path if os.path.exists(path) else None
+
+
+def load_sound(source, start=0, end=None):
+    """pygame Sound for source, from its memory-mapped PCM copy when there is one, else decoded.
+
+    start and end (in frames) keep only that part of the audio.
+    """
+    mixer_format = pygame.mixer.get_init()
+    frame_bytes = abs(mixer_format[1]) // 8 * mixer_format[2] if mixer_format else 0
+    first = start * frame_bytes
+    last = end * frame_bytes if end is not None else None
+    path = find_pcm(source)
+    if path is not None:
+        try:
+            with open(path, "rb") as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    with memoryview(mapped)[WAV_HEADER_SIZE:] as pcm, pcm[first:last] as part:
+                        return pygame.mixer.Sound(buffer=part)
+        except (OSError, ValueError) as e:
+            print(f"Error mapping {path}, decoding {source} instead: {e}")
+    sound = pygame.mixer.Sound(source)
+    if start or end is not None:
+        sound = pygame.mixer.Sound(buffer=sound.get_raw()[first:last])
+    return sound
+
+
+def stream_source(source):
+    """Return (path, namehint) to stream for source: its PCM copy if there is one, else itself."""
+    path = find_pcm(source)
+    if path is not None:
+        return path, "wav"
+    return source, ""
+
+
+if __name__ == "__main__":
+    import argparse
+
+    # Transcoding needs the mixer's format, not a sound card
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    parser = argparse.ArgumentParser(description="Transcode scene and key audio to mixer-native PCM")
+    parser.add_argument("dirs", nargs="*", default=list(SOURCE_DIRS))
+    args = parser.parse_args()
+    build(args.dirs)
@@ -0,0 +1,70 @@
+import os
+import threading
+
+MAX_PREFETCH = 6  # Successor scenes decoded ahead of time per scene entry
+
+
+class AudioPrefetcher:
+    """Decodes the audio of likely next scenes on a background thread.
+
+    Each call to prefetch() replaces the previous request, so work queued
+    for a scene the player has already left is dropped. A decode that is
+    already running finishes, but its result is only cached if the scene is
+    still wanted, so stale work never evicts useful audio.
+    """
+
+    def __init__(self, cache, audio_dir="scene_audio", max_prefetch=MAX_PREFETCH):
+        self.cache = cache
+        self.audio_dir = audio_dir
+        self.max_prefetch = max_prefetch
+        self._queue = []
+        self._generation = 0
+        self._condition = threading.Condition()
+        self._stopped = False
+        self.prefetched = 0
+        self.cancelled = 0
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+    def prefetch(self, scene_ids):
+        """Replace any pending work with decoding the audio for scene_ids, in order."""
+        with self._condition:
+            self.cancelled += len(self._queue)
+            self._generation += 1
+            self._queue = [scene_id for scene_id in scene_ids if scene_id not in self.cache][:self.max_prefetch]
+            self._condition.notify()
+
+    def cancel(self):
+        """Drop any pending work, e.g. when the phone is hung up."""
+        self.prefetch([])
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._queue = []
+            self._condition.notify()
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                while not self._queue and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                scene_id = self._queue.pop(0)
+                generation = self._generation
+
+            path = os.path.join(self.audio_dir, f"{scene_id}.mp3")
+            if scene_id in self.cache or not os.path.exists(path):
+                continue
+            try:
+                sound = self.cache.decode(path)
+            except Exception as e:
+                print(f"Error prefetching audio for {scene_id}: {e}")
+                continue
+
+            with self._condition:
+                stale = generation != self._generation and scene_id not in self._queue
+            if not stale:
+                self.cache.put(scene_id, sound)
+                self.prefetched += 1
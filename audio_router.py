@@ -0,0 +1,148 @@
+"""Switching audio between the AUX (ringer) and AIY (handset) sinks.
+
+The payphone used to fork `pactl set-default-sink` after a fixed half
+second sleep on every pickup and hang-up, in front of the intro. Routers
+here keep the mixer's output stream open the whole time and move it
+between sinks in-process:
+
+    PulseRouter   one persistent PulseAudio connection (the optional
+                  pulsectl package); sets the default sink and moves this
+                  process's open streams to it
+    PactlRouter   fallback without pulsectl: runs pactl on a background
+                  thread, so callers never wait for the fork
+    NullRouter    local stand-in that only records the switches, for PCs,
+                  tests and benchmarks
+
+PAYPHONE_AUDIO_ROUTER selects one: "pulse", "pactl", "null" or "auto"
+(the default: pulse if pulsectl imports and connects, otherwise pactl if
+it is installed, otherwise null).
+"""
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+
+AUX_SINK = "alsa_output.platform-3f00b840.mailbox.stereo-fallback"
+AIY_SINK = "alsa_output.platform-soc_sound.stereo-fallback"
+
+
+class AudioRouter:
+    """Moves audio output between named sinks."""
+
+    def __init__(self):
+        self.current = None
+
+    def switch(self, sink_name):
+        """Route output to sink_name. Returns without waiting for slow work."""
+        if sink_name == self.current:
+            return
+        self._switch(sink_name)
+        self.current = sink_name
+
+    def _switch(self, sink_name):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class PulseRouter(AudioRouter):
+    """In-process routing over a persistent pulsectl connection."""
+
+    def __init__(self, client_name="payphone"):
+        super().__init__()
+        import pulsectl
+        self._pulse = pulsectl.Pulse(client_name)
+        self._lock = threading.Lock()
+        self._pid = str(os.getpid())
+
+    def _own_streams(self):
+        return [
+            stream for stream in self._pulse.sink_input_list()
+            if stream.proplist.get("application.process.id") == self._pid
+        ]
+
+    def _switch(self, sink_name):
+        with self._lock:
+            sink = self._pulse.get_sink_by_name(sink_name)
+            self._pulse.default_set(sink)  # New streams open on this sink
+            for stream in self._own_streams():
+                # Open streams (the mixer's) move without being reopened
+                self._pulse.sink_input_move(stream.index, sink.index)
+        print(f"Switched audio to {sink_name}")
+
+    def load_null_sink(self, sink_name):
+        """Create a local null sink to route to in tests. Returns its module index."""
+        with self._lock:
+            return self._pulse.module_load("module-null-sink", f"sink_name={sink_name}")
+
+    def close(self):
+        self._pulse.close()
+
+
+class PactlRouter(AudioRouter):
+    """Runs `pactl set-default-sink` on a worker thread; only the newest request is applied."""
+
+    def __init__(self):
+        super().__init__()
+        self._requests = queue.Queue()
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+    def _switch(self, sink_name):
+        self._requests.put(sink_name)
+
+    def _worker(self):
+        while True:
+            sink_name = self._requests.get()
+            if sink_name is None:
+                return
+            # Skip switches that a newer request has already replaced
+            while not self._requests.empty():
+                newer = self._requests.get_nowait()
+                if newer is None:
+                    return
+                sink_name = newer
+            try:
+                result = subprocess.run(
+                    ["pactl", "set-default-sink", sink_name],
+                    check=False, capture_output=True, text=True
+                )
+                if result.returncode == 0:
+                    print(f"Switched audio to {sink_name}")
+                else:
+                    print(f"Error switching to {sink_name}: {result.stderr}")
+            except Exception as e:
+                print(f"Error in audio switch: {e}")
+
+    def close(self):
+        self._requests.put(None)
+
+
+class NullRouter(AudioRouter):
+    """Stand-in sink router: records (time.perf_counter(), sink) for every switch."""
+
+    def __init__(self):
+        super().__init__()
+        self.switches = []
+
+    def _switch(self, sink_name):
+        self.switches.append((time.perf_counter(), sink_name))
+
+
+def load_audio_router(kind=None):
+    """Pick an audio router per PAYPHONE_AUDIO_ROUTER (see module docstring)."""
+    kind = kind or os.environ.get("PAYPHONE_AUDIO_ROUTER", "auto")
+    if kind in ("auto", "pulse"):
+        try:
+            return PulseRouter()
+        except Exception as e:
+            # ImportError without pulsectl, or no PulseAudio server to connect to
+            if kind == "pulse":
+                raise
+            print(f"PulseAudio routing unavailable ({e})")
+    if kind == "pactl" or (kind == "auto" and shutil.which("pactl")):
+        return PactlRouter()
+    return NullRouter()
@@ -0,0 +1,296 @@
+"""The one owner of the pygame mixer.
+
+Every module plays through the shared service from get_audio_service()
+instead of initializing the mixer itself, so the mixer is set up exactly
+once and never torn down (which used to invalidate loaded sounds and
+restart the output stream).
+
+Channel plan (reserved, so pygame never hands them to ad-hoc Sound.play()):
+
+    name     channel  priority  exclusive
+    beep     0        2         no
+    scene    1        3         yes
+    keypad   2        2         no
+    ring     3        1         yes
+
+Non-exclusive channels mix freely over the others. Among exclusive
+channels, a higher priority sound stops lower priority ones when it
+starts, and a lower priority sound is refused while a higher priority one
+is playing, so the ringer never talks over a scene.
+
+Fixed sounds (key tones, beep, ring) are decoded once into the service's
+sound bank with load(); scene audio goes through SceneAudio's SoundCache.
+Both take the pre-transcoded PCM from audio_pcm when it is up to date.
+
+play_stream() plays a file through pygame.mixer.music instead, which
+decodes it a buffer at a time, on behalf of a plan entry: the stream then
+counts as that channel for busy checks, priorities and stop().
+
+Each session (see session.py) plays through a ChannelSet: its own copy of
+the plan on channels of its own (set n uses the plan's channel numbers plus
+n * len(CHANNEL_PLAN)), with the priority rules applied within the set.
+The service's play()/stop()/is_busy() act on set 0. There is only one
+music stream per process; a set whose can_stream() is False plays whole
+sounds instead.
+"""
+import os
+import threading
+
+import pygame
+
+from audio_pcm import load_sound
+
+FREQUENCY = 44100
+SAMPLE_SIZE = -16
+OUTPUT_CHANNELS = 2
+BUFFER_SIZE = 2048
+
+# name -> (mixer channel, priority, exclusive)
+CHANNEL_PLAN = {
+    "beep": (0, 2, False),
+    "scene": (1, 3, True),
+    "keypad": (2, 2, False),
+    "ring": (3, 1, True),
+}
+SPARE_CHANNELS = 4  # Unreserved channels left for anything played without a plan entry
+
+# Output device for the mixer; empty means the default (routing is done by audio_router)
+AUDIO_DEVICE = os.environ.get("PAYPHONE_AUDIO_DEVICE", "")
+
+
+class ChannelSet:
+    """One session's mixer channels, one per CHANNEL_PLAN entry."""
+
+    def __init__(self, service, index):
+        self.service = service
+        self.index = index
+        self.channels = {}
+        self.stream_owner = None  # Plan entry the music stream is playing for, while this set holds it
+
+    def _bind(self):
+        offset = self.index * len(CHANNEL_PLAN)
+        self.channels = {
+            name: pygame.mixer.Channel(number + offset) for name, (number, _, _) in CHANNEL_PLAN.items()
+        }
+
+    def channel(self, name):
+        """Return the mixer Channel for a plan entry, or None without audio."""
+        if not self.service.available and not self.service.init():
+            return None
+        return self.channels.get(name)
+
+    def load(self, path, name=None, volume=None):
+        return self.service.load(path, name, volume)
+
+    def sound(self, name):
+        return self.service.sound(name)
+
+    def frequency(self):
+        return self.service.frequency()
+
+    def _stream_busy(self, name):
+        return self.stream_owner == name and self.service.stream_set is self and pygame.mixer.music.get_busy()
+
+    def can_stream(self):
+        """True unless another set's stream is playing (there is one music stream per process)."""
+        holder = self.service.stream_set
+        return holder is None or holder is self or not pygame.mixer.music.get_busy()
+
+    def _blocked_by(self, name):
+        """Return the busy exclusive channel that outranks name, if any."""
+        number, priority, exclusive = CHANNEL_PLAN[name]
+        if not exclusive:
+            return None
+        for other, (other_number, other_priority, other_exclusive) in CHANNEL_PLAN.items():
+            if other != name and other_exclusive and other_priority > priority and self.is_busy(other):
+                return other
+        return None
+
+    def _claim(self, name):
+        """Prepare the named channel for a new sound. Returns False if it may not play now."""
+        number, priority, exclusive = CHANNEL_PLAN[name]
+        if exclusive:
+            if self._blocked_by(name):
+                return False
+            for other, (other_number, other_priority, other_exclusive) in CHANNEL_PLAN.items():
+                if other != name and other_exclusive and other_priority < priority:
+                    self.stop(other)
+        # A sound and a stream never play for the same entry at once
+        self.stop(name)
+        return True
+
+    def play(self, name, sound, loops=0):
+        """Play sound on the named channel, cutting off what it was playing.
+
+        Returns False if there is no audio or a higher priority exclusive
+        channel is busy.
+        """
+        channel = self.channel(name)
+        if channel is None or sound is None:
+            return False
+        if not self._claim(name):
+            return False
+        channel.play(sound, loops=loops)
+        return True
+
+    def play_stream(self, name, path, loops=0, namehint="", start=0.0, volume=1.0):
+        """Stream path through pygame.mixer.music for the named channel. Same rules and result as play().
+
+        namehint ("wav", "mp3") picks the decoder when the file extension is wrong;
+        start skips that many seconds and volume applies to this stream only.
+        Returns False as well while another set holds the stream.
+        """
+        if self.channel(name) is None:
+            return False
+        with self.service._lock:
+            if not self.can_stream() or not self._claim(name):
+                return False
+            try:
+                pygame.mixer.music.load(path, namehint)
+                pygame.mixer.music.set_volume(volume)
+                pygame.mixer.music.play(loops=loops, start=start)
+            except Exception as e:
+                print(f"Error streaming {path}: {e}")
+                return False
+            self.service.stream_set = self
+            self.stream_owner = name
+            return True
+
+    def is_busy(self, name):
+        channel = self.channel(name)
+        return channel is not None and (channel.get_busy() or self._stream_busy(name))
+
+    def stop(self, *names):
+        """Stop the named channels (all of the plan if none are given)."""
+        if not self.service.available:
+            return
+        for name in names or CHANNEL_PLAN:
+            self.channels[name].stop()
+            if self.stream_owner == name:
+                if self.service.stream_set is self:
+                    pygame.mixer.music.stop()
+                    self.service.stream_set = None
+                self.stream_owner = None
+
+
+class AudioService:
+    def __init__(self, device=AUDIO_DEVICE):
+        self.device = device or None
+        self.available = False
+        self.sounds = {}  # Sound bank: name -> pygame.mixer.Sound
+        self.channel_sets = [ChannelSet(self, 0)]
+        self.default_set = self.channel_sets[0]
+        self.stream_set = None  # ChannelSet the music stream was last started for
+        self._lock = threading.RLock()
+
+    def init(self):
+        """Initialize the mixer and reserve the channel plan. Safe to call repeatedly."""
+        with self._lock:
+            if self.available:
+                return True
+            try:
+                if not pygame.mixer.get_init():
+                    pygame.mixer.pre_init(FREQUENCY, SAMPLE_SIZE, OUTPUT_CHANNELS, BUFFER_SIZE)
+                    if self.device:
+                        pygame.mixer.init(devicename=self.device)
+                    else:
+                        pygame.mixer.init()
+                print("Audio system initialized successfully")
+            except Exception as e:
+                print(f"Error initializing audio system: {e}")
+                try:
+                    pygame.mixer.init()
+                    print("Fallback audio initialization successful")
+                except Exception as e:
+                    print(f"Critical audio initialization error: {e}")
+                    return False
+
+            self._reserve()
+            self.available = True
+            return True
+
+    def _reserve(self):
+        reserved = len(CHANNEL_PLAN) * len(self.channel_sets)
+        pygame.mixer.set_num_channels(reserved + SPARE_CHANNELS)
+        pygame.mixer.set_reserved(reserved)
+        for channel_set in self.channel_sets:
+            channel_set._bind()
+
+    def new_channel_set(self):
+        """Reserve mixer channels for one more session. Returns its ChannelSet."""
+        with self._lock:
+            channel_set = ChannelSet(self, len(self.channel_sets))
+            self.channel_sets.append(channel_set)
+            if self.available:
+                self._reserve()
+            return channel_set
+
+    @property
+    def channels(self):
+        return self.default_set.channels
+
+    @property
+    def stream_owner(self):
+        return self.default_set.stream_owner
+
+    def channel(self, name):
+        return self.default_set.channel(name)
+
+    def load(self, path, name=None, volume=None):
+        """Decode path into the sound bank (once), under name or the path. Returns the Sound or None."""
+        name = name or path
+        with self._lock:
+            sound = self.sounds.get(name)
+            if sound is not None:
+                return sound
+            if not os.path.exists(path):
+                print(f"Sound file not found: {path}")
+                return None
+            if not self.available and not self.init():
+                return None
+            try:
+                sound = load_sound(path)
+            except Exception as e:
+                print(f"Error loading sound {path}: {e}")
+                return None
+            if volume is not None:
+                sound.set_volume(volume)
+            self.sounds[name] = sound
+            return sound
+
+    def sound(self, name):
+        return self.sounds.get(name)
+
+    def frequency(self):
+        """Sample rate the mixer actually opened with."""
+        mixer_format = pygame.mixer.get_init()
+        return mixer_format[0] if mixer_format else FREQUENCY
+
+    def can_stream(self):
+        return self.default_set.can_stream()
+
+    def play(self, name, sound, loops=0):
+        return self.default_set.play(name, sound, loops)
+
+    def play_stream(self, name, path, loops=0, namehint="", start=0.0, volume=1.0):
+        return self.default_set.play_stream(name, path, loops, namehint, start, volume)
+
+    def is_busy(self, name):
+        return self.default_set.is_busy(name)
+
+    def stop(self, *names):
+        self.default_set.stop(*names)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_audio_service():
+    """The process-wide AudioService, with the mixer initialized on first use."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = AudioService()
+            _service.init()
+        return _service
@@ -0,0 +1,118 @@
+"""End-to-end key press to scene audio latency benchmark.
+
+Runs the real engine loop against the simulated keypad and hook switch
+(gpio_backend.SimulatedGPIO) with SDL's dummy audio driver, lifts the
+handset, then walks hub -> book -> hub for each book a number of times.
+For every step it measures the time from the simulated key press to the
+scene's sound starting on the mixer channel.
+
+    python bench_latency.py --rounds 20
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import threading
+import time
+
+os.environ.setdefault("PAYPHONE_GPIO", "sim")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import keypad  # noqa: E402
+import engine  # noqa: E402
+from scene_audio import SceneAudio  # noqa: E402
+
+# Hub key -> book scene it leads to
+ROUTE = [("1", "Fahrenheit_451"), ("2", "Lord_of_the_Rings"), ("3", "Animal_Farm"), ("4", "Where_the_Wild_Things_Are")]
+STEP_TIMEOUT = 10  # Seconds to wait for a scene's audio before giving up
+
+
+class SceneStartWatcher:
+    """Records when each scene's audio starts playing."""
+
+    def __init__(self, scene_audio):
+        self._condition = threading.Condition()
+        self._started = []
+        scene_audio.play_listeners.append(self._on_play)
+
+    def _on_play(self, scene_id):
+        with self._condition:
+            self._started.append((scene_id, time.perf_counter()))
+            self._condition.notify_all()
+
+    def wait_for(self, scene_id, since):
+        """Return the time scene_id started playing after `since`."""
+        deadline = time.perf_counter() + STEP_TIMEOUT
+        with self._condition:
+            while True:
+                for started_id, started_at in self._started:
+                    if started_id == scene_id and started_at >= since:
+                        return started_at
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    raise TimeoutError(f"Audio for {scene_id} never started")
+                self._condition.wait(remaining)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def run(rounds):
+    gpio = keypad.GPIO
+    if not hasattr(gpio, "tap"):
+        raise SystemExit("bench_latency.py needs the simulated GPIO backend (PAYPHONE_GPIO=sim)")
+
+    scene_audio = SceneAudio()
+    watcher = SceneStartWatcher(scene_audio)
+    threading.Thread(target=engine.main, kwargs={"scene_audio": scene_audio}, daemon=True).start()
+
+    def step(key, scene_id):
+        # Let the engine settle back into its keypress wait and clear the same-key debounce
+        time.sleep(keypad.KEYPRESS_DELAY)
+        pressed_at = time.perf_counter()
+        gpio.tap(key)
+        return watcher.wait_for(scene_id, pressed_at) - pressed_at
+
+    lifted_at = time.perf_counter()
+    gpio.lift()
+    pickup = watcher.wait_for("intro", lifted_at) - lifted_at
+    step("0", "hub")
+
+    cold = {}
+    warm = {}
+    for round_num in range(rounds):
+        for key, book in ROUTE:
+            samples = cold if round_num == 0 else warm
+            samples.setdefault(book, []).append(step(key, book))
+            samples.setdefault("hub", []).append(step("0", "hub"))
+
+    gpio.hang_up()
+    return pickup, cold, warm
+
+
+def report(pickup, cold, warm):
+    print(f"Pickup to intro audio: {pickup * 1000:.2f} ms")
+    for label, samples in (("First visit", cold), ("Revisits", warm)):
+        if not samples:
+            continue
+        print(f"\n{label} (key press to scene audio, ms):")
+        print(f"  {'scene':<28}{'n':>4}{'p50':>9}{'p95':>9}{'max':>9}")
+        for scene_id, values in samples.items():
+            ms = [v * 1000 for v in values]
+            print(f"  {scene_id:<28}{len(ms):>4}{statistics.median(ms):>9.2f}"
+                  f"{percentile(ms, 0.95):>9.2f}{max(ms):>9.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--verbose", action="store_true", help="show the engine's own output")
+    args = parser.parse_args()
+
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        results = run(args.rounds)
+    report(*results)
@@ -0,0 +1,198 @@
+"""Prefix trie over a scene's star codes.
+
+The all-digit keys of a scene's hidden_connections are compiled into a
+trie, so code entry can check every digit as it is typed: a digit that
+leaves the valid prefixes is rejected at once, and a complete code that is
+not the start of any longer code is submitted without waiting for '#'.
+
+hidden_connections may also hold unordered multi-part codes, written as
+the parts joined with '+':
+
+    "451+7464+9453+3255": "plotdevice_check"
+
+matches the four parts typed back to back in any order. Instead of
+listing every permutation (24 for four parts, 40,320 for eight) the parts
+go into their own small trie, and a code is segmented against it in one
+left-to-right pass.
+"""
+
+UNORDERED_SEPARATOR = "+"
+WRONG_CODE = "wrong_code"  # Choice for a code rejected while it is being typed
+
+
+def parse_unordered_key(key):
+    """Return the parts of an unordered code key like "451+7464", or None if key is not one."""
+    if not isinstance(key, str) or UNORDERED_SEPARATOR not in key:
+        return None
+    parts = [part.strip() for part in key.split(UNORDERED_SEPARATOR)]
+    if not all(part.isdigit() for part in parts):
+        return None
+    return parts
+
+
+class TrieNode:
+    __slots__ = ("children", "code", "parts", "below")
+
+    def __init__(self):
+        self.children = {}
+        self.code = None  # The full code if a code ends here
+        self.parts = ()   # Indexes of the unordered code parts that end here
+        self.below = 0    # Bitmask of the unordered code parts that end here or deeper
+
+
+class UnorderedCode:
+    """A code made of several parts that may be typed in any order."""
+
+    def __init__(self, parts, target=None):
+        self.parts = list(parts)
+        self.target = target
+        self.full_mask = (1 << len(self.parts)) - 1
+        self.length = sum(len(part) for part in self.parts)
+        self.root = TrieNode()
+        for index, part in enumerate(self.parts):
+            node = self.root
+            for digit in part:
+                node = node.children.setdefault(digit, TrieNode())
+                node.below |= 1 << index
+            node.parts += (index,)
+
+    def start(self):
+        """Matching state before any digit: (trie node, bitmask of parts used)."""
+        return {(self.root, 0)}
+
+    def step(self, states, digit):
+        """Advance a set of matching states by one digit.
+
+        A state sitting on the end of a part may either close that part
+        (if an unused copy of it remains) and start the next one, or carry
+        on into a longer part, so parts that are prefixes of each other are
+        handled too. The state set stays tiny, so a whole code is matched in
+        time linear in its length.
+        """
+        next_states = set()
+        for node, used in states:
+            child = node.children.get(digit)
+            if child is None:
+                continue
+            if child.children and child.below & ~used:
+                next_states.add((child, used))  # Some unused part is still reachable below
+            for index in child.parts:
+                bit = 1 << index
+                if not used & bit:
+                    next_states.add((self.root, used | bit))
+                    break  # Identical parts are interchangeable; one unused copy is enough
+        return next_states
+
+    def is_complete(self, states):
+        return (self.root, self.full_mask) in states
+
+    def matches(self, code):
+        if len(code) != self.length:
+            return False
+        states = self.start()
+        for digit in code:
+            states = self.step(states, digit)
+            if not states:
+                return False
+        return self.is_complete(states)
+
+
+def unordered_code_keys(hidden_connections):
+    """Return (key, UnorderedCode) for each unordered code among a scene's hidden_connections."""
+    rules = []
+    for key, target in hidden_connections.items():
+        parts = parse_unordered_key(key)
+        if parts:
+            rules.append((key, UnorderedCode(parts, target)))
+    return rules
+
+
+def unordered_codes(hidden_connections):
+    """Return the UnorderedCode rules among a scene's hidden_connections."""
+    return [rule for key, rule in unordered_code_keys(hidden_connections)]
+
+
+class CodeTrie:
+    def __init__(self, codes=(), unordered=()):
+        self.root = TrieNode()
+        self.size = 0
+        self.unordered = list(unordered)
+        for code in codes:
+            self.add(code)
+
+    @classmethod
+    def from_hidden_connections(cls, hidden_connections):
+        """Build a trie from a scene's hidden_connections, or return None if it has no multi-digit codes.
+
+        Scenes without real codes keep plain '*...#' entry, where the digits
+        typed are simply resolved as a choice when '#' is pressed.
+        """
+        codes = [key for key in hidden_connections if isinstance(key, str) and key.isdigit()]
+        unordered = unordered_codes(hidden_connections)
+        if not unordered and not any(len(code) > 1 for code in codes):
+            return None
+        return cls(codes, unordered)
+
+    def add(self, code):
+        node = self.root
+        for digit in code:
+            node = node.children.setdefault(digit, TrieNode())
+        if node.code is None:
+            self.size += 1
+        node.code = code
+
+    def walk(self, prefix, start=None):
+        """Return the node reached by prefix (from start, default the root), or None if no code begins that way."""
+        node = start if start is not None else self.root
+        for digit in prefix:
+            node = node.children.get(digit)
+            if node is None:
+                return None
+        return node
+
+    def __contains__(self, code):
+        node = self.walk(code)
+        return node is not None and node.code is not None
+
+
+class CodeMatcher:
+    """Tracks one code entry through a CodeTrie (and its unordered codes) a digit at a time."""
+
+    # Results of feed()
+    CONTINUE = 0   # Valid prefix, keep typing
+    DEAD = 1       # No code starts with what has been typed
+    COMPLETE = 2   # A full code that nothing longer extends; submit it now
+
+    def __init__(self, trie):
+        self.trie = trie
+        self.node = trie.root
+        self.unordered_states = [rule.start() for rule in trie.unordered]
+        self.buffer = ""
+
+    def feed(self, digit):
+        self.buffer += digit
+        node = self.node.children.get(digit) if self.node is not None else None
+        self.node = node
+        self.unordered_states = [
+            rule.step(states, digit) for rule, states in zip(self.trie.unordered, self.unordered_states)
+        ]
+
+        can_continue = node is not None and bool(node.children)
+        complete = node is not None and node.code is not None
+        for rule, states in zip(self.trie.unordered, self.unordered_states):
+            if rule.is_complete(states):
+                complete = True
+            if any(used != rule.full_mask for _, used in states):
+                can_continue = True
+
+        if complete and not can_continue:
+            return self.COMPLETE
+        if not complete and not can_continue:
+            return self.DEAD
+        return self.CONTINUE
+
+    def is_complete(self):
+        """True if what has been typed so far is a full code."""
+        if self.node is not None and self.node.code is not None:
+            return True
+        return any(rule.is_complete(states) for rule, states in zip(self.trie.unordered, self.unordered_states))
@@ -1,8 +1,30 @@
 import os
-import yaml
+import functools
+import threading
 import keypad
+import story_loader
+import story_pack
+import story_graph
 import time
 from scene_audio import SceneAudio  # Import the new SceneAudio class
+from scene_store import SceneStore, DEFAULT_MAX_SCENES
+from story_watcher import StoryWatcher
+from transitions import CompiledTransitions, inventory_mask
+from code_trie import CodeTrie
+import phone_log
+import metrics
+import journal
+from session import default_session, all_idle
+
+log = phone_log.get_logger("engine")
+
+STORY_HOT_RELOAD = True  # Reload edited story files while the phone is on the hook
+STORY_STRICT = False  # Refuse to start on unreachable scenes and missing audio too, not just broken targets
+METRICS_EXPORT = True  # Publish metrics (see metrics.py for the file and socket settings)
+CALL_JOURNAL = True  # Record every call's events for journal_report.py (see journal.py)
+
+_story_graph = None  # Checked StoryGraph of the story being served (see check_story)
+_story_graph_lock = threading.Lock()  # Reloads are checked on the watcher thread or after a call
 
 # Try to import payphone, but handle errors gracefully
 try:
@@ -30,6 +52,8 @@ class Scene:
         self.timeout_after_audio = timeout_after_audio  # New flag
         self.timeout_seconds = timeout_seconds  # Configurable timeout duration (default 3 seconds)
         self.disable_star_hash = disable_star_hash  # Flag to disable * and # special functions
+        self.transitions = CompiledTransitions(self.connections, self.hidden_connections)
+        self.code_trie = CodeTrie.from_hidden_connections(self.hidden_connections)
 
     def display(self, inventory):
         print("-" * 50)  
@@ -39,193 +63,84 @@ class Scene:
         for key, value in self.connections.items():
             print(f"{key}. {value[0]}")
 
+    def successors(self):
+        """
+        Return the ids of every scene this scene can lead to, most likely first:
+        timeout targets (taken without any input), then numbered choices, then hidden codes.
+        """
+        return story_graph.scene_targets(self.id, self.connections, self.hidden_connections)
+
+    def uses_timeout(self, inventory):
+        """Return True if this scene should move on by itself after a timeout with this inventory."""
+        return self.transitions.uses_timeout(inventory_mask(inventory))
+
+    def grant_items(self, inventory):
+        """Add this scene's items to the inventory. Returns the ones that were new."""
+        granted = []
+        for item in self.items_granted:
+            if item not in inventory:
+                inventory.add(item)
+                granted.append(item)
+                print(f"You obtained: {item}!")
+        return granted
+
     def get_next_scene(self, choice, inventory):
         """
         Determine the next scene based on choice and inventory items.
         Supports multiple branching paths based on specific items.
+        Returns (next_scene, None) or (None, message).
         """
-        # Check if the choice is a special hidden connection (timeout, codes, etc.)
-        if choice in self.hidden_connections:
-            connection = self.hidden_connections[choice]
-            
-            # Handle timeout or default with item-based branching
-            if isinstance(connection, dict):
-                print(f"DEBUG: Item-based branching for '{choice}', checking inventory: {list(inventory)}")
-                # Find the best match (most items required that player has)
-                best_match = None
-                best_count = 0
-                
-                for item_list_str, target_scene in connection.items():
-                    if item_list_str == "default":
-                        # Save default for later
-                        continue
-                    required_items = [item.strip() for item in item_list_str.split(',')]
-                    print(f"DEBUG: Checking if player has: {required_items}")
-                    if all(item in inventory for item in required_items):
-                        if len(required_items) > best_count:
-                            best_match = target_scene
-                            best_count = len(required_items)
-                            print(f"DEBUG: New best match with {best_count} items -> {target_scene}")
-                
-                if best_match:
-                    print(f"DEBUG: Using best match: {best_match}")
-                    return best_match, None
-                elif "default" in connection:
-                    print(f"DEBUG: No items match, using default: {connection['default']}")
-                    # Make sure we return a string, not a dict
-                    if isinstance(connection["default"], str):
-                        return connection["default"], None
-                    else:
-                        print(f"WARNING: Invalid default connection type: {type(connection['default'])}")
-                        return None, "Invalid scene transition"
-                else:
-                    # No match and no default
-                    if choice == "timeout":
-                        return None, "You need the right items to progress..."
-                    else:
-                        return None, "You don't have the right items."
-            else:
-                # Regular hidden connection (simple string)
-                print(f"DEBUG: Hidden connection '{choice}' -> '{connection}'")
-                # Make sure we return a string, not a dict
-                if isinstance(connection, str):
-                    return connection, None
-                else:
-                    print(f"WARNING: Invalid connection type: {type(connection)}")
-                    return None, "Invalid scene transition"
-
-        # Check if it's a regular numbered choice (1-9, 0, etc.)
-        try:
-            choice_index = int(choice)
-            if choice_index in self.connections:
-                connection_data = self.connections[choice_index]
-                option_text = connection_data[0]
-                
-                # Handle standard format: [text, target, required_items, alt_scene]
-                if len(connection_data) >= 2 and not isinstance(connection_data[1], dict):
-                    target_scene_id = connection_data[1]
-                    required_items = connection_data[2] if len(connection_data) > 2 else []
-                    alt_scene_id = connection_data[3] if len(connection_data) > 3 else None
-                    
-                    # Special case for calling without a phone number
-                    if target_scene_id == "scene2" and "phone_number" not in inventory:
-                        return "no_numbers_scene", None
-                    
-                    # Check if player has all required items
-                    if all(item in inventory for item in required_items):
-                        return target_scene_id, None
-                    elif alt_scene_id:
-                        return alt_scene_id, None
-                    else:
-                        missing_items = [item for item in required_items if item not in inventory]
-                        message = f"You can't do that. You need these items: {', '.join(missing_items)}"
-                        return None, message
-                
-                # Handle advanced branching: [text, {item1: scene1, item2: scene2, ..., "default": default_scene}]
-                elif len(connection_data) >= 2 and isinstance(connection_data[1], dict):
-                    paths = connection_data[1]
-                    
-                    # First check for specific items in inventory that have defined paths
-                    for item, scene_id in paths.items():
-                        if item in inventory and item != "default":
-                            return scene_id, None
-                    
-                    # If no matching item, use the default path if provided
-                    if "default" in paths:
-                        return paths["default"], None
-                    else:
-                        return None, "You don't have the right item for this action."
-            else:
-                # Choice is a number but not in connections
-                # Check if there's a default for any button press
-                if "default" in self.hidden_connections:
-                    return self.hidden_connections["default"], None
-                    
-        except ValueError:
-            # Not a single digit - could be a multi-digit code that wasn't in hidden_connections
-            # Check if there's a "wrong_code" connection for invalid codes
-            if "wrong_code" in self.hidden_connections:
-                return self.hidden_connections["wrong_code"], None
-            pass  # Ignore non-integer choices
-            
-        return None, "Invalid choice. Try again."
+        return self.transitions.resolve(choice, inventory_mask(inventory))
+
 
+def load_scenes(max_scenes=DEFAULT_MAX_SCENES):
+    """Indexes the scenes in the compiled story pack, or in the YAML files in 'story' if the pack is stale.
 
-def load_scenes():
-    """Loads scenes from YAML files in the 'story' directory and its subdirectories."""
-    scenes = {}
+    Scenes are only parsed when first requested; see SceneStore.
+    """
+    scenes = SceneStore(Scene, max_scenes=max_scenes)
     
     # Debug: Check if the story directory exists
     if not os.path.exists("story"):
-        print("ERROR: 'story' directory not found!")
+        log.error("'story' directory not found!")
         story_dir = "story"
         os.makedirs(story_dir, exist_ok=True)
-        print(f"Created directory: {story_dir}")
+        log.info("Created directory: %s", story_dir)
         return scenes
     
-    # Debug: List all files in story directory
-    print(f"Files in story directory: {os.listdir('story')}")
-    
-    # Function to process a YAML file
-    def process_yaml_file(filepath):
+    # Use the compiled pack when it is newer than every story file
+    if story_pack.pack_is_fresh():
         try:
-            with open(filepath, "r") as file:
-                data = yaml.safe_load(file)
-                
-                # Process connections: transform from dictionary to more structured format
-                formatted_connections = {}
-                
-                # Handle different connection formats
-                if isinstance(data["connections"], dict):
-                    for key, value in data["connections"].items():
-                        key_int = int(key)
-                        
-                        # If the value is a string, it's just a scene ID
-                        if isinstance(value, str):
-                            formatted_connections[key_int] = [f"Go to {value}", value, []]
-                        
-                        # If it's a list, it might be standard format or contain a dict for branching
-                        elif isinstance(value, list):
-                            if len(value) >= 2 and isinstance(value[1], dict):
-                                # This is the advanced branching format
-                                formatted_connections[key_int] = value
-                            else:
-                                # This is the standard format
-                                option_text = value[0]
-                                target_scene = value[1]
-                                required_items = value[2] if len(value) > 2 else []
-                                alt_scene = value[3] if len(value) > 3 else None
-                                formatted_connections[key_int] = [option_text, target_scene, required_items, alt_scene]
-                        
-                        # If it's a dict directly, it's the branching format
-                        elif isinstance(value, dict) and "text" in value and "paths" in value:
-                            formatted_connections[key_int] = [value["text"], value["paths"]]
-                            
-                elif isinstance(data["connections"], list):
-                    # Simple list format [scene1, scene2, ...]
-                    for i, scene_id in enumerate(data["connections"], 1):
-                        formatted_connections[i] = [f"Go to {scene_id}", scene_id, []]
-                
-                scenes[data["id"]] = Scene(
-                    id=data["id"],
-                    text=data["text"],
-                    connections=formatted_connections,
-                    hidden_connections=data.get("hidden_connections", {}),
-                    items_granted=data.get("items_granted", []),
-                    items_required=data.get("items_required", []),
-                    timeout_after_audio=data.get("timeout_after_audio", False),
-                    timeout_seconds=data.get("timeout_seconds", 3)
-                )
-                print(f"Loaded scene: {data['id']} from {filepath}")
+            pack = story_pack.StoryPack()
+            for scene_id in pack.scene_ids():
+                scenes.add_source(scene_id, functools.partial(pack.read_scene, scene_id))
+            log.info("Indexed %d scenes from %s", len(pack.index), story_pack.PACK_PATH)
         except Exception as e:
-            print(f"Error loading {filepath}: {e}")
+            log.error("Error loading %s, falling back to YAML: %s", story_pack.PACK_PATH, e)
     
-    # Recursively walk through directories
-    for root, dirs, files in os.walk("story"):
-        for file in files:
-            if file.endswith(".yaml"):
-                filepath = os.path.join(root, file)
-                process_yaml_file(filepath)
+    if not len(scenes):
+        # Debug: List all files in story directory
+        log.debug("Files in story directory: %s", os.listdir('story'))
+        
+        # Index files that can name their scenes cheaply, parse the rest in one concurrent pass
+        unindexed = []
+        for filepath in story_loader.iter_scene_files("story"):
+            try:
+                scene_ids = story_loader.scan_file(filepath)
+            except Exception as e:
+                log.error("Error loading %s: %s", filepath, e)
+                continue
+            if scene_ids is None:
+                unindexed.append(filepath)
+                continue
+            for scene_id in scene_ids:
+                scenes.add_source(scene_id, functools.partial(story_loader.read_scene, filepath, scene_id))
+                log.debug("Indexed scene: %s from %s", scene_id, filepath)
+        
+        parsed, sources = story_loader.load_files(unindexed)
+        for scene_id, data in parsed.items():
+            scenes.add_source(scene_id, functools.partial(dict, data))
+            log.debug("Loaded scene: %s from %s", scene_id, sources[scene_id])
     
     # Add custom scene for when player has no phone numbers
     scenes["no_numbers_scene"] = Scene(
@@ -237,46 +152,102 @@ def load_scenes():
     return scenes
 
 
-def handle_timed_input(scene, scene_audio):
-    """Handle timed input for a scene"""
+def check_story(strict=STORY_STRICT, scenes=None, changed=()):
+    """Validate the story graph. Raises story_graph.StoryError if a call could hit a missing scene.
+
+    At startup the checked graph is read from the compiled index (compiled now if it is stale).
+    After a hot reload, pass the SceneStore and the reloaded scene ids to recheck the graph
+    around just those scenes.
+    """
+    global _story_graph
+    with _story_graph_lock:
+        if _story_graph is None or scenes is None:
+            _story_graph = story_graph.load_story_graph(strict=strict)
+            return _story_graph
+        for scene_id in changed:
+            scene = scenes.get(scene_id)
+            data = None if scene is None else {"connections": scene.connections, "hidden_connections": scene.hidden_connections}
+            _story_graph.update(scene_id, data)
+        _story_graph.relink()
+        errors, warnings = _story_graph.check(strict=strict)
+        return story_graph.report(_story_graph, errors, warnings)
+
+
+def recheck_story(scenes, changed):
+    """StoryWatcher hook: recheck the graph around the reloaded scenes, logging any errors."""
+    try:
+        check_story(scenes=scenes, changed=changed)
+    except story_graph.StoryError as e:
+        log.error("Reloaded story has errors: %s", e)
+
+
+def handle_timed_input(scene, scene_audio, keys=None):
+    """Handle timed input for a scene (keys: the session's Keypad, default the wired one)"""
+    keys = keys if keys is not None else keypad.default_keypad
     timeout_seconds = scene.timeout_seconds  # Use scene's configured timeout
     
-    print(f"DEBUG: handle_timed_input called with timeout_seconds={timeout_seconds}")
-    print(f"DEBUG: timeout_after_audio={scene.timeout_after_audio}")
+    log.debug("handle_timed_input called with timeout_seconds=%s", timeout_seconds)
+    log.debug("timeout_after_audio=%s", scene.timeout_after_audio)
     
     if scene.timeout_after_audio:
-        print("DEBUG: Waiting for audio to finish...")
+        log.debug("Waiting for audio to finish...")
         # Wait for audio to finish
         while scene_audio.is_playing():
             time.sleep(0.1)
-        print("DEBUG: Audio finished")
+        log.debug("Audio finished")
     
-    print(f"DEBUG: Starting {timeout_seconds}s timeout, waiting for keypress...")
+    log.debug("Starting %ss timeout, waiting for keypress...", timeout_seconds)
     start_time = time.time()
     while time.time() - start_time < timeout_seconds:
         remaining = timeout_seconds - (time.time() - start_time)
         # Check for keypress with 0.1s timeout so we can exit the loop on timeout
         try:
-            choice = keypad.wait_for_single_keypress(timeout=0.1)
+            choice = keys.wait_for_single_keypress(timeout=0.1)
             if choice:
                 # If we get a keypress during timeout, ignore it and just timeout
-                print(f"DEBUG: Ignoring keypress during timeout: {choice}")
+                log.debug("Ignoring keypress during timeout: %s", choice)
                 continue
         except Exception as e:
-            print(f"DEBUG: Error during keypress check: {e}")
+            log.error("Error during keypress check: %s", e)
             continue
     
-    print(f"DEBUG: Timeout reached after {timeout_seconds}s, returning 'timeout'")
+    log.debug("Timeout reached after %ss, returning 'timeout'", timeout_seconds)
     return "timeout"
 
 
-def main():
+def setup_game(scene_audio=None):
+    """Load the story and initialize audio. Returns (scenes, scene_audio, story_watcher)."""
     scenes = load_scenes()
-    print(f"DEBUG: Loaded scenes = {scenes.keys()}")
+    log.debug("Loaded scenes = %s", scenes.keys())
+    
+    # Fail before the phone goes live rather than mid-call
+    check_story()
+    
+    # Pick up edits to story files between calls without restarting
+    story_watcher = None
+    if STORY_HOT_RELOAD and os.path.exists("story"):
+        story_watcher = StoryWatcher(
+            scenes, Scene, "story", is_idle=all_idle, on_applied=functools.partial(recheck_story, scenes)
+        )
+        story_watcher.start()
     
     # Initialize scene audio
-    scene_audio = SceneAudio()
+    if scene_audio is None:
+        scene_audio = SceneAudio()
     
+    # Decode the key sounds now that the mixer is in its final configuration
+    keypad.load_keypad_sounds()
+
+    # Export latency histograms and counters for watching the installation under load
+    cache = scene_audio.sound_cache
+    metrics.gauge("payphone_sound_cache_hits", "Scene sound cache hits", lambda: cache.stats()["hits"])
+    metrics.gauge("payphone_sound_cache_misses", "Scene sound cache misses", lambda: cache.stats()["misses"])
+    metrics.gauge("payphone_sound_cache_bytes", "Decoded scene audio held in memory", lambda: cache.stats()["bytes"])
+    if METRICS_EXPORT:
+        metrics.start_exporter()
+    if CALL_JOURNAL:
+        journal.start_journal()
+
     print("\nGame Controls:")
     print("- Use number keys to select options")
     print("- Press 'h' at any time to hang up the phone")
@@ -294,124 +265,146 @@ def main():
         os.makedirs("scene_audio", exist_ok=True)
         print("Created 'scene_audio' directory. Please add mp3 files for each scene (format: scene_id.mp3)")
     
-    while True:
-        # Wait for the phone to be lifted to start/restart the game
-        keypad.wait_for_hook_change(expected_state=True)
-        payphone.start_adventure()
+    return scenes, scene_audio, story_watcher
+
+
+def play_call(session, scenes, lifted_at=None):
+    """Run one call on session from the intro until the handset goes down or 'h' is pressed.
+
+    lifted_at is the time.perf_counter() of the pickup, for the pickup latency metric.
+    """
+    keys = session.keypad
+    scene_audio = session.scene_audio
+    inventory = session.inventory  # Player inventory
+    replaying = False  # The scene is played again after '#', not revisited
+    
+    # Game loop
+    while keys.is_phone_lifted():
+        scene = scenes.get(session.current_scene)
+        if not scene:
+            log.error("Scene '%s' not found! Resetting to intro.", session.current_scene)
+            session.current_scene = "hub"
+            continue
+
+        # Check if we can enter the scene based on required items
+        if not all(item in inventory for item in scene.items_required):
+            missing_items = [item for item in scene.items_required if item not in inventory]
+            print(f"You can't go there yet. You need: {', '.join(missing_items)}")
+            session.chosen_at = None  # The pause is not transition latency
+            time.sleep(2)  # Give player time to read the message
+            
+            # Go back to the previous scene if possible, or intro if not
+            session.current_scene = session.previous_scene if session.previous_scene else "hub"
+            continue
         
-        # Initialize game state
-        current_scene = "intro"  # Start scene
-        inventory = set()  # Player inventory
-        previous_scene = None  # Track previous scene for invalid choices
+        # Play scene audio and wait if needed
+        scene_audio.play_scene_audio(session.current_scene)
+        session.record("replay" if replaying else "scene", scene=session.current_scene)
+        replaying = False
+        if lifted_at is not None:
+            metrics.PICKUP_TO_INTRO.observe(metrics.elapsed_since(lifted_at))
+            lifted_at = None
+        elif session.chosen_at is not None:
+            metrics.TRANSITION_TO_AUDIO.observe(metrics.elapsed_since(session.chosen_at))
+        session.chosen_at = None
         
-        # Game loop
-        while keypad.is_phone_lifted():
-            scene = scenes.get(current_scene)
-            if not scene:
-                print(f"Error: Scene '{current_scene}' not found! Resetting to intro.")
-                current_scene = "hub"
-                continue
+        # Decode the likely next scenes while this one plays
+        scene_audio.prefetch_scenes(scene.successors())
+        
+        # Display the scene with options
+        scene.display(inventory)
+        
+        # Check star codes against this scene's codes as they are typed
+        keys.set_code_trie(scene.code_trie)
+        
+        # Check if timeout should be used
+        should_use_timeout = scene.uses_timeout(inventory)
 
-            # Check if we can enter the scene based on required items
-            if not all(item in inventory for item in scene.items_required):
-                missing_items = [item for item in scene.items_required if item not in inventory]
-                print(f"You can't go there yet. You need: {', '.join(missing_items)}")
-                time.sleep(2)  # Give player time to read the message
-                
-                # Go back to the previous scene if possible, or intro if not
-                current_scene = previous_scene if previous_scene else "hub"
-                continue
-            
-            # Play scene audio and wait if needed
-            scene_audio.play_scene_audio(current_scene)
-            
-            # Display the scene with options
-            scene.display(inventory)
-            
-            # Check if timeout should be used
-            should_use_timeout = False
-            if "timeout" in scene.hidden_connections:
-                timeout_connection = scene.hidden_connections["timeout"]
-                if isinstance(timeout_connection, dict):
-                    print(f"DEBUG: Checking timeout conditions with items: {list(inventory)}")
-                    # For non-empty inventory, check if any items match
-                    if inventory:
-                        for item_list_str, target_scene in timeout_connection.items():
-                            if item_list_str == "default":
-                                continue
-                            required_items = [item.strip() for item in item_list_str.split(',')]
-                            print(f"DEBUG: Checking timeout requirements: {required_items}")
-                            if all(item in inventory for item in required_items):
-                                should_use_timeout = True
-                                print("DEBUG: Timeout conditions met with items")
-                                break
-                    # If no item matches found, but there's a default, enable timeout
-                    if not should_use_timeout and "default" in timeout_connection:
-                        should_use_timeout = True
-                        print("DEBUG: Using default timeout path")
-                else:
-                    # Simple timeout connection (string)
-                    should_use_timeout = True
-                    print("DEBUG: Using simple timeout")
-
-            # Get player input with timeout if appropriate
-            if should_use_timeout:
-                choice = handle_timed_input(scene, scene_audio)
-            else:
-                choice = keypad.wait_for_keypress()
-            
-            # If the hook state changed (phone hung up), break the game loop
-            if not keypad.is_phone_lifted() or choice is None:
-                print("Phone hung up. Game reset.")
-                scene_audio.stop_audio()  # Stop any playing audio
-                break
-            
-            # Check for hang-up command
-            if choice == 'h' or choice == 'H':
-                print("Phone hung up. Resetting game...")
-                scene_audio.stop_audio()  # Stop any playing audio
-                break
-                
-            # Handle special command for replaying scene audio
-            if choice == "#":
-                print("\nReplaying scene audio...")
-                scene_audio.stop_audio()  # Stop any currently playing audio
-                scene_audio.play_scene_audio(current_scene)  # Replay the scene audio
-                continue  # Return to scene options
+        # Get player input with timeout if appropriate
+        if should_use_timeout:
+            choice = handle_timed_input(scene, scene_audio, keys)
+        else:
+            choice = keys.wait_for_keypress()
+        
+        # If the hook state changed (phone hung up), end the call
+        if not keys.is_phone_lifted() or choice is None:
+            log.info("Phone hung up. Game reset.")
+            return
+        
+        # Check for hang-up command
+        if choice == 'h' or choice == 'H':
+            log.info("Phone hung up. Resetting game...")
+            return
             
-            # Stop audio when entering code mode
-            if choice == "*":
-                scene_audio.stop_audio()  # Stop any currently playing audio
-
-            # Store previous scene for backtracking
-            previous_scene = current_scene
-
-            # Grant any items from the current scene BEFORE checking next scene
-            for item in scene.items_granted:
-                if item not in inventory:
-                    inventory.add(item)
-                    print(f"You obtained: {item}!")
-
-            # Get next scene based on user choice (now with updated inventory)
-            next_scene, message = scene.get_next_scene(choice, inventory)
-
-            if next_scene:
-                # If scene changes, play the new scene audio
-                if next_scene != current_scene:
-                    scene_audio.stop_audio()  # Stop current audio before changing scenes
-                current_scene = next_scene
-            elif message:
-                print(message)
-                time.sleep(1.5)  # Give player time to read
-            else:
-                print("Invalid choice. Try again.")
-                time.sleep(1)
+        # Handle special command for replaying scene audio
+        if choice == "#":
+            print("\nReplaying scene audio...")
+            scene_audio.stop_audio()  # Stop any currently playing audio
+            scene_audio.play_scene_audio(session.current_scene)  # Replay the scene audio
+            replaying = True
+            continue  # Return to scene options
+        
+        # Stop audio when entering code mode
+        if choice == "*":
+            scene_audio.stop_audio()  # Stop any currently playing audio
+
+        # Store previous scene for backtracking
+        session.previous_scene = session.current_scene
+
+        # Grant any items from the current scene BEFORE checking next scene
+        granted = scene.grant_items(inventory)
+        if granted:
+            session.record("items", items=granted)
+
+        # Get next scene based on user choice (now with updated inventory)
+        session.chosen_at = time.perf_counter()
+        next_scene, message = scene.get_next_scene(choice, inventory)
+
+        if next_scene:
+            # If scene changes, play the new scene audio
+            if next_scene != session.current_scene:
+                scene_audio.stop_audio()  # Stop current audio before changing scenes
+            session.current_scene = next_scene
+            metrics.TRANSITIONS.inc()
+        elif message:
+            print(message)
+            session.chosen_at = None
+            time.sleep(1.5)  # Give player time to read
+        else:
+            print("Invalid choice. Try again.")
+            session.chosen_at = None
+            time.sleep(1)
+
+
+def serve(session, scenes, story_watcher=None):
+    """Answer calls on session forever."""
+    while True:
+        # Wait for the phone to be lifted to start/restart the game
+        session.keypad.wait_for_hook_change(expected_state=True)
+        lifted_at = time.perf_counter()
+        metrics.CALLS.inc()
+        session.begin_call()
+        
+        play_call(session, scenes, lifted_at)
         
         # Stop audio when game resets
-        scene_audio.stop_audio()
-        payphone.stop_adventure()
-        print("Game reset. Waiting for phone to be lifted...")
+        session.end_call()
+        # Swap in any story edits made during the call, once no other session is mid-call
+        # (the watcher rechecks the story graph around whatever it swaps in)
+        if story_watcher and all_idle():
+            story_watcher.apply_pending()
+        log.info("Game reset. Waiting for phone to be lifted...")
+
+
+def main(scene_audio=None):
+    scenes, scene_audio, story_watcher = setup_game(scene_audio)
+    serve(default_session(scene_audio, payphone), scenes, story_watcher)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    phone_log.install_dump_signal()  # kill -USR1 <pid> prints the recent log events
+    try:
+        main()
+    except BaseException:
+        phone_log.dump()  # Keep the lead-up to a crash or Ctrl-C
+        raise
@@ -1,5 +1,5 @@
 import os
-import yaml
+from story_loader import split_front_matter
 
 class Scene:
     def __init__(self, scene_id, title, content, connections, conditions=None):
@@ -12,11 +12,7 @@ class Scene:
 def load_scene_from_file(filepath):
     with open(filepath, 'r', encoding='utf-8') as f:
         # Assume YAML front matter is separated by '---'
-        parts = f.read().split('---')
-        if len(parts) < 3:
-            raise ValueError("File format error, expected YAML front matter.")
-        metadata = yaml.safe_load(parts[1])
-        content = parts[2].strip()
+        metadata, content = split_front_matter(f.read())
         return Scene(
             scene_id=metadata.get("id"),
             title=metadata.get("title", ""),
@@ -36,4 +32,5 @@ def load_all_scenes(root_dir):
     return scenes
 
 # Load your scenes
-scenes = load_all_scenes('scenes')
+if __name__ == "__main__":
+    scenes = load_all_scenes('scenes')
@@ -1,18 +1,16 @@
-from itertools import permutations
+from code_trie import UNORDERED_SEPARATOR
 
 def generate_code_yaml():
     codes = ['451', '7464', '9453', '3255']  # Your four codes
-    all_perms = list(permutations(codes))
-    
-    # Create the hidden_connections dictionary
+
+    # Create the hidden_connections dictionary. One unordered rule accepts
+    # the codes typed in any order, instead of one entry per permutation.
     connections = {}
-    for perm in all_perms:
-        code = ''.join(perm)  # Combine codes into one string
-        connections[code] = "secret_ending"
-    
+    connections[UNORDERED_SEPARATOR.join(codes)] = "secret_ending"
+
     # Add default connection
     connections["default"] = "hub"
-    
+
     return connections
 
 # Generate and print the YAML structure
@@ -20,4 +18,4 @@ if __name__ == "__main__":
     connections = generate_code_yaml()
     print("hidden_connections:")
     for code, scene in connections.items():
-        print(f'  "{code}": "{scene}"')
\ No newline at end of file
+        print(f'  "{code}": "{scene}"')
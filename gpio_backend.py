@@ -0,0 +1,206 @@
+"""GPIO backends for the keypad, hook switch and light.
+
+Everything that touches pins goes through an object with the subset of the
+RPi.GPIO API the payphone uses (see GPIOBackend). On a Pi that is the real
+RPi.GPIO module behind RPiGPIOBackend. SimulatedGPIO models the 4x3 matrix
+keypad and the hook switch electrically, so scripts and benchmarks can press
+keys and lift the handset on an ordinary Linux box:
+
+    PAYPHONE_GPIO=sim python bench_latency.py
+
+PAYPHONE_GPIO selects the backend: "rpi", "sim", "none" (keyboard input on
+a PC) or "auto" (the default: RPi.GPIO if it imports, otherwise "none").
+"""
+import os
+import threading
+
+
+class GPIOBackend:
+    """The part of the RPi.GPIO API used by the payphone."""
+
+    BCM = 11
+    OUT = 0
+    IN = 1
+    LOW = 0
+    HIGH = 1
+    PUD_OFF = 20
+    PUD_DOWN = 21
+    PUD_UP = 22
+    RISING = 31
+    FALLING = 32
+    BOTH = 33
+
+    def setmode(self, mode):
+        raise NotImplementedError
+
+    def setup(self, pin, direction, pull_up_down=None):
+        raise NotImplementedError
+
+    def output(self, pin, value):
+        raise NotImplementedError
+
+    def input(self, pin):
+        raise NotImplementedError
+
+    def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+        raise NotImplementedError
+
+    def remove_event_detect(self, pin):
+        raise NotImplementedError
+
+    def cleanup(self):
+        raise NotImplementedError
+
+
+class RPiGPIOBackend(GPIOBackend):
+    """Real hardware through the RPi.GPIO module."""
+
+    def __init__(self):
+        import RPi.GPIO as GPIO
+        self._gpio = GPIO
+        for name in ("BCM", "OUT", "IN", "LOW", "HIGH", "PUD_OFF", "PUD_DOWN", "PUD_UP", "RISING", "FALLING", "BOTH"):
+            setattr(self, name, getattr(GPIO, name))
+
+    def setmode(self, mode):
+        self._gpio.setmode(mode)
+
+    def setup(self, pin, direction, pull_up_down=None):
+        if pull_up_down is None:
+            self._gpio.setup(pin, direction)
+        else:
+            self._gpio.setup(pin, direction, pull_up_down=pull_up_down)
+
+    def output(self, pin, value):
+        self._gpio.output(pin, value)
+
+    def input(self, pin):
+        return self._gpio.input(pin)
+
+    def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+        kwargs = {}
+        if callback is not None:
+            kwargs["callback"] = callback
+        if bouncetime is not None:
+            kwargs["bouncetime"] = bouncetime
+        self._gpio.add_event_detect(pin, edge, **kwargs)
+
+    def remove_event_detect(self, pin):
+        self._gpio.remove_event_detect(pin)
+
+    def cleanup(self):
+        self._gpio.cleanup()
+
+
+class SimulatedGPIO(GPIOBackend):
+    """Deterministic stand-in for a matrix keypad and hook switch.
+
+    Rows are pulled-up inputs and columns are outputs, as on the real phone:
+    a row reads LOW when a pressed key sits on a column that is driven LOW.
+    The hook switch reads HIGH on the hook and LOW when lifted. Edge callbacks
+    run synchronously in the thread that calls press()/lift()/hang_up(),
+    in registration order, so scripted runs are repeatable.
+    """
+
+    def __init__(self, rows, cols, mapping, switch_pin):
+        self.rows = list(rows)
+        self.cols = list(cols)
+        self.switch_pin = switch_pin
+        self._key_position = {}
+        for row_num, row_keys in enumerate(mapping):
+            for col_num, key in enumerate(row_keys):
+                self._key_position[key] = (self.rows[row_num], self.cols[col_num])
+
+        self._outputs = {}
+        self._pressed = set()  # (row_pin, col_pin) of keys held down
+        self._hook_level = self.HIGH  # Handset starts on the hook
+        self._callbacks = {}  # pin -> (edge, callback)
+        self._lock = threading.RLock()
+
+    # RPi.GPIO API
+
+    def setmode(self, mode):
+        pass
+
+    def setup(self, pin, direction, pull_up_down=None):
+        if direction == self.OUT:
+            self._outputs.setdefault(pin, self.LOW)
+
+    def output(self, pin, value):
+        with self._lock:
+            self._outputs[pin] = value
+
+    def input(self, pin):
+        with self._lock:
+            if pin == self.switch_pin:
+                return self._hook_level
+            if pin in self._outputs:
+                return self._outputs[pin]
+            for row_pin, col_pin in self._pressed:
+                if row_pin == pin and self._outputs.get(col_pin, self.HIGH) == self.LOW:
+                    return self.LOW
+            return self.HIGH
+
+    def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+        with self._lock:
+            self._callbacks[pin] = (edge, callback)
+
+    def remove_event_detect(self, pin):
+        with self._lock:
+            self._callbacks.pop(pin, None)
+
+    def cleanup(self):
+        with self._lock:
+            self._callbacks.clear()
+            self._pressed.clear()
+
+    # Scripting API
+
+    def _set_levels(self, change):
+        """Apply change() and fire callbacks for every watched pin whose level moved."""
+        with self._lock:
+            before = {pin: self.input(pin) for pin in self._callbacks}
+            change()
+            fired = []
+            for pin, (edge, callback) in self._callbacks.items():
+                after = self.input(pin)
+                if after == before[pin] or callback is None:
+                    continue
+                if edge == self.BOTH or (edge == self.FALLING) == (after == self.LOW):
+                    fired.append((pin, callback))
+        for pin, callback in fired:
+            callback(pin)
+
+    def press(self, key):
+        self._set_levels(lambda: self._pressed.add(self._key_position[key]))
+
+    def release(self, key):
+        self._set_levels(lambda: self._pressed.discard(self._key_position[key]))
+
+    def tap(self, key):
+        self.press(key)
+        self.release(key)
+
+    def lift(self):
+        self._set_levels(lambda: setattr(self, "_hook_level", self.LOW))
+
+    def hang_up(self):
+        self._set_levels(lambda: setattr(self, "_hook_level", self.HIGH))
+
+    def is_lifted(self):
+        return self._hook_level == self.LOW
+
+
+def load_gpio_backend(rows, cols, mapping, switch_pin, backend=None):
+    """Pick a GPIO backend. Returns (backend, gpio_available)."""
+    backend = backend or os.environ.get("PAYPHONE_GPIO", "auto")
+    if backend == "sim":
+        return SimulatedGPIO(rows, cols, mapping, switch_pin), True
+    if backend in ("auto", "rpi"):
+        try:
+            return RPiGPIOBackend(), True
+        except ImportError:
+            if backend == "rpi":
+                raise
+    # If running on a PC without GPIO
+    from unittest.mock import MagicMock
+    return MagicMock(), False
@@ -0,0 +1,163 @@
+"""Append-only journal of every call, for offline analysis (see journal_report.py).
+
+Instrumented code records events into the module-level journal:
+
+    journal.begin_call()                  pickup; starts a new call id
+    journal.record("scene", scene=id)     scene entered
+    journal.record("replay", scene=id)    scene played again with '#'
+    journal.record("key", key="5")        key accepted by the keypad
+    journal.record("items", items=[...])  items granted
+    journal.end_call()                    hang-up
+
+Sessions (session.py) pass their call's id as record(..., call=id) and
+end_call(id), so several calls can be journaled at once. Each event
+becomes one JSON line {"t": time.monotonic(), "e": kind, "call": id,
+...}; the pickup also carries the wall clock ("wall"), so a
+call's events can be placed in time. Monotonic times are only compared
+within one call, which never spans a reboot.
+
+record() only appends to an in-memory deque and returns: a writer thread
+drains it every FLUSH_INTERVAL seconds (and right after a hang-up) with a
+single write per batch, so the game loop never waits on the SD card. If
+the writer falls MAX_PENDING events behind, the oldest are dropped and
+counted rather than blocking. Files are journal/YYYY-MM-DD.jsonl by local
+date; old ones may be gzipped, the report reads both.
+
+    PAYPHONE_JOURNAL_DIR=journal   (default; "" disables the journal)
+"""
+import atexit
+import collections
+import datetime
+import json
+import os
+import threading
+import time
+import uuid
+
+JOURNAL_DIR = os.environ.get("PAYPHONE_JOURNAL_DIR", "journal")
+FLUSH_INTERVAL = 2.0  # Seconds between batched writes
+MAX_PENDING = 10000  # Events held in memory before the oldest are dropped
+
+
+def journal_path(directory, moment=None):
+    """The journal file for the local date of moment (a time.time() value, default now)."""
+    date = datetime.date.fromtimestamp(moment if moment is not None else time.time())
+    return os.path.join(directory, f"{date.isoformat()}.jsonl")
+
+
+class Journal:
+    def __init__(self, directory=JOURNAL_DIR, flush_interval=FLUSH_INTERVAL, max_pending=MAX_PENDING):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.call_id = None
+        self.dropped = 0
+        self.written = 0
+        self._pending = collections.deque(maxlen=max_pending)
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._write_lock = threading.Lock()
+        self._thread = None
+        self._file = None
+        self._file_path = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def record(self, kind, call=None, **fields):
+        """Queue an event for call (default the current call). Never blocks; a no-op until start()."""
+        if self._thread is None:
+            return
+        fields["t"] = time.monotonic()
+        fields["e"] = kind
+        fields["call"] = call if call is not None else self.call_id
+        if len(self._pending) == self._pending.maxlen:
+            self.dropped += 1  # The append below pushes out the oldest event
+        self._pending.append(fields)
+
+    def begin_call(self):
+        """Start a new call id (the current call's) and record the pickup. Returns the id."""
+        self.call_id = uuid.uuid4().hex[:12]
+        self.record("pickup", wall=round(time.time(), 3))
+        return self.call_id
+
+    def end_call(self, call=None):
+        """Record the hang-up of call (default the current call) and have the writer flush it now."""
+        self.record("hangup", call=call)
+        if call is None or call == self.call_id:
+            self.call_id = None
+        self._wake.set()
+
+    def start(self):
+        if self._thread is None and self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            self._thread = threading.Thread(target=self._write_loop, daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+            print(f"Journaling calls to {self.directory}/")
+        return self
+
+    def stop(self):
+        """Write out what is pending and stop the writer."""
+        self._stopped.set()
+        self._wake.set()
+        self.flush()
+        with self._write_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                self._file_path = None
+
+    def _write_loop(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Write every pending event in one batch."""
+        with self._write_lock:
+            lines = []
+            while self._pending:
+                try:
+                    lines.append(json.dumps(self._pending.popleft(), separators=(",", ":")))
+                except IndexError:
+                    break
+            if not lines:
+                return
+            try:
+                path = journal_path(self.directory)
+                if path != self._file_path:
+                    if self._file is not None:
+                        self._file.close()
+                    self._file = open(path, "a")
+                    self._file_path = path
+                self._file.write("\n".join(lines) + "\n")
+                self._file.flush()
+                self.written += len(lines)
+            except OSError as e:
+                print(f"Error writing journal: {e}")
+                self._file = None
+                self._file_path = None
+
+
+JOURNAL = Journal()
+
+
+def record(kind, call=None, **fields):
+    JOURNAL.record(kind, call, **fields)
+
+
+def begin_call():
+    return JOURNAL.begin_call()
+
+
+def end_call(call=None):
+    JOURNAL.end_call(call)
+
+
+def start_journal(directory=JOURNAL_DIR):
+    if directory:
+        JOURNAL.directory = directory
+        JOURNAL.start()
+    return JOURNAL
@@ -0,0 +1,231 @@
+"""Aggregate call journals (see journal.py) into a play report.
+
+    python journal_report.py [journal ...] [--top 25] [--json]
+
+reads every *.jsonl and *.jsonl.gz under the given directories or files
+(default journal/), in name order, one line at a time: only the calls
+still in progress are held in memory, so months of journals take one
+streaming pass. It reports:
+
+    visits     scene entries (an invalid choice that stays in the scene
+               counts once, '#' replays are journaled as "replay" and
+               not counted), with a per-hour-of-day heat row
+    drop-offs  the scene each call was hung up in, and the share of that
+               scene's visits that ended there
+    books      callers and time spent in each book (story_graph.StoryGraph
+               books: a scene's time counts towards every book it
+               belongs to)
+    endings    calls reaching each scene under story/ending/
+"""
+import collections
+import datetime
+import gzip
+import json
+import os
+
+from journal import JOURNAL_DIR
+
+STORY_DIR = "story"
+ENDING_DIR = "ending"  # Scenes from story files under story/ending/ are the endings
+HEAT_LEVELS = " .:-=+*#%@"
+
+
+def iter_journal_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.endswith((".jsonl", ".jsonl.gz")):
+                    yield os.path.join(path, name)
+        elif os.path.exists(path):
+            yield path
+
+
+def iter_events(paths):
+    """Yield every event in the journals, skipping lines that do not parse (e.g. a torn last line)."""
+    for path in iter_journal_files(paths):
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def load_story_info(story_dir=STORY_DIR):
+    """Return ({book: scene set}, [ending scene ids]) from the story tree, or ({}, []) without one."""
+    try:
+        from story_loader import load_story_tree
+        from story_graph import StoryGraph
+        scenes, sources = load_story_tree(story_dir)
+        books = StoryGraph(scenes).books
+    except Exception as e:
+        print(f"Could not load the story from {story_dir} ({e}); books and endings are left out")
+        return {}, []
+    endings = sorted(
+        scene_id for scene_id, path in sources.items()
+        if ENDING_DIR in os.path.relpath(path, story_dir).split(os.sep)[:-1]
+    )
+    return books, endings
+
+
+class CallState:
+    __slots__ = ("wall", "picked_up", "scene", "entered", "reached")
+
+    def __init__(self, wall, picked_up):
+        self.wall = wall  # time.time() and time.monotonic() of the pickup
+        self.picked_up = picked_up
+        self.scene = None
+        self.entered = None
+        self.reached = set()
+
+
+class Report:
+    def __init__(self, books=None, endings=()):
+        self.books = books or {}
+        self.endings = list(endings)
+        self.book_of = collections.defaultdict(list)
+        for book, members in self.books.items():
+            for scene_id in members:
+                self.book_of[scene_id].append(book)
+
+        self.calls = 0
+        self.unfinished = 0
+        self.visits = collections.Counter()
+        self.heat = collections.defaultdict(lambda: [0] * 24)
+        self.dropoffs = collections.Counter()
+        self.scene_time = collections.Counter()
+        self.book_time = collections.Counter()
+        self.book_calls = collections.Counter()
+        self.ending_calls = collections.Counter()
+        self.keys = collections.Counter()
+        self.items = collections.Counter()
+        self._open = {}
+
+    def _leave_scene(self, call, t):
+        if call.scene is not None:
+            spent = max(0.0, t - call.entered)
+            self.scene_time[call.scene] += spent
+            for book in self.book_of.get(call.scene, ()):
+                self.book_time[book] += spent
+
+    def _finish(self, call, t):
+        self._leave_scene(call, t)
+        if call.scene is not None:
+            self.dropoffs[call.scene] += 1
+        for book in self.books:
+            if call.reached & self.books[book]:
+                self.book_calls[book] += 1
+        for ending in self.endings:
+            if ending in call.reached:
+                self.ending_calls[ending] += 1
+
+    def add(self, event):
+        kind = event.get("e")
+        call_id = event.get("call")
+        t = event.get("t", 0.0)
+        if kind == "pickup":
+            if call_id in self._open:
+                self.unfinished += 1
+            self._open[call_id] = CallState(event.get("wall"), t)
+            self.calls += 1
+            return
+        call = self._open.get(call_id)
+        if call is None:
+            return  # Its pickup is in a journal that was not read
+        if kind == "scene":
+            scene_id = event.get("scene")
+            if scene_id == call.scene:
+                return  # Replayed, not revisited
+            self._leave_scene(call, t)
+            call.scene = scene_id
+            call.entered = t
+            call.reached.add(scene_id)
+            self.visits[scene_id] += 1
+            if call.wall is not None:
+                hour = datetime.datetime.fromtimestamp(call.wall + t - call.picked_up).hour
+                self.heat[scene_id][hour] += 1
+        elif kind == "key":
+            self.keys[event.get("key")] += 1
+        elif kind == "items":
+            self.items.update(event.get("items", ()))
+        elif kind == "hangup":
+            self._finish(call, t)
+            del self._open[call_id]
+
+    def close(self):
+        """Count calls whose hang-up never made it into the journals."""
+        self.unfinished += len(self._open)
+        self._open.clear()
+
+    def to_dict(self):
+        return {
+            "calls": self.calls,
+            "unfinished": self.unfinished,
+            "visits": dict(self.visits),
+            "heat": {scene_id: hours for scene_id, hours in self.heat.items()},
+            "dropoffs": dict(self.dropoffs),
+            "scene_seconds": {scene_id: round(s, 1) for scene_id, s in self.scene_time.items()},
+            "books": {
+                book: {"calls": self.book_calls[book], "seconds": round(self.book_time[book], 1)}
+                for book in self.books
+            },
+            "endings": {ending: self.ending_calls[ending] for ending in self.endings},
+            "keys": dict(self.keys),
+            "items": dict(self.items),
+        }
+
+    def print(self, top=25):
+        print(f"Calls: {self.calls} ({self.unfinished} without a hang-up)")
+
+        print(f"\nMost visited scenes (hour of day 0-23 as {HEAT_LEVELS[1]} to {HEAT_LEVELS[-1]}):")
+        for scene_id, visits in self.visits.most_common(top):
+            hours = self.heat[scene_id]
+            peak = max(hours) or 1
+            row = "".join(HEAT_LEVELS[-(-h * (len(HEAT_LEVELS) - 1) // peak)] for h in hours)
+            print(f"  {scene_id:<28} {visits:>7}  |{row}|")
+
+        print("\nDrop-off points (calls hung up in the scene, share of its visits):")
+        for scene_id, drops in self.dropoffs.most_common(top):
+            share = drops / self.visits[scene_id] if self.visits[scene_id] else 0
+            print(f"  {scene_id:<28} {drops:>7}  {share:6.1%}")
+
+        if self.books:
+            print("\nBooks (calls entering, total time, time per entering call):")
+            for book in sorted(self.books, key=lambda b: -self.book_time[b]):
+                calls = self.book_calls[book]
+                seconds = self.book_time[book]
+                per_call = seconds / calls if calls else 0
+                print(f"  {book:<28} {calls:>7}  {seconds / 3600:8.1f} h  {per_call:6.0f} s")
+
+        if self.endings:
+            print("\nEndings reached (calls, share of all calls):")
+            for ending in sorted(self.endings, key=lambda e: -self.ending_calls[e]):
+                count = self.ending_calls[ending]
+                share = count / self.calls if self.calls else 0
+                print(f"  {ending:<28} {count:>7}  {share:6.1%}")
+
+
+def build_report(paths, story_dir=STORY_DIR):
+    books, endings = load_story_info(story_dir)
+    report = Report(books, endings)
+    for event in iter_events(paths):
+        report.add(event)
+    report.close()
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Report on call journals")
+    parser.add_argument("paths", nargs="*", default=[JOURNAL_DIR], help="journal directories or files")
+    parser.add_argument("--story-dir", default=STORY_DIR)
+    parser.add_argument("--top", type=int, default=25, help="rows per table")
+    parser.add_argument("--json", action="store_true", help="print the aggregates as JSON")
+    args = parser.parse_args()
+    report = build_report(args.paths, args.story_dir)
+    if args.json:
+        print(json.dumps(report.to_dict(), indent=1, sort_keys=True))
+    else:
+        report.print(args.top)
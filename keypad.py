@@ -1,28 +1,38 @@
 import sys
 import time
 import threading
-import pygame  # For playing MP3 sounds
 import atexit
 from threading import Lock
 from threading import Event
 import os
 
-try:
-    import RPi.GPIO as GPIO
-    GPIO_AVAILABLE = True
-except ImportError:
-    GPIO_AVAILABLE = False  # If running on a PC without GPIO
-    from unittest.mock import MagicMock
-    GPIO = MagicMock()
+from gpio_backend import load_gpio_backend
+from code_trie import CodeMatcher, WRONG_CODE
+from audio_service import get_audio_service
+import phone_log
+import metrics
+import journal
+
+log = phone_log.get_logger("keypad")
+
+# Define GPIO pins
+COLS = [3, 10, 8]
+ROWS = [2, 11, 9, 7]
+SWITCH_PIN = 23  # Hook switch
+
+KEYPAD_MAPPING = [
+    ["1", "2", "3"],
+    ["4", "5", "6"],
+    ["7", "8", "9"],
+    ["*", "0", "#"]
+]
+
+# Real RPi.GPIO, the simulated keypad (PAYPHONE_GPIO=sim) or a mock if running on a PC without GPIO
+GPIO, GPIO_AVAILABLE = load_gpio_backend(ROWS, COLS, KEYPAD_MAPPING, SWITCH_PIN)
 
 if GPIO_AVAILABLE:
     GPIO.setmode(GPIO.BCM)
 
-    # Define GPIO pins
-    COLS = [3, 10, 8]
-    ROWS = [2, 11, 9, 7]
-    SWITCH_PIN = 23  # Hook switch
-
     # Setup GPIO
     for col in COLS:
         GPIO.setup(col, GPIO.OUT)
@@ -34,16 +44,6 @@ if GPIO_AVAILABLE:
     # Set up GPIO for the switch with a pull-down resistor
     GPIO.setup(SWITCH_PIN, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
 
-    KEYPAD_MAPPING = [
-        ["1", "2", "3"],
-        ["4", "5", "6"],
-        ["7", "8", "9"],
-        ["*", "0", "#"]
-    ]
-
-# Initialize sound system
-pygame.mixer.init()
-
 # Sound configuration
 SOUND_DIRECTORY = "sounds/"  # Directory where sound files are stored
 KEYPAD_SOUNDS = {
@@ -63,91 +63,480 @@ KEYPAD_SOUNDS = {
     "r": "ring.mp3",  # Add ring test mapping
 }
 
-def play_keypad_sound(key):
-    """Play sound associated with keypad press"""
+KEYPAD_CHANNEL = "keypad"  # audio_service channel plan entry for key sounds
+
+# Decoded key sounds, filled once by load_keypad_sounds() and shared by every keypad
+_keypad_sound_bank = {}
+_keypad_sounds_loaded = False
+
+
+def load_keypad_sounds():
+    """Decode every KEYPAD_SOUNDS file once (into the shared audio service) so key presses never touch the disk."""
+    global _keypad_sounds_loaded
+    audio = get_audio_service()
+    _keypad_sound_bank.clear()
+    for key, sound_file in KEYPAD_SOUNDS.items():
+        sound = audio.load(os.path.join(SOUND_DIRECTORY, sound_file))
+        if sound is not None:
+            _keypad_sound_bank[key] = sound
+    _keypad_sounds_loaded = True
+    log.info("Loaded %d keypad sounds", len(_keypad_sound_bank))
+
+
+def play_keypad_sound(key, audio=None):
+    """Play sound associated with keypad press without blocking the caller
+
+    audio is the ChannelSet to play on (default: the audio service's first set).
+    """
     try:
-        # Get sound file name for the key
-        sound_file = KEYPAD_SOUNDS.get(key, KEYPAD_SOUNDS["default"])
-        sound_path = os.path.join(SOUND_DIRECTORY, sound_file)
+        if not _keypad_sounds_loaded:
+            load_keypad_sounds()
+        sound = _keypad_sound_bank.get(key, _keypad_sound_bank.get("default"))
+        if sound is None:
+            return
         
-        if os.path.exists(sound_path):
-            sound = pygame.mixer.Sound(sound_path)
-            sound.play()
-            time.sleep(0.1)  # Short delay to prevent sound overlap
-            print(f"Playing sound for key: {key}")
-        else:
-            print(f"Sound file not found: {sound_path}")
+        # A new press cuts off the previous key sound instead of sleeping to avoid overlap
+        (audio if audio is not None else get_audio_service()).play(KEYPAD_CHANNEL, sound)
+        log.debug("Playing sound for key: %s", key)
             
     except Exception as e:
-        print(f"Error playing keypad sound: {e}")
-
-# Global variables for input handling
-keyboard_input = None
-input_ready = threading.Event()
-phone_on_hook = True  # Track the state of the phone hook
-hook_state_changed = threading.Event()
-last_keypress_time = 0  # Track the time of the last keypress
-last_key_pressed = None  # Track the last key pressed
+        log.error("Error playing keypad sound: %s", e)
+
 KEYPRESS_DELAY = 0.3  # Delay between keypresses in seconds (increased debounce)
 
 # Multi-digit input variables
-input_buffer = ""
-CODE_ENTRY_MODE = False
 CODE_TIMEOUT = 3  # Seconds before code entry times out
+CODE_REJECTED = WRONG_CODE  # Choice returned when a code is rejected while it is being typed
+CODE_REJECT_SOUND = "default"  # KEYPAD_SOUNDS entry played when a code is rejected
 
 _input_thread = None
 _input_thread_lock = Lock()
 _should_stop = False
 
-phone_on_hook = True
-hook_state_changed = Event()
+# Edge-triggered input: GPIO interrupts for the rows and the hook switch instead of busy polling
+EDGE_DETECTION = True
+KEY_BOUNCE_MS = 50  # Ignore further edges on a row for this long after a press
+HOOK_BOUNCE_MS = 50  # Ignore further hook switch edges for this long
+SCAN_SETTLE = 0.0005  # Seconds for a column line to settle while locating the pressed key
+_edge_detection_started = False
 
-def wait_for_hook_change(expected_state):
-    """Waits for the hook to change to the expected state."""
-    global phone_on_hook, keyboard_input, input_ready
-    
-    if GPIO_AVAILABLE:
-        target_gpio_state = GPIO.LOW if expected_state else GPIO.HIGH
+
+class Keypad:
+    """Input state of one handset: the last key, the hook, star-code entry and input listeners.
+
+    Keys and hook changes are pushed in with press() and set_hook() (by
+    the GPIO callbacks for the real phone, or by whatever drives a
+    simulated handset) and waited for with the wait_* methods. Every
+    session has its own Keypad; the real phone's is default_keypad.
+    """
+
+    def __init__(self, name="keypad", audio=None, silent=False):
+        self.name = name
+        self.audio = audio  # ChannelSet for key sounds (None: the audio service's first set)
+        self.silent = silent  # No key sounds at all (simulated callers)
+        self.call_id = None  # Journal id of the call in progress
+        self.keyboard_input = None
+        self.input_ready = Event()
+        self.phone_on_hook = True  # Track the state of the phone hook
+        self.hook_state_changed = Event()
+        self.last_keypress_time = 0  # Track the time of the last keypress
+        self.last_key_pressed = None  # Track the last key pressed
+        self.input_buffer = ""
+        self.code_entry_mode = False
+        # Prefix trie of the current scene's codes (see set_code_trie) and the matcher for the code being typed
+        self.code_trie = None
+        self.code_matcher = None
+        self.state_changed = Event()  # Set on every key or hook edge to wake waiting callers
+        # Callables notified of every input event as (kind, value): ("key", key) or ("hook", lifted)
+        self.listeners = []
+
+    def add_input_listener(self, callback):
+        """Register callback(kind, value) for key presses and hook changes.
+
+        Callbacks run on the thread that delivers the input and must not block.
+        """
+        self.listeners.append(callback)
+
+    def remove_input_listener(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def notify_input(self, kind, value):
+        for callback in list(self.listeners):
+            try:
+                callback(kind, value)
+            except Exception as e:
+                log.error("Error in input listener: %s", e)
+
+    def play_sound(self, key, press_time=None):
+        """Play key's sound, unless silent; press_time (time.time() of the press) times it for KEY_TO_SOUND."""
+        if self.silent:
+            return
+        play_keypad_sound(key, self.audio)
+        if press_time is not None:
+            metrics.KEY_TO_SOUND.observe(time.time() - press_time)
+
+    def press(self, key, press_time=None):
+        """Record a key press unless it is a bounce of the previous one. Returns True if accepted."""
+        if press_time is None:
+            press_time = time.time()
         
-        while GPIO.input(SWITCH_PIN) != target_gpio_state:
-            if input_ready.is_set():
-                print("Keyboard interrupt detected")
-                phone_on_hook = not expected_state
-                return False
-            time.sleep(0.1)
-            
-        phone_on_hook = not expected_state
-        print("Phone " + ("lifted off" if expected_state else "placed back on") + " the hook")
+        # Debounce check - ignore if same key pressed too quickly
+        if key == self.last_key_pressed and press_time - self.last_keypress_time < KEYPRESS_DELAY:
+            metrics.DEBOUNCE_DROPS.inc()
+            return False
+        
+        self.keyboard_input = key
+        log.debug("Keypad press detected: %s", key)
+        self.play_sound(key, press_time)
+        metrics.KEY_PRESSES.inc()
+        journal.record("key", key=key, call=self.call_id)
+        self.last_keypress_time = press_time
+        self.last_key_pressed = key
+        self.input_ready.set()
+        self.state_changed.set()
+        self.notify_input("key", key)
         return True
+
+    def set_hook(self, lifted):
+        """Record the hook switch state."""
+        self.phone_on_hook = not lifted
+        if not lifted:
+            # Presses made while the handset was down are not part of the call
+            self.input_ready.clear()
+        self.hook_state_changed.set()
+        self.state_changed.set()
+        self.notify_input("hook", lifted)
+
+    def is_phone_lifted(self):
+        """Returns True if phone is off hook, False otherwise."""
+        return not self.phone_on_hook
+
+    def hung_up(self):
+        """Check the hook switch after a timed wait came back empty."""
+        return self.phone_on_hook
+
+    def _wait_for_state_change(self, deadline=None):
+        """Sleep until a key or hook edge fires, or until the deadline (a time.time() value) passes."""
+        if deadline is None:
+            self.state_changed.wait()
+        else:
+            remaining = deadline - time.time()
+            if remaining > 0:
+                self.state_changed.wait(remaining)
+
+    def wait_for_hook_change(self, expected_state):
+        """Waits for the hook to change to the expected state."""
+        while True:
+            self.state_changed.clear()
+            if self.phone_on_hook != expected_state:
+                break
+            if self.input_ready.is_set():
+                log.info("Keyboard interrupt detected")
+                self.phone_on_hook = not expected_state
+                return False
+            self._wait_for_state_change()
         
-    else:
-        # PC simulation code
-        message = "Press Enter to simulate lifting the phone" if expected_state else "Press Enter to simulate placing the phone back"
-        print(message + " (or type 'skip' to bypass): ")
+        log.info("Phone %s the hook", "lifted off" if expected_state else "placed back on")
+        return True
+
+    def wait_for_single_keypress(self, timeout=None):
+        """Wait for a single keypress and return it, with optional timeout."""
+        deadline = time.time() + timeout if timeout is not None else None
+        while True:
+            self.state_changed.clear()
+            if self.input_ready.is_set():
+                self.input_ready.clear()
+                result = self.keyboard_input
+                log.debug("Got input: %s", result)
+                return result
+            if self.phone_on_hook:
+                log.debug("Phone hung up")
+                return None
+            if deadline is not None and time.time() >= deadline:
+                return None
+            self._wait_for_state_change(deadline)
+
+    def set_code_trie(self, trie):
+        """Check star codes against trie (the current scene's CodeTrie) as they are typed; None for plain entry."""
+        self.code_trie = trie
+
+    def _end_code_entry(self):
+        self.code_entry_mode = False
+        code = self.input_buffer
+        self.input_buffer = ""
+        self.code_matcher = None
+        return code
+
+    def process_code_key(self, key):
+        """
+        Feed one key through star-code entry. Returns the choice to act on:
+        the key itself, the finished code when '#' ends code entry or the code
+        is complete, CODE_REJECTED as soon as the digits typed cannot lead to
+        any of the scene's codes, or None while a code is still being entered.
+        """
+        # Handle code entry mode
+        if self.code_entry_mode:
+            if key == '#':
+                # End code entry
+                code = self._end_code_entry()
+                log.info("Code entry complete: %s", code)
+                return code
+            elif key == '*':
+                # Cancel code entry
+                log.info("Code entry cancelled")
+                self._end_code_entry()
+                return None
+            else:
+                # Add to code buffer
+                self.input_buffer += key
+                log.debug("Code buffer: %s", self.input_buffer)
+                if self.code_matcher is None:
+                    return None
+                result = self.code_matcher.feed(key)
+                if result == CodeMatcher.DEAD:
+                    log.info("Code rejected: %s", self._end_code_entry())
+                    self.play_sound(CODE_REJECT_SOUND)
+                    return CODE_REJECTED
+                if result == CodeMatcher.COMPLETE:
+                    code = self._end_code_entry()
+                    log.info("Code entry complete: %s", code)
+                    return code
+                return None
+                
+        # Not in code entry mode
+        # Start code entry mode
+        if key == '*':
+            log.info("Starting code entry mode")
+            self.code_entry_mode = True
+            self.input_buffer = ""
+            self.code_matcher = CodeMatcher(self.code_trie) if self.code_trie else None
+            return None
+            
+        return key
+
+    def code_entry_timed_out(self):
+        """
+        Handle a code buffer left idle for CODE_TIMEOUT seconds: submit it if it
+        is already a full code, otherwise abandon it. Returns the code or None.
+        """
+        if not self.code_entry_mode:
+            return None
+        complete = self.code_matcher is not None and self.code_matcher.is_complete()
+        code = self._end_code_entry()
+        if complete:
+            log.info("Code entry complete: %s", code)
+            return code
+        log.info("Code entry timed out: %s", code)
+        return None
+
+    def wait_for_keypress(self):
+        """Wait for keypress and handle special inputs."""
+        while True:
+            timeout = CODE_TIMEOUT if self.code_entry_mode else None
+            key = self.wait_for_single_keypress(timeout)
+            
+            # Handle None/invalid input
+            if key is None:
+                if timeout is not None and not self.hung_up():
+                    choice = self.code_entry_timed_out()
+                    if choice is not None:
+                        return choice
+                    continue
+                return None
+            
+            choice = self.process_code_key(key)
+            if choice is not None:
+                return choice
+
+
+class HardwareKeypad(Keypad):
+    """The keypad and hook switch wired to this machine's GPIO (or, on a PC, the terminal).
+
+    With edge detection the GPIO callbacks feed it like any other Keypad;
+    the polling and keyboard fallbacks below read the pins or stdin themselves.
+    """
+
+    def hung_up(self):
+        if GPIO_AVAILABLE and EDGE_DETECTION:
+            return self.phone_on_hook
+        if GPIO_AVAILABLE:
+            return GPIO.input(SWITCH_PIN) == GPIO.HIGH
+        return False
+
+    def wait_for_hook_change(self, expected_state):
+        if _use_edge_detection():
+            return super().wait_for_hook_change(expected_state)
         
-        try:
-            response = input().strip().lower()
-            if response == 'skip':
-                phone_on_hook = not expected_state
-                print(f"Bypassed: Assuming phone {'lifted off' if expected_state else 'placed back on'} the hook")
+        elif GPIO_AVAILABLE:
+            target_gpio_state = GPIO.LOW if expected_state else GPIO.HIGH
+            
+            while GPIO.input(SWITCH_PIN) != target_gpio_state:
+                if self.input_ready.is_set():
+                    log.info("Keyboard interrupt detected")
+                    self.phone_on_hook = not expected_state
+                    return False
+                time.sleep(0.1)
+                
+            self.phone_on_hook = not expected_state
+            log.info("Phone %s the hook", "lifted off" if expected_state else "placed back on")
+            return True
+            
+        else:
+            # PC simulation code
+            message = "Press Enter to simulate lifting the phone" if expected_state else "Press Enter to simulate placing the phone back"
+            print(message + " (or type 'skip' to bypass): ")
+            
+            try:
+                response = input().strip().lower()
+                if response == 'skip':
+                    self.phone_on_hook = not expected_state
+                    print(f"Bypassed: Assuming phone {'lifted off' if expected_state else 'placed back on'} the hook")
+                    return False
+                else:
+                    self.phone_on_hook = not expected_state
+                    print(f"Simulated phone {'lifted off' if expected_state else 'placed back on'} the hook")
+                    return True
+            except (KeyboardInterrupt, EOFError):
                 return False
+
+    def wait_for_single_keypress(self, timeout=None):
+        if start_input():
+            return super().wait_for_single_keypress(timeout)
+        
+        # Wait for input with optional timeout
+        if timeout is not None:
+            # With timeout - return None if timeout expires
+            log.debug("Waiting for input with %ss timeout...", timeout)
+            if self.input_ready.wait(timeout=timeout):
+                result = self.keyboard_input
+                log.debug("Got input: %s", result)
+                # Clear the event for next use
+                self.input_ready.clear()
+                return result
             else:
-                phone_on_hook = not expected_state
-                print(f"Simulated phone {'lifted off' if expected_state else 'placed back on'} the hook")
-                return True
-        except (KeyboardInterrupt, EOFError):
-            return False
+                log.debug("Timeout expired, no input")
+                return None
+        else:
+            # Without timeout - wait indefinitely with hook checks
+            log.debug("Waiting for input indefinitely...")
+            while True:
+                if self.input_ready.wait(timeout=0.1):
+                    result = self.keyboard_input
+                    log.debug("Got input: %s", result)
+                    # Clear the event for next use
+                    self.input_ready.clear()
+                    return result
+                # Check if phone has been hung up
+                if GPIO_AVAILABLE:
+                    if GPIO.input(SWITCH_PIN) == GPIO.HIGH:
+                        log.debug("Phone hung up")
+                        return None
+
+
+# The handset on this machine's GPIO; the module-level functions below act on it
+default_keypad = HardwareKeypad()
+
+# Old module-level names for the default keypad's state
+_DEFAULT_KEYPAD_ATTRIBUTES = {
+    "keyboard_input": "keyboard_input",
+    "input_ready": "input_ready",
+    "phone_on_hook": "phone_on_hook",
+    "hook_state_changed": "hook_state_changed",
+    "last_keypress_time": "last_keypress_time",
+    "last_key_pressed": "last_key_pressed",
+    "input_buffer": "input_buffer",
+    "CODE_ENTRY_MODE": "code_entry_mode",
+}
+
+
+def __getattr__(name):
+    if name in _DEFAULT_KEYPAD_ATTRIBUTES:
+        return getattr(default_keypad, _DEFAULT_KEYPAD_ATTRIBUTES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def add_input_listener(callback):
+    default_keypad.add_input_listener(callback)
+
+
+def remove_input_listener(callback):
+    default_keypad.remove_input_listener(callback)
+
+
+def _scan_row(row_num):
+    """Find which column of a row is pressed by driving one column low at a time."""
+    row_pin = ROWS[row_num]
+    found = None
+    try:
+        for col_pin in COLS:
+            GPIO.output(col_pin, GPIO.HIGH)
+        for col_num, col_pin in enumerate(COLS):
+            GPIO.output(col_pin, GPIO.LOW)
+            time.sleep(SCAN_SETTLE)
+            pressed = GPIO.input(row_pin) == GPIO.LOW
+            GPIO.output(col_pin, GPIO.HIGH)
+            if pressed:
+                found = col_num
+                break
+    finally:
+        # Idle state: every column low, so any key pulls its row low and fires an edge
+        for col_pin in COLS:
+            GPIO.output(col_pin, GPIO.LOW)
+    return found
+
+
+def _on_row_edge(row_pin):
+    """GPIO callback: a row line fell, so some key in that row was pressed."""
+    press_time = time.time()
+    row_num = ROWS.index(row_pin)
+    col_num = _scan_row(row_num)
+    if col_num is not None:
+        default_keypad.press(KEYPAD_MAPPING[row_num][col_num], press_time)
+
+
+def _on_hook_edge(pin):
+    """GPIO callback: the hook switch changed state."""
+    default_keypad.set_hook(GPIO.input(SWITCH_PIN) != GPIO.HIGH)
+
+
+def start_edge_detection():
+    """Register GPIO edge callbacks for the keypad rows and hook switch (once)."""
+    global _edge_detection_started
+    
+    with _input_thread_lock:
+        if _edge_detection_started:
+            return
+        for col_pin in COLS:
+            GPIO.output(col_pin, GPIO.LOW)
+        for row_pin in ROWS:
+            GPIO.add_event_detect(row_pin, GPIO.FALLING, callback=_on_row_edge, bouncetime=KEY_BOUNCE_MS)
+        GPIO.add_event_detect(SWITCH_PIN, GPIO.BOTH, callback=_on_hook_edge, bouncetime=HOOK_BOUNCE_MS)
+        default_keypad.phone_on_hook = GPIO.input(SWITCH_PIN) == GPIO.HIGH
+        _edge_detection_started = True
+        log.debug("Edge detection started")
+
+
+def _use_edge_detection():
+    if GPIO_AVAILABLE and EDGE_DETECTION:
+        start_edge_detection()
+        return True
+    return False
+
+
+def wait_for_hook_change(expected_state):
+    """Waits for the hook to change to the expected state."""
+    return default_keypad.wait_for_hook_change(expected_state)
 
 def is_phone_lifted():
     """Returns True if phone is off hook, False otherwise."""
-    global phone_on_hook
-    return not phone_on_hook
+    return default_keypad.is_phone_lifted()
 
 def keyboard_input_thread():
     """Thread function to handle keyboard input. Runs continuously."""
-    global keyboard_input, _should_stop, last_keypress_time, last_key_pressed
+    global _should_stop
     
-    print("DEBUG: Input thread started")
+    log.debug("Input thread started")
     try:
         while not _should_stop:
             current_time = time.time()
@@ -157,7 +546,7 @@ def keyboard_input_thread():
                 # Check each column
                 for col_num, col_pin in enumerate(COLS):
                     if _should_stop:
-                        print("DEBUG: Thread stopping (should_stop=True)")
+                        log.debug("Thread stopping (should_stop=True)")
                         return
                         
                     GPIO.output(col_pin, GPIO.LOW)  # Set column low
@@ -167,23 +556,15 @@ def keyboard_input_thread():
                     for row_num, row_pin in enumerate(ROWS):
                         if _should_stop:
                             GPIO.output(col_pin, GPIO.HIGH)
-                            print("DEBUG: Thread stopping (should_stop=True)")
+                            log.debug("Thread stopping (should_stop=True)")
                             return
                             
                         if GPIO.input(row_pin) == GPIO.LOW:  # Key pressed
                             key = KEYPAD_MAPPING[row_num][col_num]
                             
-                            # Debounce check - ignore if same key pressed too quickly
-                            if key == last_key_pressed and current_time - last_keypress_time < KEYPRESS_DELAY:
+                            if not default_keypad.press(key, current_time):
                                 GPIO.output(col_pin, GPIO.HIGH)
                                 continue
-                                
-                            keyboard_input = key
-                            print(f"Keypad press detected: {keyboard_input}")
-                            play_keypad_sound(keyboard_input)
-                            input_ready.set()
-                            last_keypress_time = current_time
-                            last_key_pressed = key
                             
                             # Wait for key release
                             while GPIO.input(row_pin) == GPIO.LOW:
@@ -200,104 +581,60 @@ def keyboard_input_thread():
                     
             else:
                 # Fallback to keyboard input if no GPIO
-                keyboard_input = input().strip().lower()
-                if keyboard_input and len(keyboard_input) == 1:
-                    if keyboard_input in KEYPAD_SOUNDS:
-                        play_keypad_sound(keyboard_input)
-                    input_ready.set()
+                typed = input().strip().lower()
+                default_keypad.keyboard_input = typed
+                if typed and len(typed) == 1:
+                    if typed in KEYPAD_SOUNDS:
+                        default_keypad.play_sound(typed)
+                    default_keypad.input_ready.set()
+                    default_keypad.notify_input("key", typed)
                     # Don't break - wait for next input
                     
     except (EOFError, KeyboardInterrupt):
         _should_stop = True
     
-    print("DEBUG: Input thread exiting")
+    log.debug("Input thread exiting")
 
 # Add these new functions
 
-def wait_for_single_keypress(timeout=None):
-    """Wait for a single keypress and return it, with optional timeout."""
-    global keyboard_input, input_ready, _input_thread, _should_stop
+def start_input():
+    """Start delivering key presses: GPIO edge callbacks if possible, otherwise the input thread.
+
+    Returns True if edge detection is in use.
+    """
+    global _input_thread, _should_stop
+    
+    if _use_edge_detection():
+        return True
     
     with _input_thread_lock:
         # Only start a new thread if the current one is dead
         if not _input_thread or not _input_thread.is_alive():
-            print(f"DEBUG: Starting new input thread (timeout={timeout})")
+            log.debug("Starting new input thread")
             # Reset states only when starting new thread
-            keyboard_input = None
-            input_ready.clear()
+            default_keypad.keyboard_input = None
+            default_keypad.input_ready.clear()
             _should_stop = False
             _input_thread = threading.Thread(target=keyboard_input_thread, daemon=True)
             _input_thread.start()
-        else:
-            print(f"DEBUG: Thread already running, waiting for input (timeout={timeout})")
-    
-    # Wait for input with optional timeout
-    if timeout is not None:
-        # With timeout - return None if timeout expires
-        print(f"DEBUG: Waiting for input with {timeout}s timeout...")
-        if input_ready.wait(timeout=timeout):
-            result = keyboard_input
-            print(f"DEBUG: Got input: {result}")
-            # Clear the event for next use
-            input_ready.clear()
-            return result
-        else:
-            print(f"DEBUG: Timeout expired, no input")
-            return None
-    else:
-        # Without timeout - wait indefinitely with hook checks
-        print(f"DEBUG: Waiting for input indefinitely...")
-        while True:
-            if input_ready.wait(timeout=0.1):
-                result = keyboard_input
-                print(f"DEBUG: Got input: {result}")
-                # Clear the event for next use
-                input_ready.clear()
-                return result
-            # Check if phone has been hung up
-            if GPIO_AVAILABLE:
-                if GPIO.input(SWITCH_PIN) == GPIO.HIGH:
-                    print(f"DEBUG: Phone hung up")
-                    return None
+    return False
+
+def wait_for_single_keypress(timeout=None):
+    """Wait for a single keypress and return it, with optional timeout."""
+    return default_keypad.wait_for_single_keypress(timeout)
+
+def set_code_trie(trie):
+    """Check star codes against trie (the current scene's CodeTrie) as they are typed; None for plain entry."""
+    default_keypad.set_code_trie(trie)
+
+def process_code_key(key):
+    """Feed one key through the default keypad's star-code entry (see Keypad.process_code_key)."""
+    return default_keypad.process_code_key(key)
+
+def code_entry_timed_out():
+    """Finish or abandon the default keypad's idle code entry (see Keypad.code_entry_timed_out)."""
+    return default_keypad.code_entry_timed_out()
 
 def wait_for_keypress():
     """Wait for keypress and handle special inputs."""
-    global CODE_ENTRY_MODE, input_buffer
-    
-    while True:
-        key = wait_for_single_keypress()
-        
-        # Handle None/invalid input
-        if key is None:
-            return None
-            
-        # Handle code entry mode
-        if CODE_ENTRY_MODE:
-            if key == '#':
-                # End code entry
-                CODE_ENTRY_MODE = False
-                code = input_buffer
-                input_buffer = ""
-                print(f"Code entry complete: {code}")
-                return code
-            elif key == '*':
-                # Cancel code entry
-                print("Code entry cancelled")
-                CODE_ENTRY_MODE = False
-                input_buffer = ""
-                continue
-            else:
-                # Add to code buffer
-                input_buffer += key
-                print(f"Code buffer: {input_buffer}")
-                continue
-                
-        # Not in code entry mode
-        # Start code entry mode
-        if key == '*':
-            print("Starting code entry mode")
-            CODE_ENTRY_MODE = True
-            input_buffer = ""
-            continue
-            
-        return key
\ No newline at end of file
+    return default_keypad.wait_for_keypress()
@@ -0,0 +1,247 @@
+"""Latency histograms and counters, exported in Prometheus text format.
+
+Instrumented code records into module-level metrics:
+
+    metrics.KEY_TO_SOUND.observe(seconds)
+    metrics.DEBOUNCE_DROPS.inc()
+
+Histograms keep cumulative bucket counts (for Prometheus) plus a window of
+the most recent samples, from which p50/p95/p99 are computed. Recording is
+a few integer operations under a lock, cheap enough for GPIO callbacks.
+
+start_exporter() writes render() to a file every interval seconds
+(atomically, so a reader never sees half a file) and/or serves it on a
+Unix socket, one snapshot per connection:
+
+    PAYPHONE_METRICS_FILE=/tmp/payphone_metrics.prom   (default; "" disables)
+    PAYPHONE_METRICS_SOCKET=/tmp/payphone_metrics.sock (off by default)
+
+    socat - UNIX-CONNECT:/tmp/payphone_metrics.sock
+"""
+import bisect
+import collections
+import os
+import socket
+import threading
+import time
+
+# Latency bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+WINDOW = 1024  # Recent samples kept per histogram for quantiles
+
+METRICS_FILE = os.environ.get("PAYPHONE_METRICS_FILE", "/tmp/payphone_metrics.prom")
+METRICS_SOCKET = os.environ.get("PAYPHONE_METRICS_SOCKET", "")
+EXPORT_INTERVAL = 10  # Seconds between metrics file writes
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def render(self):
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} counter",
+            f"{self.name} {self.value}",
+        ]
+
+
+class Gauge:
+    """A value read from a callable at export time."""
+
+    def __init__(self, name, help_text, read):
+        self.name = name
+        self.help = help_text
+        self.read = read
+
+    def render(self):
+        try:
+            value = self.read()
+        except Exception as e:
+            return [f"# {self.name} unavailable: {e}"]
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {value}",
+        ]
+
+
+def _quantile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS, window=WINDOW):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.recent = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+            self.recent.append(value)
+
+    def quantiles(self, fractions=QUANTILES):
+        """Return {fraction: value} over the recent window, or {} before any sample."""
+        with self._lock:
+            ordered = sorted(self.recent)
+        if not ordered:
+            return {}
+        return {fraction: _quantile(ordered, fraction) for fraction in fractions}
+
+    def render(self):
+        with self._lock:
+            counts = list(self.counts)
+            count, total = self.count, self.sum
+        lines = [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} histogram",
+        ]
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {count}')
+        lines.append(f"{self.name}_sum {total}")
+        lines.append(f"{self.name}_count {count}")
+
+        # Quantiles over the recent window, as a separate summary family
+        lines.append(f"# HELP {self.name}_recent {self.help} (last {self.recent.maxlen} samples)")
+        lines.append(f"# TYPE {self.name}_recent summary")
+        for fraction, value in self.quantiles().items():
+            lines.append(f'{self.name}_recent{{quantile="{fraction}"}} {value}')
+        lines.append(f"{self.name}_recent_count {len(self.recent)}")
+        return lines
+
+
+# name -> metric, in registration order
+REGISTRY = {}
+
+
+def _register(metric):
+    existing = REGISTRY.get(metric.name)
+    if existing is not None:
+        return existing
+    REGISTRY[metric.name] = metric
+    return metric
+
+
+def counter(name, help_text):
+    return _register(Counter(name, help_text))
+
+
+def histogram(name, help_text, buckets=LATENCY_BUCKETS):
+    return _register(Histogram(name, help_text, buckets))
+
+
+def gauge(name, help_text, read):
+    """Register (or replace) a gauge whose value comes from read()."""
+    metric = Gauge(name, help_text, read)
+    REGISTRY[name] = metric
+    return metric
+
+
+def render():
+    """All metrics in Prometheus text exposition format."""
+    lines = []
+    for metric in list(REGISTRY.values()):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def write_file(path=METRICS_FILE):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(render())
+    os.replace(tmp_path, path)
+
+
+# The payphone's own metrics
+KEY_TO_SOUND = histogram("payphone_key_to_sound_seconds", "Key press to key sound starting")
+TRANSITION_TO_AUDIO = histogram("payphone_transition_to_audio_seconds", "Choice resolved to next scene audio starting")
+PICKUP_TO_INTRO = histogram("payphone_pickup_to_intro_seconds", "Handset lifted to intro audio starting")
+KEY_PRESSES = counter("payphone_key_presses_total", "Key presses accepted")
+DEBOUNCE_DROPS = counter("payphone_debounce_drops_total", "Key presses dropped by the repeat-key debounce")
+CALLS = counter("payphone_calls_total", "Calls started by lifting the handset")
+TRANSITIONS = counter("payphone_transitions_total", "Scene transitions")
+
+
+class MetricsExporter:
+    """Writes the metrics file periodically and serves the Unix socket, on daemon threads."""
+
+    def __init__(self, file_path=METRICS_FILE, socket_path=METRICS_SOCKET, interval=EXPORT_INTERVAL):
+        self.file_path = file_path
+        self.socket_path = socket_path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._server = None
+
+    def start(self):
+        if self.file_path:
+            threading.Thread(target=self._write_loop, daemon=True).start()
+            print(f"Writing metrics to {self.file_path} every {self.interval}s")
+        if self.socket_path:
+            try:
+                if os.path.exists(self.socket_path):
+                    os.unlink(self.socket_path)
+                self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self._server.bind(self.socket_path)
+                self._server.listen(4)
+                threading.Thread(target=self._serve_loop, daemon=True).start()
+                print(f"Serving metrics on {self.socket_path}")
+            except OSError as e:
+                print(f"Could not serve metrics on {self.socket_path}: {e}")
+                self._server = None
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+
+    def _write_loop(self):
+        while not self._stop.is_set():
+            try:
+                write_file(self.file_path)
+            except OSError as e:
+                print(f"Error writing metrics to {self.file_path}: {e}")
+            self._stop.wait(self.interval)
+
+    def _serve_loop(self):
+        server = self._server
+        while not self._stop.is_set():
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return  # Socket closed by stop()
+            try:
+                with conn:
+                    conn.sendall(render().encode("utf-8"))
+            except OSError as e:
+                print(f"Error serving metrics: {e}")
+
+
+def start_exporter(file_path=METRICS_FILE, socket_path=METRICS_SOCKET, interval=EXPORT_INTERVAL):
+    return MetricsExporter(file_path, socket_path, interval).start()
+
+
+def elapsed_since(start):
+    """Seconds since a time.perf_counter() value."""
+    return time.perf_counter() - start
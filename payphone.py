@@ -1,14 +1,8 @@
-import RPi.GPIO as GPIO
-from datetime import datetime, time as datetime_time  # Rename to avoid conflict
-import random
-import threading
-import pygame
 import os
-import time  # Add this import
-from keypad import GPIO_AVAILABLE
-#import keyboard  # Add this import at top
-import subprocess
-from typing import Optional
+from keypad import GPIO, GPIO_AVAILABLE
+from audio_router import load_audio_router, AUX_SINK, AIY_SINK
+from audio_service import get_audio_service
+from ring_scheduler import RingScheduler
 
 # Pin definitions
 LIGHT_PIN = 25  # Choose an unused GPIO pin
@@ -18,35 +12,32 @@ if GPIO_AVAILABLE:
     GPIO.setup(LIGHT_PIN, GPIO.OUT)
     GPIO.output(LIGHT_PIN, GPIO.LOW)
 
-# Initialize a separate pygame mixer for aux output
-pygame.mixer.pre_init(44100, -16, 2, 2048)
-pygame.mixer.init(devicename="hw:0,0")  # Use default audio device (aux)
-
 class PayPhone:
     def __init__(self, audio_dir="sounds"):
         try:
             # Define audio device names from pactl output
-            self.AUX_DEVICE = "alsa_output.platform-3f00b840.mailbox.stereo-fallback"
-            self.AIY_DEVICE = "alsa_output.platform-soc_sound.stereo-fallback"
+            self.AUX_DEVICE = AUX_SINK
+            self.AIY_DEVICE = AIY_SINK
+            self.audio_router = None
             
             self.audio_dir = audio_dir
             self.ring_sound = None
             self.adventure_active = False
-            self.last_ring_time = time.time()
             self.ring_volume = 1.0
             self.debug_mode = True
 
             # Setup PulseAudio
             self._setup_pulseaudio()
             
-            # Initialize mixer for AUX
-            self._init_mixer()
+            # Shared mixer (initialized once for every module)
+            self.audio = get_audio_service()
             
             self.load_sounds()
-            print("Creating ring thread...")
-            self.ring_thread = threading.Thread(target=self._random_ring_controller, daemon=True)
-            self.ring_thread.start()
-            print("Ring thread started successfully")
+            # Sleeps until the next ring it has drawn, and not at all outside the ring windows
+            self.ring_scheduler = RingScheduler(
+                self._start_ring, self._stop_ring, can_ring=lambda: not self.adventure_active
+            ).start()
+            print("Ring scheduler started successfully")
             print("Debug mode active - Press 'r' key to test ring")
         except Exception as e:
             print(f"Error in PayPhone initialization: {e}")
@@ -56,6 +47,8 @@ class PayPhone:
     def _setup_pulseaudio(self):
         """Setup PulseAudio configuration"""
         try:
+            # One router for the life of the process, so switching never reconnects or forks
+            self.audio_router = load_audio_router()
             # Switch to AUX by default
             self._switch_audio_output(self.AUX_DEVICE)
             print(f"Initial audio setup: {self.AUX_DEVICE}")
@@ -63,90 +56,44 @@ class PayPhone:
             print(f"PulseAudio setup error: {e}")
 
     def _switch_audio_output(self, sink_name: str) -> None:
-        """Switch PulseAudio output device"""
+        """Switch PulseAudio output device (the mixer stream stays open and is moved)"""
         try:
-            time.sleep(0.5)
-            result = subprocess.run(
-                ["pactl", "set-default-sink", sink_name],
-                check=False,  # Don't raise exception
-                capture_output=True,
-                text=True
-            )
-            if result.returncode == 0:
-                print(f"Switched audio to {sink_name}")
-            else:
-                print(f"Error switching to {sink_name}: {result.stderr}")
-                
+            if self.audio_router:
+                self.audio_router.switch(sink_name)
         except Exception as e:
             print(f"Error in audio switch: {e}")
 
-    def _init_mixer(self):
-        """Initialize pygame mixer"""
-        try:
-            print("Attempting to quit mixer...")
-            pygame.mixer.quit()
-            print("Mixer quit successfully")
-            print("Pre-initializing mixer...")
-            pygame.mixer.pre_init(44100, -16, 2, 2048)
-            print("Mixer pre-init successful")
-            print("Initializing mixer...")
-            pygame.mixer.init()
-            print("Mixer initialized successfully")
-        except Exception as e:
-            print(f"Mixer initialization error: {e}")
-            import traceback
-            traceback.print_exc()
-
     def load_sounds(self):
         """Load the ring sound file"""
         ring_path = os.path.join(self.audio_dir, "ring.mp3")
-        if os.path.exists(ring_path):
-            try:
-                self.ring_sound = pygame.mixer.Sound(ring_path)
-                self.ring_sound.set_volume(self.ring_volume)
-                print(f"Ring sound loaded from {ring_path}")
-            except Exception as e:
-                print(f"Error loading ring sound: {e}")
-        else:
-            print(f"Ring sound not found at {ring_path}")
+        self.ring_sound = self.audio.load(ring_path, volume=self.ring_volume)
+        if self.ring_sound:
+            print(f"Ring sound loaded from {ring_path}")
 
     def set_light(self, state):
         """Control the payphone light"""
         if GPIO_AVAILABLE:
             GPIO.output(LIGHT_PIN, state)
 
-    def play_ring(self, duration=3):
-        """Play the ring sound and control light"""
-        if self.ring_sound:
-            print("Attempting to play ring sound on aux...")
-            self.set_light(GPIO.HIGH)
-            self.ring_sound.play()
-            time.sleep(duration)
-            self.ring_sound.stop()
+    def _start_ring(self):
+        if not self.ring_sound:
+            return False
+        print("Attempting to play ring sound on aux...")
+        if not self.audio.play("ring", self.ring_sound):
+            print("Ring skipped: scene audio is playing")
+            return False
+        self.set_light(GPIO.HIGH)
+        return True
+
+    def _stop_ring(self):
+        self.audio.stop("ring")
+        if not self.adventure_active:
             self.set_light(GPIO.LOW)
-            print("Ring sound completed")
 
-    def _random_ring_controller(self):
-        """Background thread to handle random ringing"""
-        while True:
-            now = datetime.now().time()
-            current_time = time.time()
-            
-            # Debug output
-            if datetime_time(14,0) <= now <= datetime_time(17,0):
-                print(f"Current time {now} is within ring window")
-            
-            # Only ring between 2 PM and 5 PM
-            if (datetime_time(14,0) <= now <= datetime_time(17,0) and 
-                not self.adventure_active and
-                current_time - self.last_ring_time >= 300):  # At least 5 minutes since last ring
-                
-                if random.random() < 0.3:  # Increase chance to 30%
-                    print("Triggering random ring...")
-                    self.play_ring()
-                    self.last_ring_time = current_time
-                
-            time.sleep(60)  # Check every minute
+    def play_ring(self, duration=3):
+        """Play the ring sound and control light, until duration passes or the handset is lifted"""
+        if self.ring_scheduler.ring(duration):
+            print("Ring sound completed")
 
     def _debug_ring_trigger(self, _):
         """Debug method to trigger ring manually"""
@@ -157,6 +104,7 @@ class PayPhone:
     def start_adventure(self):
         """Switch to AIY speaker when adventure starts"""
         self.adventure_active = True
+        self.ring_scheduler.cancel_ring()  # Stop ringing the moment the handset is lifted
         self.set_light(GPIO.HIGH)
         self._switch_audio_output(self.AIY_DEVICE)
 
@@ -165,7 +113,6 @@ class PayPhone:
         self.adventure_active = False
         self.set_light(GPIO.LOW)
         self._switch_audio_output(self.AUX_DEVICE)
-        self.load_sounds()
 
 # Create a global instance
 payphone = PayPhone()
\ No newline at end of file
@@ -0,0 +1,152 @@
+"""Leveled logging with an in-memory ring buffer.
+
+Replaces the unconditional "DEBUG:" prints on the hot paths. Every logger
+call first compares its level against one module-level threshold, so a
+disabled message costs a method call and an integer compare; the message
+is only %-formatted when it is printed or kept.
+
+Two levels apply:
+
+    console level   messages at or above it are printed (PAYPHONE_LOG_LEVEL,
+                    default "info")
+    ring level      messages at or above it are kept in a ring buffer of the
+                    last RING_SIZE events (PAYPHONE_LOG_RING_LEVEL, default
+                    "debug"), for post-mortems
+
+The ring buffer is dumped with dump(), or by sending the process SIGUSR1
+once install_dump_signal() has been called:
+
+    kill -USR1 <pid>
+
+Ring entries are formatted when they are logged, so a dump shows the
+values from when each event happened and holds no references to them.
+"""
+import collections
+import os
+import signal
+import sys
+import time
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+OFF = 100
+
+LEVEL_NAMES = {"debug": DEBUG, "info": INFO, "warning": WARNING, "error": ERROR, "off": OFF}
+
+RING_SIZE = int(os.environ.get("PAYPHONE_LOG_RING", "1000"))
+
+
+def parse_level(level):
+    """Accept a level number or name like "debug"."""
+    if isinstance(level, int):
+        return level
+    return LEVEL_NAMES[level.lower()]
+
+
+_console_level = parse_level(os.environ.get("PAYPHONE_LOG_LEVEL", "info"))
+_ring_level = parse_level(os.environ.get("PAYPHONE_LOG_RING_LEVEL", "debug"))
+_threshold = min(_console_level, _ring_level)  # Lowest level anything is done with
+_ring = collections.deque(maxlen=RING_SIZE)
+
+
+def set_level(console=None, ring=None):
+    """Change the console and/or ring buffer level."""
+    global _console_level, _ring_level, _threshold
+    if console is not None:
+        _console_level = parse_level(console)
+    if ring is not None:
+        _ring_level = parse_level(ring)
+    _threshold = min(_console_level, _ring_level)
+
+
+def enabled(level):
+    """True if a message at level would be printed or kept. Use to skip building expensive messages."""
+    return level >= _threshold
+
+
+def _format(msg, args):
+    if args:
+        try:
+            msg = msg % args
+        except Exception as e:
+            msg = f"{msg} {args!r} (format error: {e})"
+    return msg
+
+
+def _emit(level, name, msg, args):
+    text = _format(msg, args)
+    if level >= _ring_level:
+        _ring.append((time.time(), level, name, text))  # deque.append is thread safe
+    if level >= _console_level:
+        print(f"DEBUG: {text}" if level == DEBUG else text)
+
+
+class Logger:
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def debug(self, msg, *args):
+        if DEBUG >= _threshold:
+            _emit(DEBUG, self.name, msg, args)
+
+    def info(self, msg, *args):
+        if INFO >= _threshold:
+            _emit(INFO, self.name, msg, args)
+
+    def warning(self, msg, *args):
+        if WARNING >= _threshold:
+            _emit(WARNING, self.name, msg, args)
+
+    def error(self, msg, *args):
+        if ERROR >= _threshold:
+            _emit(ERROR, self.name, msg, args)
+
+
+_loggers = {}
+
+
+def get_logger(name):
+    logger = _loggers.get(name)
+    if logger is None:
+        logger = _loggers[name] = Logger(name)
+    return logger
+
+
+def recent(count=None):
+    """Return the last count ring buffer entries (all by default) as formatted lines."""
+    entries = list(_ring)
+    if count is not None:
+        entries = entries[-count:]
+    level_names = {value: name.upper() for name, value in LEVEL_NAMES.items()}
+    lines = []
+    for created, level, name, text in entries:
+        stamp = time.strftime("%H:%M:%S", time.localtime(created)) + f".{int(created % 1 * 1000):03d}"
+        lines.append(f"{stamp} {level_names.get(level, level):<7} {name}: {text}")
+    return lines
+
+
+def dump(out=None, count=None):
+    """Write the ring buffer to out (default stderr)."""
+    out = out or sys.stderr
+    lines = recent(count)
+    out.write(f"--- last {len(lines)} log events ---\n")
+    for line in lines:
+        out.write(line + "\n")
+    out.flush()
+
+
+def install_dump_signal(signum=getattr(signal, "SIGUSR1", None)):
+    """Dump the ring buffer to stderr whenever the process gets signum (SIGUSR1 by default)."""
+    if signum is None:
+        return False
+    try:
+        signal.signal(signum, lambda received, frame: dump())
+        return True
+    except ValueError as e:
+        # Only the main thread can install signal handlers
+        print(f"Could not install log dump signal handler: {e}")
+        return False
@@ -1,24 +1,21 @@
-import pygame.mixer as aux_mixer
 import os
+from audio_service import get_audio_service
 
 class RingAudio:
     def __init__(self):
-        # Initialize a separate mixer for aux output (typically hw:0,0 or default)
-        aux_mixer.init(devicename="default")
+        # Ring on the shared mixer's reserved ring channel
+        self.audio = get_audio_service()
         self.ring_sound = None
         self.load_ring_sound()
     
     def load_ring_sound(self):
         ring_path = os.path.join("sounds", "ring.mp3")
-        if os.path.exists(ring_path):
-            self.ring_sound = aux_mixer.Sound(ring_path)
-        else:
-            print(f"Ring sound file not found at {ring_path}")
+        self.ring_sound = self.audio.load(ring_path)
     
     def play_ring(self):
         if self.ring_sound:
-            self.ring_sound.play()
+            self.audio.play("ring", self.ring_sound)
     
     def stop_ring(self):
         if self.ring_sound:
-            self.ring_sound.stop()
\ No newline at end of file
+            self.audio.stop("ring")
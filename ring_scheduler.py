@@ -0,0 +1,191 @@
+"""Scheduling the payphone's random rings.
+
+Instead of waking every minute to roll the dice, the scheduler draws the
+next ring time ahead of time and sleeps until it:
+
+    next ring = max(now, last ring + cooldown) + an exponential wait with
+                mean RING_MEAN_WAIT, moved into the next ring window (and
+                redrawn from its start) if it falls outside one
+
+The old controller (a 30% chance once a minute after a 5 minute
+cooldown) averaged about the same spacing. Outside the windows the thread
+does not wake at all. On waking it rechecks the wall clock, since a Pi
+without a real-time clock can have its time set by NTP after boot, and
+reschedules if the ring is no longer due.
+
+Rings wait on an Event rather than sleeping, so cancel_ring() (called
+when the handset is lifted) stops one the instant it is called.
+
+Configuration (environment):
+
+    PAYPHONE_RING_WINDOWS    "HH:MM-HH:MM" ranges, comma separated
+                             (default 14:00-17:00; a range may wrap
+                             midnight, empty disables random rings)
+    PAYPHONE_RING_COOLDOWN   minimum seconds between rings (300)
+    PAYPHONE_RING_MEAN_WAIT  mean extra seconds after the cooldown (200)
+    PAYPHONE_RING_DURATION   seconds each ring lasts (3)
+"""
+import os
+import random
+import threading
+from datetime import datetime, time as datetime_time, timedelta
+
+import phone_log
+
+log = phone_log.get_logger("ring")
+
+RING_WINDOWS = os.environ.get("PAYPHONE_RING_WINDOWS", "14:00-17:00")
+RING_COOLDOWN = float(os.environ.get("PAYPHONE_RING_COOLDOWN", "300"))
+RING_MEAN_WAIT = float(os.environ.get("PAYPHONE_RING_MEAN_WAIT", "200"))
+RING_DURATION = float(os.environ.get("PAYPHONE_RING_DURATION", "3"))
+
+
+def _parse_time(text):
+    hours, minutes = text.strip().split(":")
+    return datetime_time(int(hours), int(minutes))
+
+
+def parse_windows(spec):
+    """Parse "HH:MM-HH:MM, ..." into a list of (start, end) datetime.time pairs."""
+    windows = []
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        try:
+            start, end = part.split("-")
+            windows.append((_parse_time(start), _parse_time(end)))
+        except ValueError:
+            raise ValueError(f"Bad ring window {part.strip()!r}, expected HH:MM-HH:MM")
+    return windows
+
+
+def in_window(moment, windows):
+    """True if the datetime moment falls inside one of the windows."""
+    now = moment.time()
+    for start, end in windows:
+        if start <= end:
+            if start <= now <= end:
+                return True
+        elif now >= start or now <= end:  # Wraps midnight
+            return True
+    return False
+
+
+def next_window_start(moment, windows):
+    """The first window start after moment (a datetime), or None without windows."""
+    starts = []
+    for start, _ in windows:
+        candidate = datetime.combine(moment.date(), start)
+        if candidate <= moment:
+            candidate += timedelta(days=1)
+        starts.append(candidate)
+    return min(starts) if starts else None
+
+
+def next_ring_time(now, windows, last_ring=None, cooldown=RING_COOLDOWN, mean_wait=RING_MEAN_WAIT, rng=random):
+    """Draw the datetime of the next ring after now, or None if there are no windows."""
+    if not windows:
+        return None
+    earliest = now
+    if last_ring is not None:
+        earliest = max(now, last_ring + timedelta(seconds=cooldown))
+    candidate = earliest + timedelta(seconds=rng.expovariate(1 / mean_wait) if mean_wait > 0 else 0)
+    # A draw that lands outside the windows starts over from the next window
+    for _ in range(len(windows) * 8):
+        if in_window(candidate, windows):
+            return candidate
+        start = next_window_start(candidate, windows)
+        candidate = start + timedelta(seconds=rng.expovariate(1 / mean_wait) if mean_wait > 0 else 0)
+    return next_window_start(candidate, windows)  # Windows shorter than a typical wait
+
+
+class RingScheduler:
+    """Rings at random times within the ring windows on a thread of its own.
+
+    start_ring() and stop_ring() make and end the noise; can_ring() is
+    asked at ring time (the payphone says no during a call).
+    """
+
+    def __init__(self, start_ring, stop_ring, can_ring=lambda: True, windows=None,
+                 cooldown=RING_COOLDOWN, mean_wait=RING_MEAN_WAIT, duration=RING_DURATION,
+                 clock=datetime.now, rng=None):
+        self.start_ring = start_ring
+        self.stop_ring = stop_ring
+        self.can_ring = can_ring
+        self.windows = parse_windows(RING_WINDOWS) if windows is None else windows
+        self.cooldown = cooldown
+        self.mean_wait = mean_wait
+        self.duration = duration
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self.last_ring = None
+        self.next_ring = None
+        self.ringing = False
+        self._wakeup = threading.Event()  # Set to reschedule or stop
+        self._cancel = threading.Event()  # Set to end the current ring
+        self._lock = threading.Lock()
+        self._stopped = False
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped = True
+        self.cancel_ring()
+        self._wakeup.set()
+
+    def reschedule(self):
+        """Draw a new ring time now (e.g. after changing windows)."""
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stopped:
+            self._wakeup.clear()
+            self.next_ring = next_ring_time(
+                self.clock(), self.windows, self.last_ring, self.cooldown, self.mean_wait, self.rng
+            )
+            if self.next_ring is None:
+                log.info("No ring windows configured, random rings are off")
+                self._wakeup.wait()
+                continue
+            log.debug("Next ring at %s", self.next_ring)
+            delay = (self.next_ring - self.clock()).total_seconds()
+            if self._wakeup.wait(max(0, delay)):
+                continue
+            now = self.clock()
+            if now < self.next_ring or not in_window(now, self.windows):
+                log.debug("Clock moved (now %s), rescheduling", now)
+                continue
+            self.ring()  # Refused during a call
+            # Skipped rings also count, so the next one waits out the cooldown
+            self.last_ring = self.clock()
+
+    def ring(self, duration=None):
+        """Ring for duration seconds (default the configured one), unless cancelled first.
+
+        Blocks the calling thread. Returns False if the ring was refused or cancelled.
+        """
+        with self._lock:
+            if self.ringing:
+                return False
+            self._cancel.clear()
+            # Asked only after the clear: a lift that cancelled just before it is seen here,
+            # and one just after it cuts the ring short
+            if not self.can_ring():
+                return False
+            self.ringing = True
+        try:
+            if not self.start_ring():
+                return False
+            cancelled = self._cancel.wait(self.duration if duration is None else duration)
+            return not cancelled
+        finally:
+            self.stop_ring()
+            self.ringing = False
+
+    def cancel_ring(self):
+        """End the current ring, if any, immediately."""
+        self._cancel.set()
@@ -1,54 +1,84 @@
-import pygame
 import os
 import time
+from sound_cache import SoundCache, DEFAULT_CACHE_BYTES
+from audio_prefetch import AudioPrefetcher
+from audio_service import get_audio_service
+from audio_info import audio_duration, audio_format
+from audio_pcm import load_sound, stream_source
+from audio_analysis import apply_gain, levels
+import phone_log
+
+log = phone_log.get_logger("scene_audio")
+
+# Scene files at least this long (or this big) are streamed instead of decoded whole,
+# so the first sound does not wait for the decode and memory stays bounded
+STREAM_MIN_SECONDS = 30
+STREAM_MIN_BYTES = 4 * 1024 * 1024
+
+
+def is_stream_sized(path, duration=audio_duration):
+    """True if a scene file is long or big enough to stream; duration(path) gives its seconds or None"""
+    try:
+        if os.path.getsize(path) >= STREAM_MIN_BYTES:
+            return True
+    except OSError:
+        return False
+    seconds = duration(path)
+    return seconds is not None and seconds >= STREAM_MIN_SECONDS
+
 
 class SceneAudio:
-    def __init__(self, audio_dir="scene_audio", sounds_dir="sounds"):
+    def __init__(self, audio_dir="scene_audio", sounds_dir="sounds", cache_bytes=DEFAULT_CACHE_BYTES,
+                 audio=None, sound_cache=None):
+        """audio (a ChannelSet) and sound_cache let several sessions share decoded audio (see session.py)"""
         self.audio_dir = audio_dir
         self.sounds_dir = sounds_dir
         self.current_scene_sound = None
+        self.current_sound_end = 0  # time.monotonic() at which the current scene sound finishes
+        self.streaming = False  # True while the current scene plays through the music stream
+        self._durations = {}  # Scene audio path -> duration from its header, or None
+        self.audible_end = None  # time.monotonic() at which a streamed scene's trailing silence starts
         
-        # Initialize multiple mixer channels for different audio types
-        pygame.mixer.pre_init(44100, -16, 2, 2048)
-        try:
-            pygame.mixer.init(channels=4)  # Initialize with 4 channels
-            print("Audio system initialized successfully")
-            
-            # Reserve specific channels
-            self.beep_channel = pygame.mixer.Channel(0)
-            self.scene_channel = pygame.mixer.Channel(1)
-            self.keypad_channel = pygame.mixer.Channel(2)
-            
-        except Exception as e:
-            print(f"Error initializing audio system: {e}")
-            # Fallback initialization
-            try:
-                pygame.mixer.init()
-                print("Fallback audio initialization successful")
-            except Exception as e:
-                print(f"Critical audio initialization error: {e}")
+        # Decoded scene sounds, so revisits and replays skip the MP3 decode
+        # (and the first play maps pre-transcoded PCM when audio_pcm.py has been run),
+        # already trimmed and levelled when audio_analysis.py has been run
+        if sound_cache is None:
+            sound_cache = SoundCache(max_bytes=cache_bytes, decode=self.load_scene_sound)
+        self.sound_cache = sound_cache
+        self.prefetcher = AudioPrefetcher(self.sound_cache, audio_dir)
+        
+        # Callables run with the scene id right after its audio starts (used for instrumentation)
+        self.play_listeners = []
+        
+        # Shared mixer and its reserved channels (see audio_service.CHANNEL_PLAN)
+        self.audio = audio if audio is not None else get_audio_service()
+        self.beep_channel = self.audio.channel("beep")
+        self.scene_channel = self.audio.channel("scene")
+        self.keypad_channel = self.audio.channel("keypad")
         
         # Create directories if they don't exist
         os.makedirs(audio_dir, exist_ok=True)
         os.makedirs(sounds_dir, exist_ok=True)
         
         # Pre-load common sounds
-        self.beep_sound = None
-        try:
-            beep_path = os.path.join(self.sounds_dir, "beep.mp3")
-            if os.path.exists(beep_path):
-                self.beep_sound = pygame.mixer.Sound(beep_path)
-        except Exception as e:
-            print(f"Error loading beep sound: {e}")
+        self.beep_sound = self.audio.load(os.path.join(self.sounds_dir, "beep.mp3"))
     
     def is_playing(self):
         """Check if scene audio is currently playing"""
         try:
-            return self.scene_channel.get_busy()
+            if self.streaming and self.audible_end is not None and time.monotonic() >= self.audible_end:
+                return False  # Only trailing silence is left
+            return self.audio.is_busy("scene")
         except Exception as e:
-            print(f"Error checking if audio is playing: {e}")
+            log.error("Error checking if audio is playing: %s", e)
             return False
         
+    def remaining_time(self):
+        """Seconds until the current scene audio should finish, from its length (0 if nothing is playing)"""
+        if self.current_scene_sound is None:
+            return 0
+        return max(0, self.current_sound_end - time.monotonic())
+        
     def play_key_beep(self, *args, **kwargs):
         """Play a short beep sound before scene audio."""
         if kwargs.get('skip_beep', False):
@@ -56,44 +86,102 @@ class SceneAudio:
             
         try:
             if self.beep_sound and self.beep_channel:
-                # Stop any currently playing beep
-                self.beep_channel.stop()
-                self.beep_channel.play(self.beep_sound)
+                # Cuts off any currently playing beep
+                self.audio.play("beep", self.beep_sound)
                 time.sleep(0.1)  # Shorter delay to feel more responsive
         except Exception as e:
-            print(f"Error playing beep: {e}")
+            log.error("Error playing beep: %s", e)
+        
+    def audio_path(self, scene_id):
+        return os.path.join(self.audio_dir, f"{scene_id}.mp3")
+    
+    def duration(self, path):
+        """Length of a scene audio file in seconds, read from its header (None if unknown)"""
+        if path not in self._durations:
+            self._durations[path] = audio_duration(path)
+        return self._durations[path]
+    
+    def load_scene_sound(self, path):
+        """Decode a scene file, cut to its audible part and set to its analysed gain when indexed"""
+        entry = levels(path)
+        if entry is None:
+            return load_sound(path)
+        return apply_gain(load_sound(path, entry["start"], entry["end"]), entry["gain"])
+    
+    def should_stream(self, path):
+        """True if a scene file is long or big enough to stream rather than decode whole"""
+        return is_stream_sized(path, self.duration)
         
     def play_scene_audio(self, scene_id):
         """Plays audio associated with a scene."""
         try:
             # First stop any currently playing scene audio
-            self.scene_channel.stop()
+            self.audio.stop("scene")
             
             # Special scenes that skip beep
             skip_beep_scenes = ['intro', 'no_numbers_scene']
             
             # Load and play scene audio - removed beep here since keypad already plays it
-            audio_path = os.path.join(self.audio_dir, f"{scene_id}.mp3")
-            if os.path.exists(audio_path):
-                scene_sound = pygame.mixer.Sound(audio_path)
-                self.scene_channel.play(scene_sound)
+            audio_path = self.audio_path(scene_id)
+            started = False
+            if self.should_stream(audio_path) and self.audio.can_stream():
+                # Long narration: start after the first buffer instead of decoding it all
+                stream_path, namehint = stream_source(audio_path)
+                entry = levels(audio_path)
+                if entry is not None:
+                    frequency = self.audio.frequency()
+                    levelled = entry.get("stream")
+                    if levelled and os.path.exists(levelled):
+                        # Trimmed and boosted offline, since a stream's volume can only turn it down
+                        started = self.audio.play_stream("scene", levelled, namehint="wav")
+                    else:
+                        started = self.audio.play_stream(
+                            "scene", stream_path, namehint=namehint or audio_format(audio_path) or "",
+                            start=entry["start"] / frequency, volume=min(entry["gain"], 1.0)
+                        )
+                    length = (entry["end"] - entry["start"]) / frequency
+                    self.audible_end = time.monotonic() + length
+                else:
+                    started = self.audio.play_stream("scene", stream_path, namehint=namehint or audio_format(audio_path) or "")
+                    length = self.duration(audio_path) or 0
+                    self.audible_end = None
+                self.streaming = started
+            else:
+                scene_sound = self.sound_cache.load(scene_id, audio_path)
+                if scene_sound is not None:
+                    started = self.audio.play("scene", scene_sound)
+                    length = scene_sound.get_length()
+                    self.streaming = False
+            if started:
                 self.current_scene_sound = scene_id
-                print(f"Playing audio for scene: {scene_id}")
+                self.current_sound_end = time.monotonic() + length
+                for listener in self.play_listeners:
+                    listener(scene_id)
+                log.debug("Playing audio for scene: %s", scene_id)
             else:
-                print(f"Audio file not found for scene: {scene_id}")
+                log.warning("Audio file not found for scene: %s", scene_id)
                 self.current_scene_sound = None
                 
         except Exception as e:
-            print(f"Error in play_scene_audio: {e}")
+            log.error("Error in play_scene_audio: %s", e)
             self.current_scene_sound = None
             
     def stop_audio(self):
         """Stops all audio playback"""
         try:
-            # Stop all channels
-            self.beep_channel.stop()
-            self.scene_channel.stop()
-            self.keypad_channel.stop()
+            # Stop all channels but the ringer
+            self.audio.stop("beep", "scene", "keypad")
             self.current_scene_sound = None
         except Exception as e:
-            print(f"Error stopping audio: {e}")
\ No newline at end of file
+            log.error("Error stopping audio: %s", e)
+    
+    def prefetch_scenes(self, scene_ids):
+        """Decode audio for the given next scenes in the background, replacing any earlier request"""
+        # Streamed scenes start quickly anyway, and decoding them whole is what streaming avoids
+        self.prefetcher.prefetch(
+            [scene_id for scene_id in scene_ids if not self.should_stream(self.audio_path(scene_id))]
+        )
+    
+    def cache_stats(self):
+        """Hit/miss/eviction counters and memory use of the decoded scene audio cache"""
+        return self.sound_cache.stats()
@@ -0,0 +1,105 @@
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_SCENES = 64  # Parsed scenes kept in memory at once
+
+
+class SceneStore:
+    """Mapping of scene id -> Scene that builds scenes on first access.
+
+    At startup only an index of scene id -> loader is kept. A loader is any
+    callable returning the Scene keyword arguments for that scene (a YAML file
+    reader, a story pack lookup, ...). Built scenes are kept in an LRU cache of
+    at most max_scenes entries, so memory stays flat however large the story
+    tree grows. Scenes added with store[scene_id] = scene are pinned and never
+    evicted.
+    """
+
+    def __init__(self, factory, max_scenes=DEFAULT_MAX_SCENES):
+        self._factory = factory
+        self.max_scenes = max_scenes
+        self._loaders = {}
+        self._pinned = {}
+        self._cache = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def add_source(self, scene_id, loader):
+        """Register where to load scene_id from, dropping any cached copy."""
+        with self._lock:
+            self._loaders[scene_id] = loader
+            self._cache.pop(scene_id, None)
+
+    def replace(self, scene_id, loader, scene):
+        """Atomically point scene_id at a new loader and an already built Scene."""
+        with self._lock:
+            self._loaders[scene_id] = loader
+            if scene_id in self._cache or len(self._cache) < self.max_scenes:
+                self._cache[scene_id] = scene
+                self._cache.move_to_end(scene_id)
+
+    def remove(self, scene_id):
+        """Forget a scene whose source no longer exists."""
+        with self._lock:
+            self._loaders.pop(scene_id, None)
+            self._cache.pop(scene_id, None)
+
+    def __setitem__(self, scene_id, scene):
+        with self._lock:
+            self._pinned[scene_id] = scene
+            self._cache.pop(scene_id, None)
+
+    def get(self, scene_id, default=None):
+        with self._lock:
+            if scene_id in self._pinned:
+                return self._pinned[scene_id]
+            scene = self._cache.get(scene_id)
+            if scene is not None:
+                self._cache.move_to_end(scene_id)
+                self.hits += 1
+                return scene
+            loader = self._loaders.get(scene_id)
+        if loader is None:
+            return default
+
+        # Parse outside the lock so a slow file never blocks other lookups
+        try:
+            scene = self._factory(**loader())
+        except Exception as e:
+            print(f"Error loading scene {scene_id}: {e}")
+            return default
+
+        with self._lock:
+            # Another thread may have swapped the source while we were parsing
+            if self._loaders.get(scene_id) is loader:
+                self.misses += 1
+                self._cache[scene_id] = scene
+                self._cache.move_to_end(scene_id)
+                while len(self._cache) > self.max_scenes:
+                    self._cache.popitem(last=False)
+        return scene
+
+    def __getitem__(self, scene_id):
+        scene = self.get(scene_id)
+        if scene is None:
+            raise KeyError(scene_id)
+        return scene
+
+    def __contains__(self, scene_id):
+        return scene_id in self._pinned or scene_id in self._loaders
+
+    def keys(self):
+        with self._lock:
+            return list(self._loaders) + [k for k in self._pinned if k not in self._loaders]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def cached_ids(self):
+        """Scene ids currently held in memory, least recently used first."""
+        with self._lock:
+            return list(self._cache)
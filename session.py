@@ -0,0 +1,113 @@
+"""Per-handset game state, so one process can serve several payphones.
+
+Shared by every session in the process (loaded or decoded once):
+
+    the parsed scenes (engine.load_scenes), the decoded scene audio cache
+    (SceneAudio.sound_cache), the key sound bank and the mixer itself
+
+Held by each Session:
+
+    keypad          its own keypad.Keypad (input, hook and code entry state)
+    scene_audio     a SceneAudio on its own audio_service.ChannelSet
+    inventory, current_scene, previous_scene and the call's journal id
+
+The real phone's session is default_session(), built on
+keypad.default_keypad and the audio service's first channel set. More are
+made with new_session(), fed by calling session.keypad.press() and
+session.keypad.set_hook(), and served concurrently by
+async_engine.main_async(sessions=...).
+"""
+import threading
+
+import keypad
+import journal
+from audio_service import get_audio_service
+from scene_audio import SceneAudio
+from transitions import Inventory
+
+START_SCENE = "intro"
+
+_sessions = []
+_sessions_lock = threading.Lock()
+_default = None
+
+
+class Session:
+    def __init__(self, name, keypad_state, scene_audio, payphone=None):
+        self.name = name
+        self.keypad = keypad_state
+        self.scene_audio = scene_audio
+        self.payphone = payphone  # Light and audio routing of a physical phone, if this session has one
+        self.call_id = None
+        self.in_call = False
+        self.reset()
+
+    def reset(self):
+        """Fresh game state for a new call."""
+        self.current_scene = START_SCENE
+        self.inventory = Inventory()
+        self.previous_scene = None  # Track previous scene for invalid choices
+        self.chosen_at = None  # When the choice leading to the current scene was made
+
+    def begin_call(self):
+        """Start a call: reset the game, open its journal entry and switch the phone to the handset."""
+        self.reset()
+        self.in_call = True
+        self.call_id = journal.begin_call()
+        self.keypad.call_id = self.call_id
+        if self.payphone is not None:
+            self.payphone.start_adventure()
+
+    def end_call(self):
+        """Stop the call's audio, close its journal entry and switch the phone back to the ringer."""
+        self.scene_audio.prefetcher.cancel()
+        self.scene_audio.stop_audio()
+        journal.end_call(self.call_id)
+        self.keypad.call_id = None
+        self.call_id = None
+        self.in_call = False
+        if self.payphone is not None:
+            self.payphone.stop_adventure()
+
+    def record(self, kind, **fields):
+        """Journal an event of this session's call."""
+        journal.record(kind, call=self.call_id, **fields)
+
+
+def _register(session):
+    with _sessions_lock:
+        _sessions.append(session)
+    return session
+
+
+def default_session(scene_audio=None, payphone=None):
+    """The session of the handset wired to this machine (created on first use)."""
+    global _default
+    if _default is None:
+        if scene_audio is None:
+            scene_audio = SceneAudio()
+        _default = _register(Session("main", keypad.default_keypad, scene_audio, payphone))
+    return _default
+
+
+def new_session(name, shared_audio, audio=None):
+    """A session on its own keypad and channels that shares shared_audio's decoded scene cache.
+
+    audio is the ChannelSet to play on; by default a new one is reserved in the audio service.
+    """
+    if audio is None:
+        audio = get_audio_service().new_channel_set()
+    scene_audio = SceneAudio(
+        shared_audio.audio_dir, shared_audio.sounds_dir, audio=audio, sound_cache=shared_audio.sound_cache
+    )
+    return _register(Session(name, keypad.Keypad(name, audio), scene_audio))
+
+
+def sessions():
+    with _sessions_lock:
+        return list(_sessions)
+
+
+def all_idle():
+    """True if no session has a call in progress (so the story may be swapped)."""
+    return not any(session.in_call for session in sessions())
@@ -0,0 +1,353 @@
+"""Headless load test: many simulated callers through the real engine on a virtual clock.
+
+Each caller is a session (see session.py) with a silent Keypad and null
+scene audio, played through async_engine.play_call, so choices, codes,
+item checks and Scene.get_next_scene all run exactly as on the phone.
+The event loop keeps virtual time: whenever nothing is ready it jumps
+straight to the next timer instead of sleeping, so scene timeouts, the
+error-message pauses, audio waits and the callers' own listening and
+thinking all take no real time. Only the engine's CPU work is measured.
+
+    python simulator.py --callers 2000 --concurrency 100 --seed 1
+    python simulator.py --script "0 2 *451#" --callers 10
+    python simulator.py --callers 5000 --min-rate 20000   # exit 1 below 20000 transitions/s
+
+Random callers listen to part of each scene, think, then press one of the
+scene's options, sometimes a hidden code, 0, # or a wrong key, and hang
+up at random, after MAX_STEPS, or at a scene with no options. Scripted
+callers press the given keys in order (a token like *451# is typed key by
+key) and then hang up.
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import random
+import statistics
+import sys
+import time
+
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PAYPHONE_AUDIO_ROUTER", "null")
+os.environ.setdefault("PAYPHONE_GPIO", "none")
+os.environ.setdefault("PAYPHONE_RING_WINDOWS", "")  # The phone itself stays quiet
+
+import keypad  # noqa: E402
+import engine  # noqa: E402
+import metrics  # noqa: E402
+import phone_log  # noqa: E402
+from async_engine import PhoneEvents, HungUp, play_call  # noqa: E402
+from audio_info import audio_duration  # noqa: E402
+from session import Session  # noqa: E402
+
+MAX_STEPS = 40  # Choices before a random caller gives up
+HANGUP_CHANCE = 0.04  # Chance of hanging up after any choice
+THINK_MEAN = 3.0  # Mean seconds a caller thinks before pressing
+KEY_GAP = 0.4  # Seconds between the keys of a code (more than keypad.KEYPRESS_DELAY)
+DEFAULT_AUDIO_SECONDS = 10.0  # Assumed length of scenes without readable audio
+
+
+class VirtualSelector:
+    """Wraps the loop's selector: a wait with nothing ready advances the virtual clock instead."""
+
+    def __init__(self, selector, loop):
+        self._selector = selector
+        self._loop = loop
+
+    def select(self, timeout=None):
+        ready = self._selector.select(0)
+        if ready or timeout == 0:
+            return ready
+        if timeout is None:
+            return self._selector.select(None)  # Only real I/O (another thread) can wake us
+        self._loop.advance(timeout)
+        return []
+
+    def __getattr__(self, name):
+        return getattr(self._selector, name)
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    """Event loop whose time() is virtual seconds, moved on by VirtualSelector."""
+
+    def __init__(self):
+        super().__init__()
+        self._now = 0.0
+        self._selector = VirtualSelector(self._selector, self)
+
+    def time(self):
+        return self._now
+
+    def advance(self, seconds):
+        self._now += seconds
+
+
+class _NullPrefetcher:
+    def cancel(self):
+        pass
+
+
+class NullSceneAudio:
+    """Stands in for SceneAudio: plays nothing, but scenes last as long as their audio would."""
+
+    def __init__(self, clock, durations, audio_dir="scene_audio"):
+        self.clock = clock
+        self.durations = durations  # Shared: scene id -> seconds
+        self.audio_dir = audio_dir
+        self.prefetcher = _NullPrefetcher()
+        self.play_listeners = []
+        self.current_scene_sound = None
+        self.current_sound_end = 0
+        self.plays = 0
+
+    def duration(self, scene_id):
+        seconds = self.durations.get(scene_id)
+        if seconds is None:
+            seconds = audio_duration(os.path.join(self.audio_dir, f"{scene_id}.mp3")) or DEFAULT_AUDIO_SECONDS
+            self.durations[scene_id] = seconds
+        return seconds
+
+    def play_scene_audio(self, scene_id):
+        self.plays += 1
+        self.current_scene_sound = scene_id
+        self.current_sound_end = self.clock() + self.duration(scene_id)
+        for listener in self.play_listeners:
+            listener(scene_id)
+
+    def is_playing(self):
+        return self.current_scene_sound is not None and self.clock() < self.current_sound_end
+
+    def remaining_time(self):
+        if self.current_scene_sound is None:
+            return 0
+        return max(0, self.current_sound_end - self.clock())
+
+    def stop_audio(self):
+        self.current_scene_sound = None
+
+    def prefetch_scenes(self, scene_ids):
+        pass
+
+    def play_key_beep(self, *args, **kwargs):
+        pass
+
+
+class StepStats:
+    """Real (perf_counter) seconds spent per kind of engine step."""
+
+    def __init__(self):
+        self.samples = {}
+
+    def add(self, name, seconds):
+        self.samples.setdefault(name, []).append(seconds)
+
+    def summary(self):
+        rows = []
+        for name, values in self.samples.items():
+            ordered = sorted(values)
+            pick = lambda fraction: ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]  # noqa: E731
+            rows.append((name, len(values), statistics.median(ordered), pick(0.95), pick(0.99), ordered[-1]))
+        return rows
+
+
+class TimedScene:
+    """A scene whose get_next_scene is timed into StepStats."""
+
+    def __init__(self, scene, stats):
+        self._scene = scene
+        self._stats = stats
+
+    def get_next_scene(self, choice, inventory):
+        started = time.perf_counter()
+        try:
+            return self._scene.get_next_scene(choice, inventory)
+        finally:
+            self._stats.add("get_next_scene", time.perf_counter() - started)
+
+    def __getattr__(self, name):
+        return getattr(self._scene, name)
+
+
+class TimedScenes:
+    """The scene store as play_call sees it, with lookups timed."""
+
+    def __init__(self, scenes, stats):
+        self._scenes = scenes
+        self._stats = stats
+
+    def get(self, scene_id, default=None):
+        started = time.perf_counter()
+        scene = self._scenes.get(scene_id, default)
+        self._stats.add("scene_lookup", time.perf_counter() - started)
+        return TimedScene(scene, self._stats) if scene is not None else scene
+
+
+class SimEvents(PhoneEvents):
+    """PhoneEvents that times the engine's work between one input event and its next wait."""
+
+    def __init__(self, loop, keys, stats):
+        super().__init__(loop, keys)
+        self.stats = stats
+        self._step_started = None
+
+    async def _next_event(self, deadline=None):
+        if self._step_started is not None:
+            self.stats.add("step", time.perf_counter() - self._step_started)
+            self._step_started = None
+        event = await super()._next_event(deadline)
+        self._step_started = time.perf_counter()
+        return event
+
+
+def random_keys(scene, rng):
+    """What a random caller types in scene: a list of keys."""
+    codes = [str(key).replace("+", "") for key in scene.hidden_connections]
+    codes = [code for code in codes if len(code) > 1 and code.isdigit()]
+    roll = rng.random()
+    if codes and roll < 0.1:
+        return ["*"] + list(rng.choice(codes)) + ["#"]
+    if roll < 0.15:
+        return [rng.choice(["0", "#", "9", "*"])]
+    if scene.connections:
+        return [str(rng.choice(list(scene.connections)))]
+    return [rng.choice("0123456789")]
+
+
+class Simulator:
+    def __init__(self, scenes, seed=None, script=None, max_steps=MAX_STEPS):
+        self.scenes = scenes
+        self.rng = random.Random(seed)
+        self.script = script
+        self.max_steps = max_steps
+        self.stats = StepStats()
+        self.timed_scenes = TimedScenes(scenes, self.stats)
+        self.durations = {}
+        self.completed = 0
+        self.errors = 0
+        self.keys_pressed = 0
+
+    async def _press(self, loop, session, keys):
+        for key in keys:
+            if not session.keypad.is_phone_lifted():
+                return
+            session.keypad.press(key, loop.time())
+            self.keys_pressed += 1
+            await asyncio.sleep(KEY_GAP)
+
+    async def caller(self, loop, number):
+        rng = random.Random(self.rng.random())
+        keys_state = keypad.Keypad(f"caller{number}", silent=True)
+        session = Session(f"caller{number}", keys_state, NullSceneAudio(loop.time, self.durations))
+        events = SimEvents(loop, keys_state, self.stats)
+        try:
+            keys_state.set_hook(True)
+            await events.wait_for_lift()
+            session.begin_call()
+            engine_task = asyncio.ensure_future(play_call(events, session, self.timed_scenes))
+
+            steps = self.script if self.script is not None else [None] * self.max_steps
+            for token in steps:
+                # Listen to part of the scene, then think
+                await asyncio.sleep(session.scene_audio.remaining_time() * rng.random() + rng.expovariate(1 / THINK_MEAN))
+                if engine_task.done():
+                    break
+                if token is not None:
+                    keys = list(token)
+                else:
+                    scene = self.scenes.get(session.current_scene)
+                    if scene is None or (not scene.connections and not scene.hidden_connections):
+                        break  # An ending
+                    keys = random_keys(scene, rng)
+                await self._press(loop, session, keys)
+                if token is None and rng.random() < HANGUP_CHANCE:
+                    break
+
+            keys_state.set_hook(False)
+            try:
+                await engine_task
+            except HungUp:
+                pass
+            self.completed += 1
+        except Exception as e:
+            self.errors += 1
+            print(f"Caller {number} failed: {e!r}", file=sys.stderr)
+        finally:
+            session.end_call()
+            events.close()
+
+    async def run(self, callers, concurrency):
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(concurrency)
+
+        async def one(number):
+            async with slots:
+                await self.caller(loop, number)
+
+        await asyncio.gather(*(one(number) for number in range(callers)))
+        return loop.time()
+
+
+def simulate(callers=1000, concurrency=50, seed=None, script=None, max_steps=MAX_STEPS, verbose=False):
+    """Run the callers and return a dict of results (rates are per real second)."""
+    scenes = engine.load_scenes()
+    simulator = Simulator(scenes, seed, script, max_steps)
+    transitions_before = metrics.TRANSITIONS.value
+
+    loop = VirtualTimeLoop()
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    if not verbose:
+        phone_log.set_level(console="warning")
+    started = time.perf_counter()
+    try:
+        with output:
+            virtual_seconds = loop.run_until_complete(simulator.run(callers, concurrency))
+    finally:
+        loop.close()
+    wall = time.perf_counter() - started
+
+    transitions = metrics.TRANSITIONS.value - transitions_before
+    return {
+        "callers": callers,
+        "completed": simulator.completed,
+        "errors": simulator.errors,
+        "transitions": transitions,
+        "keys": simulator.keys_pressed,
+        "wall_seconds": wall,
+        "virtual_seconds": virtual_seconds,
+        "transitions_per_second": transitions / wall if wall else 0,
+        "calls_per_second": simulator.completed / wall if wall else 0,
+        "steps": simulator.stats.summary(),
+    }
+
+
+def report(results):
+    print(f"Callers: {results['completed']}/{results['callers']} completed, {results['errors']} errors")
+    print(f"Transitions: {results['transitions']}, keys pressed: {results['keys']}")
+    print(f"Wall time: {results['wall_seconds']:.2f} s -> {results['transitions_per_second']:.0f} transitions/s, "
+          f"{results['calls_per_second']:.0f} calls/s")
+    speedup = results["virtual_seconds"] / results["wall_seconds"] if results["wall_seconds"] else 0
+    print(f"Virtual time simulated: {results['virtual_seconds'] / 3600:.1f} h ({speedup:.0f}x real time)")
+    print("\nPer step (real time, microseconds):")
+    print(f"  {'step':<16}{'n':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>10}")
+    for name, count, p50, p95, p99, worst in results["steps"]:
+        print(f"  {name:<16}{count:>9}{p50 * 1e6:>9.1f}{p95 * 1e6:>9.1f}{p99 * 1e6:>9.1f}{worst * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--callers", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50, help="callers in a call at the same time")
+    parser.add_argument("--seed", type=int, help="random seed, for repeatable runs")
+    parser.add_argument("--script", help="space separated keys/codes every caller presses, e.g. \"0 2 *451#\"")
+    parser.add_argument("--max-steps", type=int, default=MAX_STEPS)
+    parser.add_argument("--min-rate", type=float, help="exit 1 if fewer transitions per second than this")
+    parser.add_argument("--verbose", action="store_true", help="show the engine's own output")
+    args = parser.parse_args()
+
+    results = simulate(
+        args.callers, args.concurrency, args.seed,
+        args.script.split() if args.script else None, args.max_steps, args.verbose
+    )
+    report(results)
+    if results["errors"] or (args.min_rate and results["transitions_per_second"] < args.min_rate):
+        sys.exit(1)
@@ -0,0 +1,97 @@
+import os
+import threading
+from collections import OrderedDict
+
+import pygame
+
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024  # Decoded audio kept in memory at once
+
+
+def sound_size(sound):
+    """Approximate number of bytes a decoded Sound holds, from its length and the mixer format."""
+    mixer_format = pygame.mixer.get_init()
+    if not mixer_format:
+        return 0
+    frequency, size, channels = mixer_format
+    return int(sound.get_length() * frequency * channels * (abs(size) // 8))
+
+
+class SoundCache:
+    """LRU cache of decoded pygame Sounds with a total byte budget.
+
+    Keys are whatever the caller uses to name a sound (scene ids for scene
+    audio). Least recently played sounds are evicted once the budget is
+    exceeded. A sound larger than the whole budget is returned but not kept.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES, decode=None):
+        self.max_bytes = max_bytes
+        self.decode = decode if decode else pygame.mixer.Sound
+        self._sounds = OrderedDict()  # key -> (Sound, size in bytes)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the cached Sound for key, or None."""
+        with self._lock:
+            entry = self._sounds.get(key)
+            if entry is None:
+                return None
+            self._sounds.move_to_end(key)
+            return entry[0]
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._sounds
+
+    def put(self, key, sound):
+        size = sound_size(sound)
+        with self._lock:
+            old = self._sounds.pop(key, None)
+            if old:
+                self.current_bytes -= old[1]
+            if size > self.max_bytes:
+                return sound
+            self._sounds[key] = (sound, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                evicted_key, (evicted, evicted_size) = self._sounds.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+        return sound
+
+    def load(self, key, path):
+        """Return the Sound for key, decoding path on a cache miss. Returns None if path does not exist."""
+        sound = self.get(key)
+        if sound is not None:
+            self.hits += 1
+            return sound
+        if not os.path.exists(path):
+            return None
+        self.misses += 1
+        return self.put(key, self.decode(path))
+
+    def discard(self, key):
+        with self._lock:
+            entry = self._sounds.pop(key, None)
+            if entry:
+                self.current_bytes -= entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._sounds.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._sounds),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
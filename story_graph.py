@@ -0,0 +1,309 @@
+"""Story graph compiler and validator.
+
+Builds the whole scene graph once from the story data: the successors and
+predecessors of every scene, the scenes reachable from the start, and for
+each book (a numbered choice of the hub) the scenes reachable inside it
+without going back through the start, the hub or another book.
+
+check() reports problems that would otherwise only show up mid-call as
+"Scene not found! Resetting" and a bounce back to the hub:
+
+    dangling targets    a choice pointing at a scene id that does not exist
+    unreachable scenes  scenes nothing leads to from the start scene
+    missing audio       scenes without scene_audio/<id>.mp3
+
+A dangling target in a reachable scene is always an error. Everything
+else is a warning unless strict, so old demo scenes do not stop the phone.
+
+    python story_graph.py [--strict] [--output story.graph]
+
+writes the index as a marshal file, with the results of the structural
+checks in both modes (audio files come and go on their own, so they are
+checked again whenever the index is read), and exits non-zero on errors (story_pack.py writes it too). At startup
+load_story_graph() reads that index whenever it is newer than the story
+tree instead of parsing every scene, and after a hot reload
+StoryGraph.update() re-links just the changed scenes before check() runs
+again.
+"""
+import marshal
+import os
+
+from story_loader import STORY_DIR, load_story_tree, newest_source_mtime
+
+START_SCENE = "intro"
+HUB_SCENE = "hub"
+AUDIO_DIR = "scene_audio"
+GRAPH_PATH = "story.graph"
+
+# Scenes the engine adds itself, and the transitions that can lead to them
+# (see the "scene2" special case in transitions.CompiledTransitions)
+BUILTIN_SCENES = ("no_numbers_scene",)
+IMPLICIT_EDGES = {"scene2": ("no_numbers_scene",)}
+
+
+class StoryError(Exception):
+    """Raised when the story has errors that would break a call."""
+
+
+def scene_targets(scene_id, connections, hidden_connections):
+    """
+    Return the ids of every scene a scene can lead to, most likely first:
+    timeout targets (taken without any input), then numbered choices, then hidden codes.
+    """
+    ordered = []
+
+    def add(target):
+        if isinstance(target, dict):
+            for value in target.values():
+                add(value)
+        elif isinstance(target, str) and target != scene_id and target not in ordered:
+            ordered.append(target)
+
+    if "timeout" in hidden_connections:
+        add(hidden_connections["timeout"])
+    for connection_data in connections.values():
+        for target in connection_data[1:]:
+            if not isinstance(target, list):
+                add(target)
+    for key, target in hidden_connections.items():
+        add(target)
+    return ordered
+
+
+def _reachable(successors, start, stop=()):
+    """Return the set of scenes reachable from start, not walking past scenes in stop."""
+    seen = set()
+    stack = [start]
+    while stack:
+        scene_id = stack.pop()
+        if scene_id in seen or scene_id not in successors:
+            continue
+        seen.add(scene_id)
+        if scene_id in stop and scene_id != start:
+            continue
+        stack.extend(successors[scene_id])
+    return seen
+
+
+def _successors(scene_id, data):
+    """Targets of one scene's data, with the scenes the engine can add on the way."""
+    targets = scene_targets(scene_id, data.get("connections") or {}, data.get("hidden_connections") or {})
+    for target in list(targets):
+        for implicit in IMPLICIT_EDGES.get(target, ()):
+            if implicit not in targets:
+                targets.append(implicit)
+    return targets
+
+
+def _book_entries(hub_data):
+    """The scenes the hub's numbered choices lead to, in choice order."""
+    entries = []
+    for connection_data in (hub_data.get("connections") or {}).values():
+        target = connection_data[1] if len(connection_data) >= 2 else None
+        if isinstance(target, str) and target not in entries:
+            entries.append(target)
+    return entries
+
+
+class StoryGraph:
+    def __init__(self, scenes, start=START_SCENE, hub=HUB_SCENE, builtin_scenes=BUILTIN_SCENES):
+        """scenes maps scene id -> Scene keyword arguments (connections, hidden_connections, ...)."""
+        self.start = start
+        self.hub = hub
+        self.successors = {scene_id: _successors(scene_id, data) for scene_id, data in scenes.items()}
+        for scene_id in builtin_scenes:
+            self.successors.setdefault(scene_id, [])
+        self.entries = _book_entries(scenes.get(hub) or {})
+        self.relink()
+
+    @classmethod
+    def from_index(cls, index):
+        """Rebuild a graph from the plain data written by compile_graph(), without the story files."""
+        graph = cls.__new__(cls)
+        graph.start = index["start"]
+        graph.hub = index["hub"]
+        graph.successors = index["successors"]
+        graph.entries = list(index["books"])
+        graph.relink()
+        return graph
+
+    def update(self, scene_id, data):
+        """Replace one scene's data (None: the scene was removed). Call relink() after a batch of updates."""
+        if data is None:
+            self.successors.pop(scene_id, None)
+        else:
+            self.successors[scene_id] = _successors(scene_id, data)
+        if scene_id == self.hub:
+            self.entries = _book_entries(data or {})
+
+    def relink(self):
+        """Derive predecessors, dangling targets, reachability and books from the successors."""
+        self.predecessors = {scene_id: [] for scene_id in self.successors}
+        self.dangling = []  # (scene_id, missing target)
+        for scene_id, targets in self.successors.items():
+            for target in targets:
+                if target in self.predecessors:
+                    self.predecessors[target].append(scene_id)
+                else:
+                    self.dangling.append((scene_id, target))
+
+        self.reachable = _reachable(self.successors, self.start)
+
+        # Book entry scene -> every scene reachable inside that book
+        # (the walk stops at the start, the hub and the other books' entry scenes)
+        entries = [entry for entry in self.entries if entry in self.successors]
+        stop = {self.start, self.hub, *entries}
+        self.books = {}
+        for book in entries:
+            self.books[book] = frozenset((_reachable(self.successors, book, stop=stop) - stop) | {book})
+
+    def books_containing(self, scene_id):
+        """Return the books whose reachable set contains scene_id."""
+        return [book for book, members in self.books.items() if scene_id in members]
+
+    def check(self, audio_dir=AUDIO_DIR, strict=False):
+        """Return (errors, warnings) as lists of messages."""
+        errors = []
+        warnings = []
+        for scene_id, target in self.dangling:
+            message = f"Scene '{scene_id}' leads to missing scene '{target}'"
+            if scene_id in self.reachable or strict:
+                errors.append(message)
+            else:
+                warnings.append(message + " (scene is unreachable)")
+
+        if self.start not in self.successors:
+            errors.append(f"Start scene '{self.start}' does not exist")
+
+        for scene_id in sorted(set(self.successors) - self.reachable):
+            (errors if strict else warnings).append(f"Scene '{scene_id}' is unreachable from '{self.start}'")
+
+        if audio_dir is not None:
+            audio_errors, audio_warnings = self.check_audio(audio_dir, strict)
+            errors += audio_errors
+            warnings += audio_warnings
+        return errors, warnings
+
+    def check_audio(self, audio_dir=AUDIO_DIR, strict=False):
+        """Return (errors, warnings) for scenes without an audio file."""
+        missing = [
+            f"Scene '{scene_id}' has no audio file" for scene_id in sorted(self.successors)
+            if not os.path.exists(os.path.join(audio_dir, f"{scene_id}.mp3"))
+        ]
+        return (missing, []) if strict else ([], missing)
+
+    def to_index(self):
+        """Plain data form of the graph, as written by compile_graph()."""
+        return {
+            "start": self.start,
+            "hub": self.hub,
+            "successors": self.successors,
+            "predecessors": self.predecessors,
+            "reachable": sorted(self.reachable),
+            "books": {book: sorted(members) for book, members in self.books.items()},
+        }
+
+
+def build_graph(story_dir=STORY_DIR, scenes=None):
+    """Build the StoryGraph for a story tree, or for already loaded scene data."""
+    if scenes is None:
+        scenes, sources = load_story_tree(story_dir)
+    return StoryGraph(scenes)
+
+
+def report(graph, errors, warnings):
+    """Print a check's results. Raises StoryError on errors, else returns graph."""
+    for message in warnings:
+        print(f"Story warning: {message}")
+    for message in errors:
+        print(f"Story error: {message}")
+    if errors:
+        raise StoryError(f"{len(errors)} error(s) in the story")
+    print(f"Story graph OK: {len(graph.successors)} scenes, {len(graph.reachable)} reachable, "
+          f"{len(graph.books)} books")
+    return graph
+
+
+def validate_story(story_dir=STORY_DIR, audio_dir=AUDIO_DIR, strict=False, scenes=None):
+    """Build and check the story graph. Prints warnings, raises StoryError on errors."""
+    graph = build_graph(story_dir, scenes)
+    errors, warnings = graph.check(audio_dir, strict)
+    return report(graph, errors, warnings)
+
+
+def compile_graph(story_dir=STORY_DIR, graph_path=GRAPH_PATH, audio_dir=AUDIO_DIR, strict=False, scenes=None):
+    """Check the story and write its graph index, with both structural checks' results, to graph_path.
+
+    The index is written even when the story has errors, so the runtime reports them
+    without parsing the story again. Raises StoryError on errors.
+    """
+    graph = build_graph(story_dir, scenes)
+    index = graph.to_index()
+    index["checks"] = {
+        "lenient": graph.check(None, strict=False),
+        "strict": graph.check(None, strict=True),
+    }
+    tmp_path = graph_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        marshal.dump(index, f)
+    os.replace(tmp_path, graph_path)
+    print(f"Wrote story graph index to {graph_path}")
+    return _report_indexed(graph, index["checks"]["strict" if strict else "lenient"], audio_dir, strict)
+
+
+def _report_indexed(graph, checks, audio_dir, strict):
+    """Report the (errors, warnings) stored in the index plus a fresh check of the audio files."""
+    errors, warnings = checks
+    audio_errors, audio_warnings = graph.check_audio(audio_dir, strict)
+    return report(graph, errors + audio_errors, warnings + audio_warnings)
+
+
+def load_graph_index(graph_path=GRAPH_PATH):
+    """Read an index written by compile_graph()."""
+    with open(graph_path, "rb") as f:
+        return marshal.load(f)
+
+
+def graph_is_fresh(story_dir=STORY_DIR, graph_path=GRAPH_PATH):
+    """Return True if the graph index exists and is newer than every file in the story tree."""
+    try:
+        graph_mtime = os.stat(graph_path).st_mtime
+    except OSError:
+        return False
+    if not os.path.exists(story_dir):
+        return True
+    return graph_mtime >= newest_source_mtime(story_dir)
+
+
+def load_story_graph(story_dir=STORY_DIR, graph_path=GRAPH_PATH, audio_dir=AUDIO_DIR, strict=False):
+    """The checked story graph: from the index when it is fresh, else compiled (and written) now.
+
+    Prints warnings and raises StoryError on errors, like validate_story().
+    """
+    if graph_is_fresh(story_dir, graph_path):
+        try:
+            index = load_graph_index(graph_path)
+            graph = StoryGraph.from_index(index)
+            checks = index["checks"]["strict" if strict else "lenient"]
+        except (OSError, ValueError, EOFError, KeyError, TypeError) as e:
+            print(f"Error reading {graph_path}, compiling the story graph instead: {e}")
+        else:
+            return _report_indexed(graph, checks, audio_dir, strict)
+    return compile_graph(story_dir, graph_path, audio_dir, strict)
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Check the story graph and write its index")
+    parser.add_argument("--story-dir", default=STORY_DIR)
+    parser.add_argument("--audio-dir", default=AUDIO_DIR)
+    parser.add_argument("--output", default=GRAPH_PATH)
+    parser.add_argument("--strict", action="store_true", help="treat unreachable scenes and missing audio as errors")
+    args = parser.parse_args()
+    try:
+        compile_graph(args.story_dir, args.output, args.audio_dir, args.strict)
+    except StoryError as e:
+        print(e)
+        sys.exit(1)
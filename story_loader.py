@@ -0,0 +1,263 @@
+"""Reading scene definitions out of the story directory.
+
+Every supported file format registers a loader here, and each loader
+produces the keyword arguments for the engine's Scene, so the rest of the
+code never cares which format a scene came from. Built in are:
+
+    .yaml   one scene per file (the engine's format), or a monolithic
+            story.yaml style document with a top-level 'scenes:' map
+    .txt    YAML front matter between '---' lines followed by the scene
+            text, as used by fileloader.py
+
+Files are parsed concurrently by load_files(), using the libyaml based
+loader when PyYAML was built with it.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import yaml
+
+STORY_DIR = "story"
+
+# Use the C implementation of the YAML parser when it is available
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+DEFAULT_WORKERS = min(8, (os.cpu_count() or 1) * 2)
+
+# Registered loaders: (file suffix, read(path) -> [scene data], scan(path) -> [scene ids] or None)
+_LOADERS = []
+
+
+def register_loader(suffix, read, scan=None):
+    """Register a loader for files ending in suffix.
+
+    read(path) must return a list of Scene keyword argument dicts.
+    scan(path), if given, returns the ids of the scenes in the file without
+    fully parsing it (or None if it cannot tell), so they can be loaded lazily.
+    Loaders registered later take precedence over earlier ones.
+    """
+    _LOADERS.insert(0, (suffix, read, scan))
+
+
+def find_loader(filepath):
+    for suffix, read, scan in _LOADERS:
+        if filepath.endswith(suffix):
+            return read, scan
+    return None
+
+
+def format_connections(connections):
+    """Transform the connections block of a scene file into the engine's structured format."""
+    formatted_connections = {}
+
+    # Handle different connection formats
+    if isinstance(connections, dict):
+        for key, value in connections.items():
+            key_int = int(key)
+
+            # If the value is a string, it's just a scene ID
+            if isinstance(value, str):
+                formatted_connections[key_int] = [f"Go to {value}", value, []]
+
+            # If it's a list, it might be standard format or contain a dict for branching
+            elif isinstance(value, list):
+                if len(value) >= 2 and isinstance(value[1], dict):
+                    # This is the advanced branching format
+                    formatted_connections[key_int] = value
+                else:
+                    # This is the standard format
+                    option_text = value[0]
+                    target_scene = value[1]
+                    required_items = value[2] if len(value) > 2 else []
+                    alt_scene = value[3] if len(value) > 3 else None
+                    formatted_connections[key_int] = [option_text, target_scene, required_items, alt_scene]
+
+            # If it's a dict directly, it's the branching format
+            elif isinstance(value, dict) and "text" in value and "paths" in value:
+                formatted_connections[key_int] = [value["text"], value["paths"]]
+
+    elif isinstance(connections, list):
+        # Simple list format [scene1, scene2, ...]
+        for i, scene_id in enumerate(connections, 1):
+            formatted_connections[i] = [f"Go to {scene_id}", scene_id, []]
+
+    return formatted_connections
+
+
+def scene_data_from_yaml(data):
+    """Build the keyword arguments for the engine's Scene from a parsed YAML document."""
+    return {
+        "id": data["id"],
+        "text": data["text"],
+        "connections": format_connections(data["connections"]),
+        "hidden_connections": data.get("hidden_connections", {}),
+        "items_granted": data.get("items_granted", []),
+        "items_required": data.get("items_required", []),
+        "timeout_after_audio": data.get("timeout_after_audio", False),
+        "timeout_seconds": data.get("timeout_seconds", 3),
+    }
+
+
+def read_yaml_file(filepath):
+    """Parse a scene YAML file: either a single scene, or a 'scenes:' map of them."""
+    with open(filepath, "r") as file:
+        data = yaml.load(file, Loader=YAML_LOADER)
+
+    if "id" not in data and isinstance(data.get("scenes"), dict):
+        scenes = []
+        for scene_id, scene in data["scenes"].items():
+            scene = dict(scene)
+            scene.setdefault("id", scene_id)
+            scene.setdefault("connections", {})
+            scenes.append(scene_data_from_yaml(scene))
+        return scenes
+    return [scene_data_from_yaml(data)]
+
+
+def scan_scene_id(filepath):
+    """Read just the top-level 'id:' line of a scene file instead of parsing the whole document."""
+    with open(filepath, "r") as file:
+        for line in file:
+            if line.startswith("id:"):
+                value = line[3:].split(" #", 1)[0].strip()
+                return yaml.safe_load(value)
+    return None
+
+
+def scan_yaml_file(filepath):
+    scene_id = scan_scene_id(filepath)
+    return [scene_id] if scene_id is not None else None
+
+
+def split_front_matter(text):
+    """Split a front matter file into (metadata dict, body text)."""
+    parts = text.split("---", 2)
+    if len(parts) < 3:
+        raise ValueError("File format error, expected YAML front matter.")
+    return yaml.load(parts[1], Loader=YAML_LOADER) or {}, parts[2].strip()
+
+
+def scene_data_from_front_matter(metadata, content):
+    """Build the keyword arguments for the engine's Scene from a front matter scene.
+
+    Front matter connections are a list of {label, target, condition} dicts,
+    where condition is an item (or list of items) needed to take that path.
+    Items required to enter or granted by the scene go under 'conditions'.
+    Any key the engine's YAML format understands may also be used directly.
+    """
+    conditions = metadata.get("conditions") or {}
+    connections = metadata.get("connections", [])
+    if isinstance(connections, list) and all(isinstance(c, dict) for c in connections):
+        numbered = {}
+        for i, connection in enumerate(connections, 1):
+            condition = connection.get("condition") or []
+            if isinstance(condition, str):
+                condition = [condition]
+            target = connection.get("target")
+            numbered[i] = [connection.get("label", f"Go to {target}"), target, condition]
+        connections = numbered
+
+    return scene_data_from_yaml({
+        "id": metadata.get("id"),
+        "text": content or metadata.get("title", ""),
+        "connections": connections,
+        "hidden_connections": metadata.get("hidden_connections", {}),
+        "items_granted": metadata.get("items_granted", conditions.get("items_granted", [])),
+        "items_required": metadata.get("items_required", conditions.get("items_required", [])),
+        "timeout_after_audio": metadata.get("timeout_after_audio", False),
+        "timeout_seconds": metadata.get("timeout_seconds", 3),
+    })
+
+
+def read_front_matter_file(filepath):
+    with open(filepath, "r", encoding="utf-8") as f:
+        metadata, content = split_front_matter(f.read())
+    return [scene_data_from_front_matter(metadata, content)]
+
+
+register_loader(".txt", read_front_matter_file)
+register_loader(".yaml", read_yaml_file, scan_yaml_file)
+register_loader(".yml", read_yaml_file, scan_yaml_file)
+
+
+def read_file(filepath):
+    """Parse any supported story file and return the Scene keyword arguments of every scene in it."""
+    loader = find_loader(filepath)
+    if not loader:
+        raise ValueError(f"No story loader registered for {filepath}")
+    return loader[0](filepath)
+
+
+def read_scene(filepath, scene_id):
+    """Parse a story file and return the Scene keyword arguments for one of its scenes."""
+    for data in read_file(filepath):
+        if data["id"] == scene_id:
+            return data
+    raise KeyError(f"Scene {scene_id} not found in {filepath}")
+
+
+def scan_file(filepath):
+    """Return the scene ids in a story file without parsing it, or None if that is not possible."""
+    loader = find_loader(filepath)
+    if not loader or not loader[1]:
+        return None
+    return loader[1](filepath)
+
+
+def iter_scene_files(story_dir=STORY_DIR):
+    """Yield the path of every story file under the story directory that has a registered loader."""
+    for root, dirs, files in os.walk(story_dir):
+        for file in files:
+            filepath = os.path.join(root, file)
+            if find_loader(filepath):
+                yield filepath
+
+
+def load_files(filepaths, workers=DEFAULT_WORKERS):
+    """Parse story files concurrently.
+
+    Returns ({scene_id: Scene keyword arguments}, {scene_id: path it came from}).
+    Files that fail to parse are reported and skipped.
+    """
+    def load(filepath):
+        try:
+            return filepath, read_file(filepath)
+        except Exception as e:
+            print(f"Error loading {filepath}: {e}")
+            return filepath, []
+
+    scenes = {}
+    sources = {}
+    filepaths = list(filepaths)
+    if workers > 1 and len(filepaths) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(load, filepaths))
+    else:
+        results = [load(filepath) for filepath in filepaths]
+
+    # Merge in walk order so duplicate ids resolve the same way every time
+    for filepath, file_scenes in results:
+        for data in file_scenes:
+            scenes[data["id"]] = data
+            sources[data["id"]] = filepath
+    return scenes, sources
+
+
+def load_story_tree(story_dir=STORY_DIR, workers=DEFAULT_WORKERS):
+    """Parse every story file under story_dir in one concurrent pass."""
+    return load_files(iter_scene_files(story_dir), workers)
+
+
+def newest_source_mtime(story_dir=STORY_DIR):
+    """Return the newest modification time of any file or directory in the story tree.
+
+    Directory mtimes are included so that added, removed or renamed scene
+    files also count as a change.
+    """
+    newest = os.stat(story_dir).st_mtime
+    for root, dirs, files in os.walk(story_dir):
+        for name in dirs + files:
+            mtime = os.stat(os.path.join(root, name)).st_mtime
+            if mtime > newest:
+                newest = mtime
+    return newest
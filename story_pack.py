@@ -0,0 +1,202 @@
+"""Compiled story pack.
+
+Turns the story tree into one binary file that the engine can
+memory-map at startup instead of parsing every scene file on boot.
+
+Layout (all integers little-endian):
+
+    header      magic, version, string count, scene count,
+                string table offset, scene table offset
+    strings     one uint32 length + UTF-8 bytes per interned string
+    scenes      one (id string index, payload offset, payload length)
+                record per scene, sorted by scene id
+    payloads    one marshal blob per scene holding its normalized fields
+
+Inside a payload every string is stored as an index into the string table,
+and every other scalar is wrapped in a one-element tuple, so the shared
+scene ids, targets and item names are only stored (and interned) once.
+
+Run ``python story_pack.py`` to (re)build the pack after editing the story;
+it also writes the checked story graph index (see story_graph.py).
+"""
+import marshal
+import mmap
+import os
+import struct
+import sys
+
+from story_loader import STORY_DIR, load_story_tree, newest_source_mtime
+
+PACK_PATH = "story.pack"
+
+PACK_MAGIC = b"PPHS"
+PACK_VERSION = 1
+
+_HEADER = struct.Struct("<4sHxxIIII")
+_LENGTH = struct.Struct("<I")
+_SCENE_RECORD = struct.Struct("<III")
+
+# Order of the fields stored in each scene payload
+SCENE_FIELDS = (
+    "text",
+    "connections",
+    "hidden_connections",
+    "items_granted",
+    "items_required",
+    "timeout_after_audio",
+    "timeout_seconds",
+)
+
+
+def _encode(value, strings, string_index):
+    """Replace every string in a scene field with its string table index."""
+    if isinstance(value, str):
+        if value not in string_index:
+            string_index[value] = len(strings)
+            strings.append(value)
+        return string_index[value]
+    if isinstance(value, dict):
+        return {_encode(k, strings, string_index): _encode(v, strings, string_index) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_encode(v, strings, string_index) for v in value]
+    return (value,)
+
+
+def _decode(value, strings):
+    """Inverse of _encode."""
+    if isinstance(value, int):
+        return strings[value]
+    if isinstance(value, tuple):
+        return value[0]
+    if isinstance(value, dict):
+        return {_decode(k, strings): _decode(v, strings) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_decode(v, strings) for v in value]
+    return value
+
+
+def compile_pack(story_dir=STORY_DIR, pack_path=PACK_PATH):
+    """Parse every scene file under story_dir and write them into a single pack file."""
+    scenes, sources = load_story_tree(story_dir)
+
+    strings = []
+    string_index = {}
+    records = []
+    for scene_id in sorted(scenes):
+        data = scenes[scene_id]
+        id_index = _encode(scene_id, strings, string_index)
+        payload = marshal.dumps(tuple(_encode(data[field], strings, string_index) for field in SCENE_FIELDS))
+        records.append((id_index, payload))
+
+    string_blob = b"".join(
+        _LENGTH.pack(len(encoded)) + encoded for encoded in (s.encode("utf-8") for s in strings)
+    )
+    string_offset = _HEADER.size
+    table_offset = string_offset + len(string_blob)
+    payload_offset = table_offset + _SCENE_RECORD.size * len(records)
+
+    table = []
+    payloads = []
+    for id_index, payload in records:
+        table.append(_SCENE_RECORD.pack(id_index, payload_offset, len(payload)))
+        payloads.append(payload)
+        payload_offset += len(payload)
+
+    header = _HEADER.pack(PACK_MAGIC, PACK_VERSION, len(strings), len(records), string_offset, table_offset)
+
+    # Write to a temporary file first so a running engine never maps a half-written pack
+    tmp_path = pack_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(string_blob)
+        f.write(b"".join(table))
+        f.write(b"".join(payloads))
+    os.replace(tmp_path, pack_path)
+
+    print(f"Compiled {len(records)} scenes ({len(strings)} strings) into {pack_path}")
+
+    # Check the story now, from the same parse, so startup only reads the result
+    import story_graph
+    try:
+        story_graph.compile_graph(story_dir, scenes=scenes)
+    except story_graph.StoryError as e:
+        print(e)
+    return len(records)
+
+
+def pack_is_fresh(story_dir=STORY_DIR, pack_path=PACK_PATH):
+    """Return True if the pack exists and is newer than every file in the story tree."""
+    try:
+        pack_mtime = os.stat(pack_path).st_mtime
+    except OSError:
+        return False
+    if not os.path.exists(story_dir):
+        return True
+    return pack_mtime >= newest_source_mtime(story_dir)
+
+
+class StoryPack:
+    """Read-only, memory-mapped view of a compiled story pack."""
+
+    def __init__(self, pack_path=PACK_PATH):
+        self.pack_path = pack_path
+        with open(pack_path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, string_count, scene_count, string_offset, table_offset = _HEADER.unpack_from(self._map, 0)
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            self.close()
+            raise ValueError(f"{pack_path} is not a version {PACK_VERSION} story pack")
+
+        self.strings = []
+        offset = string_offset
+        for _ in range(string_count):
+            (length,) = _LENGTH.unpack_from(self._map, offset)
+            offset += _LENGTH.size
+            self.strings.append(sys.intern(self._map[offset:offset + length].decode("utf-8")))
+            offset += length
+
+        # Scene id -> (payload offset, payload length)
+        self.index = {}
+        for i in range(scene_count):
+            id_index, payload_offset, payload_length = _SCENE_RECORD.unpack_from(
+                self._map, table_offset + i * _SCENE_RECORD.size
+            )
+            self.index[self.strings[id_index]] = (payload_offset, payload_length)
+
+    def scene_ids(self):
+        return list(self.index)
+
+    def read_scene(self, scene_id):
+        """Decode the Scene keyword arguments for one scene."""
+        offset, length = self.index[scene_id]
+        fields = marshal.loads(self._map[offset:offset + length])
+        data = {"id": scene_id}
+        for name, value in zip(SCENE_FIELDS, fields):
+            data[name] = _decode(value, self.strings)
+        return data
+
+    def read_all(self):
+        return {scene_id: self.read_scene(scene_id) for scene_id in self.index}
+
+    def close(self):
+        self._map.close()
+
+
+def load_pack(pack_path=PACK_PATH):
+    """Return {scene_id: Scene keyword arguments} for every scene in the pack."""
+    pack = StoryPack(pack_path)
+    try:
+        return pack.read_all()
+    finally:
+        pack.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compile the story tree into a binary story pack")
+    parser.add_argument("--story-dir", default=STORY_DIR)
+    parser.add_argument("--output", default=PACK_PATH)
+    args = parser.parse_args()
+    compile_pack(args.story_dir, args.output)
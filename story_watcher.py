@@ -0,0 +1,165 @@
+"""Hot reload of story files while the payphone is running.
+
+StoryWatcher follows the story directory (with inotify when the optional
+inotify_simple package is installed, by polling mtimes otherwise), reparses
+only the story files that changed and swaps the affected scenes into a
+SceneStore. Swaps are held back while a call is in progress and applied as
+soon as the handset is back on the hook.
+"""
+import functools
+import os
+import threading
+
+import story_loader
+
+try:
+    import inotify_simple
+    INOTIFY_AVAILABLE = True
+except ImportError:
+    INOTIFY_AVAILABLE = False
+
+POLL_INTERVAL = 1.0  # Seconds between mtime scans when inotify is not available
+SETTLE_DELAY = 0.05  # Seconds to wait for an editor to finish writing before reparsing
+
+
+class StoryWatcher:
+    def __init__(self, scenes, factory, story_dir=story_loader.STORY_DIR, is_idle=None,
+                 poll_interval=POLL_INTERVAL, use_inotify=INOTIFY_AVAILABLE, on_applied=None):
+        """
+        scenes: the SceneStore to update
+        factory: callable building a Scene from its keyword arguments
+        is_idle: callable returning True when it is safe to swap scenes (no call in progress)
+        on_applied: callable run with the swapped scene ids after every swap, from whichever thread made it
+        """
+        self.scenes = scenes
+        self.factory = factory
+        self.story_dir = story_dir
+        self.is_idle = is_idle if is_idle else (lambda: True)
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self.on_applied = on_applied
+
+        self._path_ids = {}   # story file path -> ids of the scenes it defines
+        self._mtimes = {}     # story file path -> last seen mtime
+        self._pending = {}    # scene id -> (loader, Scene) or None for removal
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Index the current story files and start watching in a background thread."""
+        for filepath in story_loader.iter_scene_files(self.story_dir):
+            try:
+                self._mtimes[filepath] = os.stat(filepath).st_mtime
+                scene_ids = story_loader.scan_file(filepath)
+                if scene_ids is None:
+                    scene_ids = [data["id"] for data in story_loader.read_file(filepath)]
+                self._path_ids[filepath] = scene_ids
+            except Exception as e:
+                print(f"Error indexing {filepath}: {e}")
+
+        target = self._inotify_loop if self.use_inotify else self._poll_loop
+        self._thread = threading.Thread(target=target, daemon=True)
+        self._thread.start()
+        print(f"Watching '{self.story_dir}' for changes ({'inotify' if self.use_inotify else 'polling'})")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+
+    def _poll_loop(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.check_for_changes()
+            except Exception as e:
+                print(f"Error checking story files: {e}")
+
+    def _inotify_loop(self):
+        flags = inotify_simple.flags
+        mask = flags.CLOSE_WRITE | flags.MOVED_TO | flags.MOVED_FROM | flags.DELETE | flags.CREATE
+        inotify = inotify_simple.INotify()
+        for root, dirs, files in os.walk(self.story_dir):
+            inotify.add_watch(root, mask)
+        try:
+            while not self._stop.is_set():
+                events = inotify.read(timeout=1000, read_delay=int(SETTLE_DELAY * 1000))
+                if not events:
+                    continue
+                for event in events:
+                    if event.mask & flags.ISDIR and event.mask & (flags.CREATE | flags.MOVED_TO):
+                        # Watch new subdirectories too; inotify is not recursive
+                        for wd_path in self._watched_dirs():
+                            try:
+                                inotify.add_watch(wd_path, mask)
+                            except OSError:
+                                pass
+                try:
+                    self.check_for_changes()
+                except Exception as e:
+                    print(f"Error checking story files: {e}")
+        finally:
+            inotify.close()
+
+    def _watched_dirs(self):
+        return [root for root, dirs, files in os.walk(self.story_dir)]
+
+    def check_for_changes(self):
+        """Compare the story tree against the last snapshot and queue reloads for changed files."""
+        current = {}
+        for filepath in story_loader.iter_scene_files(self.story_dir):
+            try:
+                current[filepath] = os.stat(filepath).st_mtime
+            except OSError:
+                continue  # Removed between the walk and the stat
+
+        changed = [path for path, mtime in current.items() if self._mtimes.get(path) != mtime]
+        removed = [path for path in self._mtimes if path not in current]
+        if not changed and not removed:
+            return
+
+        updates = {}
+        for filepath in removed:
+            for old_id in self._path_ids.pop(filepath, []):
+                updates[old_id] = None
+                print(f"Story file removed: {filepath} ({old_id})")
+
+        for filepath in changed:
+            try:
+                file_scenes = [
+                    (data["id"], functools.partial(story_loader.read_scene, filepath, data["id"]), self.factory(**data))
+                    for data in story_loader.read_file(filepath)
+                ]
+            except Exception as e:
+                # Keep serving the old version until the file parses again
+                print(f"Error reloading {filepath}: {e}")
+                continue
+            new_ids = [scene_id for scene_id, loader, scene in file_scenes]
+            for old_id in self._path_ids.get(filepath, []):
+                if old_id not in new_ids:
+                    updates.setdefault(old_id, None)
+            self._path_ids[filepath] = new_ids
+            for scene_id, loader, scene in file_scenes:
+                updates[scene_id] = (loader, scene)
+            print(f"Story file changed: {filepath} ({', '.join(str(s) for s in new_ids)})")
+
+        self._mtimes = current
+        with self._lock:
+            self._pending.update(updates)
+        if self.is_idle():
+            self.apply_pending()
+
+    def apply_pending(self):
+        """Swap every queued scene into the store. Call only between calls. Returns the swapped scene ids."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for scene_id, update in pending.items():
+            if update is None:
+                self.scenes.remove(scene_id)
+            else:
+                self.scenes.replace(scene_id, *update)
+        if pending:
+            print(f"Reloaded {len(pending)} scene(s): {', '.join(str(s) for s in pending)}")
+            if self.on_applied is not None:
+                self.on_applied(list(pending))
+        return list(pending)
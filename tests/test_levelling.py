@@ -0,0 +1,50 @@
+"""Streamed and decoded scenes are levelled to the same loudness."""
+import wave
+
+import numpy as np
+import pygame
+import pytest
+
+import audio_analysis
+from audio_pcm import load_sound
+from audio_service import get_audio_service
+
+
+@pytest.fixture(scope="module")
+def mixer_format():
+    if not get_audio_service().available:
+        pytest.skip("no mixer")
+    return pygame.mixer.get_init()
+
+
+def write_quiet_scene(path, mixer_format, dbfs=-32.0, seconds=2.0):
+    """A tone at dbfs RMS between half a second of silence on each side."""
+    frequency, size, channels = mixer_format
+    t = np.arange(int(frequency * seconds)) / frequency
+    tone = np.sin(2 * np.pi * 440 * t) * np.sqrt(2) * 10 ** (dbfs / 20)
+    silence = np.zeros(frequency // 2)
+    samples = (np.concatenate([silence, tone, silence]) * 32767).astype(np.int16)
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(channels)
+        f.setsampwidth(2)
+        f.setframerate(frequency)
+        f.writeframes(np.repeat(samples[:, np.newaxis], channels, axis=1).tobytes())
+
+
+def loudness(sound, frequency):
+    return audio_analysis.analyze(pygame.sndarray.samples(sound), frequency)["loudness"]
+
+
+def test_streamed_copy_matches_decoded_level(tmp_path, mixer_format):
+    frequency = mixer_format[0]
+    source = tmp_path / "scene.wav"
+    write_quiet_scene(source, mixer_format)
+    entry = audio_analysis.analyze_file(str(source))
+    assert entry["gain"] > 1.0  # Needs a boost, which a stream's volume cannot give
+
+    decoded = audio_analysis.apply_gain(load_sound(str(source), entry["start"], entry["end"]), entry["gain"])
+    streamed = pygame.mixer.Sound(audio_analysis.write_stream_copy(str(source), entry, str(tmp_path / "levelled")))
+
+    assert loudness(decoded, frequency) == pytest.approx(audio_analysis.TARGET_DBFS, abs=0.5)
+    assert loudness(streamed, frequency) == pytest.approx(loudness(decoded, frequency), abs=0.1)
+    assert streamed.get_length() == pytest.approx(decoded.get_length(), abs=0.01)
@@ -0,0 +1,43 @@
+"""A wrong star code goes where it did before codes were checked as typed: the scene's default."""
+import pytest
+import yaml
+
+from code_trie import CodeTrie
+from keypad import Keypad
+from transitions import CompiledTransitions
+
+SCENES = {
+    "story/lotr/riddle.yaml": "dont_understand",
+    "story/lotr/eggs.yaml": "wrong",
+    "story/lotr/clocks.yaml": "wrong",
+    "story/lotr/dont_understand.yaml": "wrong",
+    "story/f451/gaslight.yaml": "wrong_code",
+}
+
+
+def type_code(hidden_connections, keys):
+    keypad = Keypad("test", silent=True)
+    keypad.set_code_trie(CodeTrie.from_hidden_connections(hidden_connections))
+    choice = None
+    for key in keys:
+        choice = keypad.process_code_key(key)
+        if choice is not None:
+            break
+    return choice
+
+
+@pytest.mark.parametrize("path,target", sorted(SCENES.items()))
+def test_wrong_code_goes_to_default(path, target):
+    with open(path) as f:
+        hidden_connections = yaml.safe_load(f)["hidden_connections"]
+    transitions = CompiledTransitions({}, hidden_connections)
+    choice = type_code(hidden_connections, "*1234#")
+    assert transitions.resolve(choice, 0) == (target, None)
+    # The same as an untracked wrong number submitted with '#'
+    assert transitions.resolve("1234", 0) == (target, None)
+
+
+def test_wrong_code_entry_wins_over_default():
+    hidden_connections = {"0": "hub", "3447": "eggs", "wrong_code": "try_again", "default": "wrong"}
+    transitions = CompiledTransitions({}, hidden_connections)
+    assert transitions.resolve(type_code(hidden_connections, "*1234#"), 0) == ("try_again", None)
@@ -0,0 +1,245 @@
+"""Precompiled scene transitions and bitmask inventories.
+
+Each Scene compiles its connections and hidden_connections once, when it is
+built, into a dispatch table keyed by the choice string. Item requirements,
+including comma-separated lists like "ring,wild,451,full_tummy", become
+integer bitmasks over a shared ItemRegistry, and the player's Inventory
+carries the matching bitmask. Resolving a transition is then a dict lookup
+plus a few integer ANDs, whatever the number of item rules, and each
+(choice, inventory) result is memoized per scene.
+"""
+import threading
+
+from code_trie import WRONG_CODE, unordered_code_keys
+
+MEMO_SIZE = 256  # Memoized (choice, inventory) results kept per scene
+
+# Entry kinds in a dispatch table
+GOTO = 0        # (GOTO, target)
+ITEM_RULES = 1  # (ITEM_RULES, [(mask, target), ...] best match first, default or None, no-match message)
+STANDARD = 2    # (STANDARD, target, required mask, alt scene or None)
+BRANCH = 3      # (BRANCH, [(mask, target), ...], default or None)
+INVALID = 4     # (INVALID, message)
+
+
+class ItemRegistry:
+    """Assigns each item name its own bit."""
+
+    def __init__(self):
+        self._bits = {}
+        self._names = []
+        self._lock = threading.Lock()  # Sessions register items from several threads
+
+    def bit(self, item):
+        bit = self._bits.get(item)
+        if bit is None:
+            with self._lock:
+                bit = self._bits.get(item)
+                if bit is None:
+                    bit = 1 << len(self._names)
+                    self._names.append(item)
+                    self._bits[item] = bit
+        return bit
+
+    def mask(self, items):
+        mask = 0
+        for item in items:
+            mask |= self.bit(item)
+        return mask
+
+    def names(self, mask):
+        return [name for i, name in enumerate(self._names) if mask >> i & 1]
+
+
+# Shared by every scene so inventories mean the same thing everywhere
+ITEMS = ItemRegistry()
+
+
+class Inventory:
+    """Set of item names stored as a bitmask over ITEMS."""
+
+    def __init__(self, items=(), registry=ITEMS):
+        self.registry = registry
+        self.mask = registry.mask(items)
+
+    def add(self, item):
+        self.mask |= self.registry.bit(item)
+
+    def discard(self, item):
+        self.mask &= ~self.registry.bit(item)
+
+    def clear(self):
+        self.mask = 0
+
+    def __contains__(self, item):
+        return bool(self.mask & self.registry.bit(item))
+
+    def __iter__(self):
+        return iter(self.registry.names(self.mask))
+
+    def __len__(self):
+        return bin(self.mask).count("1")
+
+    def __bool__(self):
+        return self.mask != 0
+
+    def __repr__(self):
+        return f"Inventory({list(self)!r})"
+
+
+def inventory_mask(inventory, registry=ITEMS):
+    """Bitmask for an Inventory or any iterable of item names."""
+    if isinstance(inventory, Inventory):
+        return inventory.mask
+    return registry.mask(inventory)
+
+
+def _item_rules(connection, registry):
+    """Compile a {"item1,item2": target, "default": target} map, most items first."""
+    rules = []
+    for item_list_str, target_scene in connection.items():
+        if item_list_str == "default":
+            continue
+        required_items = [item.strip() for item in item_list_str.split(',')]
+        rules.append((len(required_items), registry.mask(required_items), target_scene))
+    # Stable sort keeps definition order among rules needing the same number of items
+    rules.sort(key=lambda rule: -rule[0])
+    return [(mask, target) for count, mask, target in rules]
+
+
+def _hidden_entry(choice, connection, registry):
+    if isinstance(connection, dict):
+        default = connection.get("default")
+        if "default" in connection and not isinstance(default, str):
+            default = (INVALID, "Invalid scene transition")
+        message = "You need the right items to progress..." if choice == "timeout" else "You don't have the right items."
+        return (ITEM_RULES, _item_rules(connection, registry), default, message)
+    if isinstance(connection, str):
+        return (GOTO, connection)
+    return (INVALID, "Invalid scene transition")
+
+
+def _connection_entry(connection_data, registry):
+    # Handle standard format: [text, target, required_items, alt_scene]
+    if len(connection_data) >= 2 and not isinstance(connection_data[1], dict):
+        required_items = connection_data[2] if len(connection_data) > 2 else []
+        alt_scene_id = connection_data[3] if len(connection_data) > 3 else None
+        return (STANDARD, connection_data[1], registry.mask(required_items or []), alt_scene_id)
+
+    # Handle advanced branching: [text, {item1: scene1, item2: scene2, ..., "default": default_scene}]
+    if len(connection_data) >= 2:
+        paths = connection_data[1]
+        rules = [(registry.bit(item), scene_id) for item, scene_id in paths.items() if item != "default"]
+        return (BRANCH, rules, paths.get("default"))
+    return None
+
+
+class CompiledTransitions:
+    """Dispatch table for one scene's choices."""
+
+    def __init__(self, connections, hidden_connections, registry=ITEMS):
+        self.registry = registry
+        self.hidden = {
+            choice: _hidden_entry(choice, connection, registry)
+            for choice, connection in hidden_connections.items()
+        }
+        self.numbered = {}
+        for key, connection_data in connections.items():
+            entry = _connection_entry(connection_data, registry)
+            self.numbered[key] = entry if entry is not None else (INVALID, "Invalid choice. Try again.")
+        # Unordered multi-part codes like "451+7464", checked when no exact code matches
+        self.unordered = [(rule, self.hidden[key]) for key, rule in unordered_code_keys(hidden_connections)]
+        self.default = hidden_connections.get("default")
+        self.wrong_code = hidden_connections.get("wrong_code")
+        self._timeout_rules = self.hidden.get("timeout")
+        self._memo = {}
+
+    def uses_timeout(self, mask):
+        """True if a timeout with this inventory mask leads somewhere."""
+        entry = self._timeout_rules
+        if entry is None:
+            return False
+        if entry[0] != ITEM_RULES:
+            return True
+        if entry[2] is not None:
+            return True
+        return any(rule_mask & mask == rule_mask for rule_mask, target in entry[1])
+
+    def resolve(self, choice, mask):
+        """Return (next_scene, message) for choice with the given inventory mask."""
+        memo_key = (choice, mask)
+        result = self._memo.get(memo_key)
+        if result is None:
+            result = self._resolve(choice, mask)
+            if len(self._memo) >= MEMO_SIZE:
+                self._memo.clear()
+            self._memo[memo_key] = result
+        return result
+
+    def _resolve(self, choice, mask):
+        # Special hidden connections (timeout, codes, etc.) come first
+        entry = self.hidden.get(choice)
+        if entry is not None:
+            return self._resolve_entry(entry, mask)
+        for rule, entry in self.unordered:
+            if rule.matches(choice):
+                return self._resolve_entry(entry, mask)
+
+        # Regular numbered choice (1-9, 0, etc.)
+        try:
+            choice_index = int(choice)
+        except (ValueError, TypeError):
+            # Not a number - could be a multi-digit code that wasn't in hidden_connections
+            if self.wrong_code is not None:
+                return self.wrong_code, None
+            if choice == WRONG_CODE and self.default is not None:
+                # A rejected code is a wrong number, which goes to the scene's default like any other
+                return self.default, None
+            return None, "Invalid choice. Try again."
+
+        entry = self.numbered.get(choice_index)
+        if entry is not None:
+            return self._resolve_entry(entry, mask)
+        if self.default is not None:
+            # Check if there's a default for any button press
+            return self.default, None
+        return None, "Invalid choice. Try again."
+
+    def _resolve_entry(self, entry, mask):
+        kind = entry[0]
+        if kind == GOTO:
+            return entry[1], None
+
+        if kind == ITEM_RULES:
+            for rule_mask, target in entry[1]:
+                if rule_mask & mask == rule_mask:
+                    return target, None
+            default = entry[2]
+            if default is None:
+                return None, entry[3]
+            if isinstance(default, tuple):
+                return self._resolve_entry(default, mask)
+            return default, None
+
+        if kind == STANDARD:
+            target, required, alt = entry[1], entry[2], entry[3]
+            # Special case for calling without a phone number
+            if target == "scene2" and not mask & self.registry.bit("phone_number"):
+                return "no_numbers_scene", None
+            if required & mask == required:
+                return target, None
+            if alt:
+                return alt, None
+            missing_items = self.registry.names(required & ~mask)
+            return None, f"You can't do that. You need these items: {', '.join(missing_items)}"
+
+        if kind == BRANCH:
+            # First check for specific items in inventory that have defined paths
+            for bit, target in entry[1]:
+                if mask & bit:
+                    return target, None
+            if entry[2] is not None:
+                return entry[2], None
+            return None, "You don't have the right item for this action."
+
+        return None, entry[1]